@@ -9,6 +9,89 @@ import numpy as np
 #from serial.tools import list_ports
 import time
 import sys
+import math
+
+
+def sim_step(pE,f,pM,sim_k,sim_b,window_scale):
+    #one step of the simulated device of Graphics.sim_forces in plain floats, a two element numpy array costs
+    #more in allocations than the math does. Returns the new end effector x, y and the effort (0..255)
+    dx = pM[0]-pE[0]
+    dy = pM[1]-pE[1]
+    scale = window_scale/1e3
+    k_over_b = sim_k/sim_b
+    #velocity from the mouse spring minus the velocity from the force, same operation order as the numpy version
+    dpx = k_over_b*dx - f[0]*scale/sim_b
+    dpy = k_over_b*dy - f[1]*scale/sim_b
+    if abs(dpx)<1:
+        dpx = 0.0
+    if abs(dpy)<1:
+        dpy = 0.0
+    ex = sim_k*dx/window_scale
+    ey = sim_k*dy/window_scale
+    effort = min(max(math.sqrt(ex*ex+ey*ey)*255*20,0),255)
+    #round(v, 0) rounds half to even like np.round
+    return round(pE[0]+dpx,0), round(pE[1]+dpy,0), effort
+
+
+class VirtualDevices:
+    def __init__(self,pE,sim_k=0.5,sim_b=0.8,window_scale=3000):
+        #M simulated devices of Graphics.sim_forces stepped together, e.g. to sweep stiffness and damping grids
+        #pE: (M,2) start positions of the end effectors, sim_k/sim_b: one value for all or one per device
+        #step() works in place on scratch arrays allocated here, it allocates nothing itself
+        self.pE = np.array(pE,dtype=float)
+        count = len(self.pE)
+        self.window_scale = window_scale
+        self.effort = np.zeros(count) #0..255, the colour is (255,255-effort,255-effort)
+        self.diff = np.empty((count,2))
+        self.dpE = np.empty((count,2))
+        self.scratch = np.empty((count,2))
+        self.small = np.empty((count,2),dtype=bool)
+        self.set_gains(sim_k,sim_b)
+
+    @classmethod
+    def grid(cls,sim_k_values,sim_b_values,pE=(0,0),window_scale=3000):
+        #one device for every (sim_k, sim_b) pair, sim_k varies slowest; all start at pE
+        sim_k, sim_b = np.meshgrid(np.asarray(sim_k_values,dtype=float),np.asarray(sim_b_values,dtype=float),indexing='ij')
+        pE = np.broadcast_to(np.asarray(pE,dtype=float),(sim_k.size,2))
+        return cls(pE,sim_k.ravel(),sim_b.ravel(),window_scale)
+
+    def set_gains(self,sim_k=None,sim_b=None):
+        #scalars or (M,) arrays, kept as (M,1) columns so they broadcast over x and y
+        if sim_k is not None:
+            self.sim_k = np.broadcast_to(np.asarray(sim_k,dtype=float).reshape(-1,1),(len(self.pE),1)).copy()
+        if sim_b is not None:
+            self.sim_b = np.broadcast_to(np.asarray(sim_b,dtype=float).reshape(-1,1),(len(self.pE),1)).copy()
+        self.k_over_b = self.sim_k/self.sim_b
+        self.k_over_scale = self.sim_k/self.window_scale
+
+    def step(self,f,pM):
+        #f: forces, pM: mouse positions, (M,2) or one (2,) for all devices. Returns pE, updated in place
+        diff, dpE, scratch = self.diff, self.dpE, self.scratch
+        np.subtract(pM,self.pE,out=diff)
+        np.multiply(f,self.window_scale/1e3,out=dpE)
+        np.divide(dpE,self.sim_b,out=dpE)
+        np.multiply(diff,self.k_over_b,out=scratch)
+        np.subtract(scratch,dpE,out=dpE)
+        np.less(np.abs(dpE,out=scratch),1,out=self.small)
+        np.copyto(dpE,0,where=self.small)
+        np.add(self.pE,dpE,out=self.pE)
+        np.round(self.pE,out=self.pE)
+
+        #effort, written like the scalar version: sim_k*diff/window_scale
+        np.multiply(diff,self.sim_k,out=scratch)
+        np.divide(scratch,self.window_scale,out=scratch)
+        np.hypot(scratch[:,0],scratch[:,1],out=self.effort)
+        np.multiply(self.effort,255*20,out=self.effort)
+        np.clip(self.effort,0,255,out=self.effort)
+        return self.pE
+
+    def effort_colors(self):
+        #(M,3) colours as Graphics.effort_color
+        colors = np.full((len(self.pE),3),255.0)
+        colors[:,1] -= self.effort
+        colors[:,2] -= self.effort
+        return colors
+
 
 class Graphics:
     def __init__(self,device_connected,window_size=(600,400)):
@@ -126,13 +209,10 @@ class Graphics:
             #pM is where the mouse is
             #pE is where the position is pulled towards with the spring and damping factors
             #pP is where the actual haptic position ends up as
-            diff = np.array(( pM[0]-pE[0],pM[1]-pE[1]) )
             #diff = np.array(( pM[0]-pP[0],pM[1]-pP[1]) )
             
-            scale = self.window_scale/1e3
-            scaled_vel_from_force = np.array(f)*scale/self.sim_b
-            vel_from_mouse_spring = (self.sim_k/self.sim_b)*diff
-            dpE = vel_from_mouse_spring - scaled_vel_from_force
+            #the math is in sim_step, in plain floats
+            x, y, effort = sim_step(pE, f, pM, self.sim_k, self.sim_b, self.window_scale)
             #dpE = -dpE
             #if diff[0]!=0:
             #    if (diff[0]+dpE[0])/diff[0]<0:
@@ -144,16 +224,10 @@ class Graphics:
             #if diff[1]!=1:
             #    if (diff[1]+dpE[1])/diff[1]<0:
             #        dpE[1] = -diff[1]
-            if abs(dpE[0])<1:
-                dpE[0] = 0
-            if abs(dpE[1])<1:
-                dpE[1] = 0
-            pE = np.round(pE+dpE) #update new positon of the end effector
+            pE = np.array((x, y)) #update new positon of the end effector
             
             #Change color based on effort
-            cg = 255-np.clip(np.linalg.norm(self.sim_k*diff/self.window_scale)*255*20,0,255)
-            cb = 255-np.clip(np.linalg.norm(self.sim_k*diff/self.window_scale)*255*20,0,255)
-            self.effort_color = (255,cg,cb)
+            self.effort_color = (255,255-effort,255-effort)
         return pE
 
     def erase_screen(self):
@@ -9,8 +9,11 @@ import serial
 import struct
 import math
 import sys
+import threading
+import time
 from typing import List
 import array
+import numpy as np
 
 
 class Actuator:
@@ -95,11 +98,21 @@ class Board:
 
         Args:
             app (string): name of the app
-            port (string): com port
+            port (string or serial.Serial): com port, or an already opened port
             baud (int): rate
         """
         self.__applet = app
-        self.__port = serial.Serial(port, baud)
+        if isinstance(port, str):
+            self.__port = serial.Serial(port, baud)
+        else:
+            self.__port = port
+        # one precompiled struct and preallocated frame per message layout
+        self.__tx_layouts = {}
+        self.__rx_layouts = {}
+        # background reader state, see start_reader
+        self.__reader = None
+        self.__reader_running = False
+        self.__latest = None
         self.__reset_board()
 
     def floatToBits(self,f):
@@ -133,35 +146,92 @@ class Board:
 
 
     def transmit(self, communicationType, deviceID, bData, fData):
-        outData = bytearray(2 + len(bData) + 4*len(fData))
-        segments = bytearray(4)
+        layout = self.__tx_layouts.get((len(bData), len(fData)))
+        if layout is None:
+            # header, raw bytes and little endian floats, the same bytes float_to_bytes produces
+            packer = struct.Struct('<BB%ds%df' % (len(bData), len(fData)))
+            layout = self.__tx_layouts[(len(bData), len(fData))] = (packer, bytearray(packer.size))
+        packer, outData = layout
 
-        outData[0] = communicationType
-        outData[1] = deviceID
         self.__deviceID = deviceID
-        outData[2:2+len(bData)] = bData
-        j = 2+len(bData)
-        # TODO: replace with a single pack
-        for i in range(0, len(fData)):
-            # store the floats into the bytearray one by one
-            segments = self.float_to_bytes(fData[i])#bytearray(struct.pack('!f', fData[i]))
-            outData[j:j+4] = segments
-            j = j+4
+        packer.pack_into(outData, 0, communicationType, deviceID, bData, *fData)
         wrote = self.__port.write(outData)
 
     def receive(self, communicationType, deviceID, expected):
-        inData = bytearray(1+4*expected)
-        data = [None]*expected
-        inData = self.__port.read(1+4*expected)
-        if(inData[0] != deviceID):
+        layout = self.__rx_layouts.get(expected)
+        if layout is None:
+            unpacker = struct.Struct('<B%df' % expected)
+            inData = bytearray(unpacker.size)
+            layout = self.__rx_layouts[expected] = (unpacker, inData, memoryview(inData))
+        unpacker, inData, view = layout
+
+        if(self.__port.readinto(view) < len(inData)):
+            sys.stderr.write("Error, incomplete data frame!\n")
+        data = unpacker.unpack_from(inData)
+        if(data[0] != deviceID):
             sys.stderr.write("Error, another device expects this data!\n")
-        buf = inData[1:expected*4+1]
-        for i in range(0, expected):
-            data[i] = self.bytes_to_float(buf[i*4:i*4+4])
-        #data = struct.unpack('!'+str(expected)+'f', buf)
-        #print(expected)
-        #print(data)
-        return data
+        return list(data[1:])
+
+    def start_reader(self, deviceID, expected, timeout=0.1):
+        """Decode incoming frames continuously on a background thread
+
+        Only the newest frame is kept, see latest_sample(). While the reader runs,
+        receive() and data_available() must not be used by other threads.
+
+        Args:
+            deviceID (int): device the frames belong to
+            expected (int): number of floats per frame
+            timeout (float, optional): port read timeout so the reader can be stopped. Defaults to 0.1.
+        """
+        self.__latest = None
+        self.__reader_running = True
+        self.__port.timeout = timeout
+        self.__reader = threading.Thread(target=self.__read_loop, args=(deviceID, expected), daemon=True)
+        self.__reader.start()
+
+    def stop_reader(self):
+        """Stop the background reader started by start_reader"""
+        self.__reader_running = False
+        if self.__reader is not None:
+            self.__reader.join()
+            self.__reader = None
+
+    def reader_active(self):
+        return self.__reader is not None
+
+    def latest_sample(self):
+        """Newest frame decoded by the background reader
+
+        Returns:
+            tuple: (sequence, timestamp, data), timestamp from time.perf_counter(),
+            or None before the first frame arrived
+        """
+        return self.__latest
+
+    def __read_loop(self, deviceID, expected):
+        unpacker = struct.Struct('<B%df' % expected)
+        frame = bytearray(unpacker.size)
+        view = memoryview(frame)
+        filled = 0
+        sequence = 0
+        while self.__reader_running:
+            # frames may arrive in pieces, keep filling until a whole one is in
+            filled += self.__port.readinto(view[filled:]) or 0
+            if filled < len(frame):
+                continue
+            filled = 0
+            data = unpacker.unpack_from(frame)
+            if(data[0] != deviceID):
+                sys.stderr.write("Error, another device expects this data!\n")
+                continue
+            sequence += 1
+            # a single reference swap, readers never see a half written sample
+            self.__latest = (sequence, time.perf_counter(), list(data[1:]))
+
+    def close(self):
+        """Stop the background reader if it runs and close the serial port"""
+        self.stop_reader()
+        self.__port.close()
 
     def data_available(self):
         available = False
@@ -169,6 +239,10 @@ class Board:
             available = True
         return available
 
+    def in_waiting(self):
+        """Number of received bytes not read yet, more than one frame means the reads fall behind"""
+        return self.__port.in_waiting
+
     def __reset_board(self):
         communicationType = 0
         deviceID = 0
@@ -313,6 +387,9 @@ class Device:
     def __init__(self, deviceID, deviceLink):
         self.__deviceID = deviceID
         self.__deviceLink = deviceLink
+        # per device, add_actuator/add_encoder fill these in place and a second Device would see the first one's ports
+        self.__actuatorPositions = bytearray([0, 0, 0, 0])
+        self.__encoderPositions = bytearray([0, 0, 0, 0])
 
     def add_actuator(self, actuator, rotation, port):
         error = False
@@ -526,10 +603,29 @@ class Device:
 
     def device_read_data(self):
         self.__communicationType = 2
-        dataCount = 0
         device_data = self.__deviceLink.receive(
             self.__communicationType, self.__deviceID, self.__sensorsActive + self.__encodersActive)
+        self.__set_device_data(device_data)
+
+    def device_start_reader(self):
+        """Let the board decode this device's frames on a background thread, read them with device_read_latest"""
+        self.__deviceLink.start_reader(self.__deviceID, self.__sensorsActive + self.__encodersActive)
 
+    def device_read_latest(self):
+        """Load the newest sample from the background reader without blocking
+
+        Returns:
+            tuple: (sequence, timestamp) of the sample, or None if no sample arrived yet
+        """
+        sample = self.__deviceLink.latest_sample()
+        if sample is None:
+            return None
+        sequence, timestamp, device_data = sample
+        self.__set_device_data(device_data)
+        return sequence, timestamp
+
+    def __set_device_data(self, device_data):
+        dataCount = 0
         for i in range(self.__sensorsActive):
             self.__sensors[i].set_value(device_data[dataCount])
             dataCount += 1
@@ -709,6 +805,92 @@ class Pantograph(Mechanisms):
         self.__tau1*= self.__gain
         self.__tau2*= self.__gain
 
+    def forwardKinematicsBatch(self, angles):
+        """Forward kinematics of many poses at once, same math as forwardKinematics
+
+        Does not change the state read by get_coordinate/get_torque. Poses the scalar
+        path rejects with a math domain error come out as nan.
+
+        Args:
+            angles (array_like): (N, 2) encoder angles in degrees
+
+        Returns:
+            tuple: (positions, jacobians), (N, 2) end effector positions and (N, 2, 2)
+            Jacobians with [[J11, J12], [J21, J22]] per pose
+        """
+        angles = np.asarray(angles, dtype=float).reshape(-1, 2)
+        l1 = l2 = self.__l
+        L1 = L2 = self.__L
+        d = self.__d
+
+        th1 = self.__pi / 180 * angles[:, 0]
+        th2 = self.__pi / 180 * angles[:, 1]
+        c1 = np.cos(th1)
+        c2 = np.cos(th2)
+        s1 = np.sin(th1)
+        s2 = np.sin(th2)
+
+        xA = l1 * c1
+        yA = l1 * s1
+        xB = d + l2 * c2
+        yB = l2 * s2
+        hx = xB - xA
+        hy = yB - yA
+        hh = hx**2 + hy**2
+        hm = np.sqrt(hh)
+        # hm == 0 and h1m == 0 guards of the scalar path: those terms are zero
+        has_h = hm != 0
+        safe_hm = np.where(has_h, hm, 1.0)
+        cB = np.where(has_h, -(L2**2 - L1**2 - hh) / (2 * L1 * safe_hm), 0.0)
+        h1x = np.where(has_h, L1 * cB * hx / safe_hm, 0.0)
+        h1y = np.where(has_h, L1 * cB * hy / safe_hm, 0.0)
+        h1m = np.sqrt(h1x**2 + h1y**2)
+        with np.errstate(invalid='ignore'):
+            sB = np.sqrt(1 - cB**2)
+        has_h1 = h1m != 0
+        safe_h1m = np.where(has_h1, h1m, 1.0)
+        lx = np.where(has_h1, -L1 * sB * h1y / safe_h1m, 0.0)
+        ly = np.where(has_h1, L1 * sB * h1x / safe_h1m, 0.0)
+
+        x_P = xA + h1x + lx
+        y_P = yA + h1y + ly
+
+        with np.errstate(invalid='ignore'):
+            phi1 = np.arccos((x_P - l1 * c1) / L1)
+            phi2 = np.arccos((x_P - d - l2 * c2) / L2)
+        c11 = np.cos(phi1)
+        s11 = np.sin(phi1)
+        c22 = np.cos(phi2)
+        s22 = np.sin(phi2)
+
+        # dn == 0 guard: eta and nu are zero
+        dn = L1 * (c11 * s22 - c22 * s11)
+        has_dn = dn != 0
+        safe_dn = np.where(has_dn, dn, 1.0)
+        eta = np.where(has_dn, (-L1 * c11 * s22 + L1 * c22 * s11 - c1 * l1 * s22 + c22 * l1 * s1) / safe_dn, 0.0)
+        nu = np.where(has_dn, l2 * (c2 * s22 - c22 * s2) / safe_dn, 0.0)
+
+        positions = np.stack((x_P, y_P), axis=1)
+        jacobians = np.empty((len(angles), 2, 2))
+        jacobians[:, 0, 0] = -L1 * eta * s11 - L1 * s11 - l1 * s1
+        jacobians[:, 0, 1] = L1 * c11 * eta + L1 * c11 + c1 * l1
+        jacobians[:, 1, 0] = -L1 * s11 * nu
+        jacobians[:, 1, 1] = L1 * c11 * nu
+        return positions, jacobians
+
+    def torqueCalculationBatch(self, jacobians, forces):
+        """Motor torques for many poses at once, same math as torqueCalculation
+
+        Args:
+            jacobians (array_like): (N, 2, 2) Jacobians from forwardKinematicsBatch
+            forces (array_like): (N, 2) or (2,) end effector forces
+
+        Returns:
+            numpy.ndarray: (N, 2) torques [tau1, tau2]
+        """
+        forces = np.asarray(forces, dtype=float)
+        return np.einsum('nij,nj->ni', jacobians, np.broadcast_to(forces, (len(jacobians), 2))) * self.__gain
+
     def op_velocityCalculation(self, q):
         op_vels = [0.0,0.0]
         self.__q_x = q[0]
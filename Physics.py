@@ -2,7 +2,6 @@
 
 import numpy as np
 import math
-import matplotlib.pyplot as plt
 from HaplyHAPI import Board, Device, Mechanisms, Pantograph
 import sys, serial, glob
 from serial.tools import list_ports
@@ -10,11 +9,88 @@ import time
 
 
 import serial.tools.list_ports
+import os
+from stage_timer import StageTimer
+
+
+#USB ids of the Arduino Zero native port, its bootloader and the Atmel EDBG programming port
+HAPLY_USB_IDS = [(0x2341, 0x804D), (0x2341, 0x004D), (0x03EB, 0x2157)]
+#last port a board was found on, tried first on the next start
+PORT_CACHE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".haply_port")
+
+
+def is_haply_port(p):
+    #decide from the USB descriptor alone, without opening the port
+    if (p.vid, p.pid) in HAPLY_USB_IDS:
+        return True
+    return p.description is not None and p.description[0:12] == "Arduino Zero"
+
+
+def can_open(port):
+    try:
+        s = serial.Serial(port)
+        s.close()
+        return True
+    except (OSError, serial.SerialException):
+        return False
+
+
+def read_port_cache():
+    try:
+        with open(PORT_CACHE_FILE, 'r') as file:
+            return file.read().strip() or None
+    except OSError:
+        return None
+
+
+def write_port_cache(port):
+    try:
+        with open(PORT_CACHE_FILE, 'w') as file:
+            file.write(port)
+    except OSError:
+        pass
+
+
+def clear_port_cache():
+    try:
+        os.remove(PORT_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def find_haply_ports(port_override=None, use_cache=True, exclude=()):
+    #returns the list of usable board ports, the override or the cached port is returned on its own
+    #exclude: ports not to return, e.g. one that did not answer
+    if port_override:
+        return [port_override] if can_open(port_override) else []
+
+    ports = [p for p in serial.tools.list_ports.comports() if p.device not in exclude]
+    cached = read_port_cache() if use_cache else None
+    #the cached port is only trusted while the device on it still looks like a board
+    if cached and any(p.device == cached and is_haply_port(p) for p in ports) and can_open(cached):
+        return [cached]
+
+    result = []
+    for p in ports:
+        if p.device != cached and is_haply_port(p) and can_open(p.device):
+            result.append(p.device)
+    if use_cache:
+        if result:
+            write_port_cache(result[0])
+        elif cached:
+            clear_port_cache()
+    return result
 
 
 class Physics:
-    def __init__(self,reverse_motor_order=False,hardware_version=3):
+    def __init__(self,reverse_motor_order=False,hardware_version=3,background_reader=False,port=None,use_port_cache=True,timer=None,exclude_ports=(),connect=True):
         #return True if a device is found, False if no device is found
+        #background_reader: decode encoder frames on a separate thread, reads then never wait on the port
+        #port: use this serial port instead of searching, use_port_cache: try the last known good port first
+        #timer: StageTimer that times get_mouse_pos and update_force, a disabled one by default
+        #exclude_ports: ports not to search, e.g. a cached port that did not answer
+        #connect: False never looks for a board, for code that only needs the kinematics and state
+        self.timer = timer if timer is not None else StageTimer()
         CW = 0
         CCW = 1
         haplyBoard = Board
@@ -22,8 +98,10 @@ class Physics:
         SimpleActuatorMech = Mechanisms
         pantograph = Pantograph
         
-        #########Open the connection with the arduino board#########
-        self.port = self.serial_ports()   ##port contains the communication port or False if no device
+        self.background_reader = False
+        self.sample_sequence = 0
+        self.sample_time = None
+
         if hardware_version==3:
             self.l1 = 0.07
             self.l2 = 0.09
@@ -33,7 +111,16 @@ class Physics:
             self.l2 = 0.09
             self.d = 0.0
         
-        if self.port:
+        #########Open the connection with the arduino board#########
+        self.port_source = None
+        self.port = []
+        self.device_present = False
+        exclude_ports = tuple(exclude_ports)
+        while connect:
+            self.port = self.serial_ports(port, use_port_cache, exclude_ports)   ##port contains the communication port or False if no device
+            if not self.port:
+                print("[PHYSICS]: No compatible device found.")
+                break
             print("Board found on port %s"%self.port[0])
             self.haplyBoard = Board("test", self.port[0], 0)
             self.device = Device(5, self.haplyBoard)
@@ -59,41 +146,60 @@ class Physics:
                 self.device.add_encoder(2, CW, -61, 10752, 1)
             
             self.device.device_set_parameters()
-            self.device_present = True
             
-            #THE DEVICE MUST HAVE THE TORQUE WRITTEN BEFORE IT CAN PROVIDE DATA!!!!!!!
-            #This section prevents the program from not having available data for 1 to 2 initial frames
-            start_time = time.time()
-            while True:
-                if not self.haplyBoard.data_available():
-                    #port present, but no data available. Setting initial torques
-                    self.device.set_device_torques(np.zeros(2))
-                    self.device.device_write_torques()
-                    time.sleep(0.001) #pause for 1 millisecond
-                    if time.time()-start_time>5.0: #this is taking longer than 5 seconds...
-                        raise ValueError("Haply board present, but not providing data!")
-                else:
-                    #data now available! Proceed.
-                    print("[PHYSICS]: Haply found and data available. Ready to run!")
-                    break
-        else:
-            print("[PHYSICS]: No compatible device found.")
-            self.device_present = False
+            if self.wait_for_data():
+                self.device_present = True
+                print("[PHYSICS]: Haply found and data available. Ready to run!")
+                if background_reader:
+                    self.device.device_start_reader()
+                    self.background_reader = True
+                break
+            #release the port before anything else opens it, on Windows it stays locked otherwise
+            self.haplyBoard.close()
+            if self.port_source != "cache hit":
+                raise ValueError("Haply board present, but not providing data!")
+            #the cached port looks like a board but does not answer: forget it and search the others
+            print("[PHYSICS]: Cached port %s is not answering, searching again"%self.port[0])
+            clear_port_cache()
+            exclude_ports += (self.port[0],)
     
+    def wait_for_data(self, timeout=5.0):
+        #THE DEVICE MUST HAVE THE TORQUE WRITTEN BEFORE IT CAN PROVIDE DATA!!!!!!!
+        #This section prevents the program from not having available data for 1 to 2 initial frames
+        #returns False when the board is still not providing data after timeout seconds
+        start_time = time.time()
+        while not self.haplyBoard.data_available():
+            #port present, but no data available. Setting initial torques
+            self.device.set_device_torques(np.zeros(2))
+            self.device.device_write_torques()
+            time.sleep(0.001) #pause for 1 millisecond
+            if time.time()-start_time>timeout: #this is taking longer than 5 seconds...
+                return False
+        return True
+
     def is_device_connected(self):
         return self.device_present
     
     def get_device_pos(self):
         #Get pantograph joint positions. Only works if a device is connected!
-        if self.device_present and self.port and self.haplyBoard.data_available():    ##If Haply is present
+        if self.background_reader and self.sample_available():
+            #newest sample from the reader thread, never blocks
+            self.sample_sequence, self.sample_time = self.device.device_read_latest()
+            motorAngle = self.device.get_device_angles()
+
+            #forward kinematics to get position
+            device_position = self.device.get_device_position(motorAngle)
+        elif not self.background_reader and self.device_present and self.port and self.haplyBoard.data_available():    ##If Haply is present
             #get device angles
             self.device.device_read_data()
+            self.sample_sequence += 1
+            self.sample_time = time.perf_counter()
             motorAngle = self.device.get_device_angles()
             
             #forward kinematics to get position
             device_position = self.device.get_device_position(motorAngle)
         else:
-            print("debug vals:",self.device_present,self.port,self.haplyBoard.data_available())
+            print("debug vals:",self.device_present,self.port,self.sample_available())
             raise ValueError("[PHYSICS] Cannot get device position if no device is connected!")
         #get other device positions
         pA0 = (0.0,0.0)
@@ -104,12 +210,27 @@ class Physics:
         pB = ( self.l1*math.cos(a2)+self.d, self.l1*math.sin(a2) )
         return pA0,pB0,pA,pB,device_position
     
+    def sample_available(self):
+        #True if a new device sample can be read (with the background reader: once any sample has arrived)
+        if not (self.device_present and self.port):
+            return False
+        if self.background_reader:
+            return self.haplyBoard.latest_sample() is not None
+        return self.haplyBoard.data_available()
+
+    def get_sample_info(self):
+        #sequence number and age in seconds of the sample behind the last position read
+        if self.sample_time is None:
+            return self.sample_sequence, None
+        return self.sample_sequence, time.perf_counter()-self.sample_time
+
     def get_mouse_pos(self, window_scale, window_size):
-        if self.haplyBoard.data_available():
-            pA0,pB0,pA,pB,pE = self.get_device_pos() #positions of the various points of the pantograph
-            pA0,pB0,pA,pB,xh = self.convert_pos((pA0,pB0,pA,pB,pE), window_scale=window_scale, window_size=window_size) #convert the physical positions to screen coordinates
+        with self.timer.stage('physics read'):
+            if self.sample_available():
+                pA0,pB0,pA,pB,pE = self.get_device_pos() #positions of the various points of the pantograph
+                pA0,pB0,pA,pB,xh = self.convert_pos((pA0,pB0,pA,pB,pE), window_scale=window_scale, window_size=window_size) #convert the physical positions to screen coordinates
 
-            return (int(xh[0]), int(xh[1]))
+                return (int(xh[0]), int(xh[1]))
 
     def convert_pos(self, positions, window_size, window_scale):
         #invert x because of screen axes
@@ -132,33 +253,35 @@ class Physics:
             return converted_positions
 
 
-    def update_force(self,f):
+    def update_force(self,f,wait=0.001):
         #Send forces to the device. Only works if a device is connected!
+        #wait: pause after writing in seconds, 0 when the caller paces the loop itself
         if self.device_present and self.port:
             #update and send torques
-            f[1] = -f[1] #graphical y axis is reversed
-            self.device.set_device_torques( f ) #forces in cartesian coordinates. Calculates the needed motor torques.
-            self.device.device_write_torques()
-            time.sleep(0.001) #pause for 1 millisecond
+            with self.timer.stage('physics write'):
+                f[1] = -f[1] #graphical y axis is reversed
+                self.device.set_device_torques( f ) #forces in cartesian coordinates. Calculates the needed motor torques.
+                self.device.device_write_torques()
+            if wait:
+                time.sleep(wait) #pause for 1 millisecond by default
         elif not self.device_present:
             print("debug vals:",self.device_present,self.port)
             raise ValueError("[PHYSICS] Cannot set device force if no device is connected!")
         
-    def serial_ports(self):
+    def serial_ports(self,port_override=None,use_cache=True,exclude=()):
         #Detect and Connect Physical device
         """ Lists serial port names """
-        ports = list(serial.tools.list_ports.comports())
-        result = []
-        for p in ports:
-            try:
-                port = p.device
-                s = serial.Serial(port)
-                s.close()
-                if p.description[0:12] == "Arduino Zero":
-                    result.append(port)
-                    print(p.description[0:12])
-            except (OSError, serial.SerialException):
-                pass
+        start_time = time.perf_counter()
+        cached = read_port_cache() if use_cache and not port_override else None
+        result = find_haply_ports(port_override, use_cache, exclude)
+        if port_override:
+            source = "override"
+        elif cached and result == [cached]:
+            source = "cache hit"
+        else:
+            source = "scan"
+        self.port_source = source
+        print("[PHYSICS]: Port discovery took %.1f ms (%s)"%((time.perf_counter()-start_time)*1000, source))
         return result
         
     def derive_device_pos(self,pe,recursive_call=0):
@@ -215,4 +338,7 @@ class Physics:
             #reset the force to 0, otherwise it will stay nonzero
             self.device.set_device_torques( [0,0] )
             self.device.device_write_torques()
-            time.sleep(0.001) #pause for 1 millisecond
\ No newline at end of file
+            time.sleep(0.001) #pause for 1 millisecond
+            if self.background_reader:
+                self.haplyBoard.stop_reader()
+            self.haplyBoard.close()
\ No newline at end of file
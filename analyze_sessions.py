@@ -0,0 +1,123 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from session_format import find_sessions, has_column, open_session, session_column
+
+# Summary columns: (key, header, format)
+COLUMNS = [
+    ('session', 'session', '{}'),
+    ('frames', 'frames', '{:d}'),
+    ('completion_time', 'time [s]', '{:.1f}'),
+    ('final_score', 'score', '{:.1f}'),
+    ('shocks', 'shocks', '{:d}'),
+    ('assist_time', 'assist [s]', '{:.1f}'),
+    ('special_time', 'special [s]', '{:.1f}'),
+    ('mouse_path', 'mouse path [px]', '{:.0f}'),
+    ('end_path', 'end path [px]', '{:.0f}'),
+    ('mean_speed', 'end speed [px/s]', '{:.0f}'),
+    ('mean_lag', 'mean lag [px]', '{:.1f}'),
+    ('max_lag', 'max lag [px]', '{:.1f}'),
+]
+
+
+def path_length(positions):
+    # Length of a (N, 2) path, frames with missing positions are skipped
+    steps = np.hypot(*np.diff(positions, axis=0).T)
+    return float(np.nansum(steps))
+
+
+def analyze_session(filename):
+    # Metrics of one session, an 'error' entry instead when the file cannot be read
+    name = os.path.basename(filename)
+    try:
+        session = open_session(filename)
+        result = {'session': name, 'frames': len(session)}
+        if not len(session):
+            return result
+
+        t = session_column(session, 'time').astype(float)
+        result['completion_time'] = float(t[-1])
+        # every frame holds its state until the next one
+        dt = np.append(np.diff(t), 0.0)
+        if has_column(session, 'score'):
+            result['final_score'] = float(session_column(session, 'score')[-1])
+        if has_column(session, 'shocks'):
+            result['shocks'] = int(np.max(session_column(session, 'shocks')))
+        for flag, key in (('assist_active', 'assist_time'), ('special_active', 'special_time')):
+            if has_column(session, flag):
+                result[key] = float(np.sum(dt[session_column(session, flag).astype(bool)]))
+
+        mouse_pos = session_column(session, 'mouse_pos').astype(float)
+        end_pos = session_column(session, 'end_pos').astype(float)
+        result['mouse_path'] = path_length(mouse_pos)
+        result['end_path'] = path_length(end_pos)
+        result['mean_speed'] = result['end_path'] / result['completion_time'] if result['completion_time'] > 0 else 0.0
+        # how far the cable end trails the handle, e.g. while the wall holds it back
+        lag = np.hypot(*(mouse_pos - end_pos).T)
+        result['mean_lag'] = float(np.nanmean(lag))
+        result['max_lag'] = float(np.nanmax(lag))
+        return result
+    except Exception as e:
+        return {'session': name, 'error': f"{type(e).__name__}: {e}"}
+
+
+def analyze_sessions(filenames, workers=None, chunksize=None):
+    # Runs analyze_session over a process pool, results come back in the order of filenames
+    if workers == 1:
+        return [analyze_session(filename) for filename in filenames]
+    workers = workers or os.cpu_count()
+    if chunksize is None:
+        chunksize = max(1, len(filenames) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(analyze_session, filenames, chunksize=chunksize))
+
+
+def format_table(results, columns=COLUMNS):
+    # Sessions that failed get their error message after the name instead of the metrics
+    rows = [[header for key, header, fmt in columns]]
+    rows += [[fmt.format(result[key]) if key in result else '-' for key, header, fmt in columns]
+             for result in results if 'error' not in result]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    widths[0] = max([widths[0]] + [len(result['session']) for result in results])
+    lines = ["  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(row))
+             for row in rows]
+    lines += [f"{result['session'].ljust(widths[0])}  {result['error']}" for result in results if 'error' in result]
+    return "\n".join(lines)
+
+
+def write_csv(results, path, columns=COLUMNS):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=[key for key, header, fmt in columns] + ['error'])
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    # python analyze_sessions.py [directory] [--workers N] [--csv summary.csv]
+    parser = argparse.ArgumentParser(description="Summarises every Cable_data session in a directory in parallel.")
+    parser.add_argument('directory', nargs='?', default='.')
+    parser.add_argument('--workers', type=int, help="worker processes, default: one per core, 1 runs in this process")
+    parser.add_argument('--csv', help="also write the summary to this CSV file")
+    args = parser.parse_args()
+
+    filenames = find_sessions(args.directory)
+    if not filenames:
+        print(f"no Cable_data sessions in {args.directory}")
+        return 1
+    start = time.perf_counter()
+    results = analyze_sessions(filenames, args.workers)
+    seconds = time.perf_counter() - start
+
+    print(format_table(results))
+    print(f"{len(results)} sessions in {seconds:.2f} s ({args.workers or os.cpu_count()} workers)")
+    if args.csv:
+        write_csv(results, args.csv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# Throughput of analyze_sessions over a directory of synthetic sessions, as JSON lines and converted to the
+# columnar format, at 1 worker (in process) and 2, 4, ... worker processes up to the core count or the
+# given maximum: sessions per second and speed-up over one worker. The speed-up can only follow the worker
+# count up to the number of cores, more workers than cores share them.
+# Run from the repository root: python benchmarks/bench_analyze_sessions.py [sessions] [max workers]
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import session_format
+from analyze_sessions import analyze_sessions
+from bench_session_load import FRAME_RATE, synthetic_records
+
+SESSION_SECONDS = 30  # about one game
+VARIANTS = 8  # distinct sessions, copied round robin to make up the count
+
+
+def worker_counts(maximum):
+    counts = [1]
+    while counts[-1] * 2 <= maximum:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != maximum:
+        counts.append(maximum)
+    return counts
+
+
+def write_sessions(directory, sessions):
+    frames = SESSION_SECONDS * FRAME_RATE
+    variants = []
+    for variant in range(VARIANTS):
+        path = os.path.join(directory, f"variant_{variant}.jsonl")
+        with open(path, 'w') as file:
+            for record in synthetic_records(frames + variant * FRAME_RATE):
+                file.write(json.dumps(record) + '\n')
+        variants.append(path)
+    jsonl, columnar = os.path.join(directory, 'jsonl'), os.path.join(directory, 'columnar')
+    os.mkdir(jsonl)
+    os.mkdir(columnar)
+    for session in range(sessions):
+        name = f"Cable_data_{session:04d}.jsonl"
+        shutil.copy(variants[session % VARIANTS], os.path.join(jsonl, name))
+        shutil.copy(variants[session % VARIANTS], os.path.join(columnar, name))
+        session_format.convert_session(os.path.join(columnar, name))
+        os.remove(os.path.join(columnar, name))
+    return jsonl, columnar
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    maximum = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    with tempfile.TemporaryDirectory() as directory:
+        jsonl, columnar = write_sessions(directory, sessions)
+        print(f"{sessions} sessions of {SESSION_SECONDS} s at {FRAME_RATE} Hz, {os.cpu_count()} cores")
+        print(f"{'format':>9} {'workers':>8} {'seconds':>8} {'sessions/s':>11} {'speed-up':>9}")
+        for name, path in (('jsonl', jsonl), ('columnar', columnar)):
+            filenames = session_format.find_sessions(path)
+            single = None
+            for workers in worker_counts(maximum):
+                start = time.perf_counter()
+                results = analyze_sessions(filenames, workers)
+                seconds = time.perf_counter() - start
+                assert len(results) == sessions and not any('error' in result for result in results)
+                single = single or seconds
+                print(f"{name:>9} {workers:>8} {seconds:>8.2f} {sessions / seconds:>11.1f} {single / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Per-call cost of Board.transmit/receive as used by Device.device_write_torques and device_read_data,
+# and a check that the frames are byte-identical to the old float_to_bytes/bytes_to_float encoding.
+# Run from the repository root: python benchmarks/bench_board_packing.py
+import os
+import random
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from HaplyHAPI import Board, Device, Pantograph
+
+CALLS = 20000
+
+
+class MemoryPort:
+    # In-memory stand-in for serial.Serial, keeps the last written frame and replays a fixed reply
+    def __init__(self, reply=b""):
+        self.reply = reply
+        self.written = b""
+
+    def write(self, data):
+        self.written = bytes(data)
+        return len(data)
+
+    def read(self, size):
+        return self.reply[:size]
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self.reply))
+        buffer[:size] = self.reply[:size]
+        return size
+
+    @property
+    def in_waiting(self):
+        return len(self.reply)
+
+
+def old_frame(board, communicationType, deviceID, bData, fData):
+    outData = bytearray(2 + len(bData) + 4*len(fData))
+    outData[0] = communicationType
+    outData[1] = deviceID
+    outData[2:2+len(bData)] = bData
+    j = 2+len(bData)
+    for value in fData:
+        outData[j:j+4] = board.float_to_bytes(value)
+        j = j+4
+    return bytes(outData)
+
+
+def old_decode(board, inData, expected):
+    buf = inData[1:expected*4+1]
+    return [board.bytes_to_float(buf[i*4:i*4+4]) for i in range(expected)]
+
+
+def make_device(port):
+    # Same actuator and encoder setup as Physics for hardware version 3
+    board = Board("bench", port, 0)
+    device = Device(5, board)
+    device.set_mechanism(Pantograph(3))
+    device.add_actuator(1, 1, 2)
+    device.add_actuator(2, 1, 1)
+    device.add_encoder(1, 1, 168, 4880, 2)
+    device.add_encoder(2, 1, 12, 4880, 1)
+    return board, device
+
+
+def check_identical(board, port):
+    for _ in range(1000):
+        fData = [random.uniform(-1e3, 1e3) for _ in range(random.randint(0, 6))]
+        bData = bytearray(random.getrandbits(8) for _ in range(random.randint(0, 4)))
+        board.transmit(2, 5, bData, fData)
+        assert port.written == old_frame(board, 2, 5, bData, fData)
+
+        values = [random.uniform(-360, 360) for _ in range(2)]
+        port.reply = bytes([5]) + struct.pack('<2f', *values)
+        assert board.receive(2, 5, 2) == old_decode(board, port.reply, 2)
+
+
+def per_call(function):
+    return min(timeit.repeat(function, number=CALLS, repeat=5)) / CALLS
+
+
+def main():
+    port = MemoryPort(bytes([5]) + struct.pack('<2f', 97.3, 82.7))
+    board, device = make_device(port)
+    device.device_set_parameters()
+    check_identical(board, port)
+    print("frames are byte-identical to the float_to_bytes/bytes_to_float encoding")
+
+    device.set_device_torques([0.0, 0.0])
+    torques = [0.25, -0.125]
+    pulses = bytearray(0)
+    rows = [
+        ("transmit (2 floats)", per_call(lambda: board.transmit(2, 5, pulses, torques))),
+        ("old transmit (2 floats)", per_call(lambda: port.write(old_frame(board, 2, 5, pulses, torques)))),
+        ("receive (2 floats)", per_call(lambda: board.receive(2, 5, 2))),
+        ("old receive (2 floats)", per_call(lambda: old_decode(board, port.read(9), 2))),
+        ("device_write_torques", per_call(device.device_write_torques)),
+        ("device_read_data", per_call(device.device_read_data)),
+    ]
+    print(f"{'call':>24} {'us/call':>9} {'% of 1 ms':>10}")
+    for name, seconds in rows:
+        print(f"{name:>24} {seconds * 1e6:>9.2f} {seconds * 1e5:>9.2f}%")
+
+
+if __name__ == "__main__":
+    main()
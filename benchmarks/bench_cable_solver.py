@@ -0,0 +1,80 @@
+# Fixed 10 passes against the tolerance driven constraint solver, for a settled locked cable and for an
+# unlocked cable whipped across the screen and for a plugged cable pinned far beyond its rest length:
+# passes per update, how far points still moved in the last pass, stretch left over (the pinned last segment
+# not counted) and time per update.
+# Run from the repository root: python benchmarks/bench_cable_solver.py
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+import pygame
+from helpers import Cable, CableSystem
+
+FRAMES = 300
+SETTINGS = [(None, None), (2, None), (1, None), (0.5, None), (0.5, 20)]  # (tolerance in pixels, max_iterations)
+
+
+def scenarios():
+    # name: (locked, targets per frame)
+    whip = [(200 + 450 * (i % 2), 100 + 400 * ((i // 2) % 2)) for i in range(FRAMES)]
+    # the plugged end sits in the hole of cable_sim's scene, about 580 px from the anchor of a 95 px cable
+    return {'settled, locked': (True, [(0, 0)] * FRAMES), 'whipped, unlocked': (False, whip),
+            'plugged': (False, [(711, 200)] * FRAMES)}
+
+
+def configure(solver, tolerance, max_iterations):
+    solver.tolerance = tolerance
+    if max_iterations is not None:
+        solver.max_iterations = max_iterations
+
+
+def run(cable, targets, update):
+    iterations, moved, stretch = [], [], []
+    seconds = 0.0
+    for target in targets:
+        start = time.perf_counter()
+        update(target)
+        seconds += time.perf_counter() - start
+        iterations.append(cable.solver_iterations)
+        moved.append(cable.solver_residual)
+        stretch.append(cable.get_stretch_residual())
+    half = len(targets) // 2
+    return seconds / len(targets), np.mean(iterations), np.max(moved[half:]), np.max(stretch[half:])
+
+
+def main():
+    pygame.init()
+    screen = pygame.Surface((800, 600))
+    print(f"{'scenario':>18} {'tolerance':>10} {'max it':>7} {'solver':>12} {'passes':>7} {'moved':>7} {'stretch':>8} {'us/update':>10}")
+    for name, (locked, targets) in scenarios().items():
+        for tolerance, max_iterations in SETTINGS:
+            cable = Cable((133, 150), screen, (0, 77, 64), target=(711, 200))
+            cable.locked = locked
+            for _ in range(200):
+                cable.update(targets[0])  # settle first
+            configure(cable, tolerance, max_iterations)
+            seconds, passes, moved, stretch = run(cable, targets, cable.update)
+
+            system_cables = [Cable((133, 150 + 100 * i), screen, (0, 77, 64), target=(711, 200)) for i in range(3)]
+            system = CableSystem(system_cables)
+            for system_cable in system_cables:
+                system_cable.locked = locked
+            for _ in range(200):
+                system.update(targets[0])
+            configure(system, tolerance, max_iterations)
+            system_seconds, system_passes, system_moved, system_stretch = run(system_cables[0], targets, system.update)
+
+            shown = "fixed 10" if tolerance is None else f"{tolerance:g}"
+            limit = "" if tolerance is None else str(max_iterations or cable.max_iterations)
+            print(f"{name:>18} {shown:>10} {limit:>7} {'Cable':>12} {passes:>7.1f} {moved:>7.3f} {stretch:>8.3f} "
+                  f"{seconds * 1e6:>10.1f}")
+            print(f"{'':>18} {'':>10} {'':>7} {'CableSystem 3':>12} {system_passes:>7.1f} {system_moved:>7.3f} "
+                  f"{system_stretch:>8.3f} {system_seconds * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
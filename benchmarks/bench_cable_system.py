@@ -0,0 +1,52 @@
+# Compares updating every Cable on its own against one CableSystem pass over all of them.
+# Run from the repository root: python benchmarks/bench_cable_system.py
+import os
+import sys
+import timeit
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import pygame
+from helpers import Cable, CableSystem
+
+CABLE_COUNTS = (3, 12, 36, 96)
+FRAMES = 200
+
+
+def make_cables(screen, count):
+    cables = [Cable((133, 50 + 5 * i), screen, (0, 77, 64), target=(711, 200)) for i in range(count)]
+    cables[0].locked = False
+    return cables
+
+
+def frame_cost(update, frames=FRAMES):
+    targets = [(300 + 100 * (i % 7), 200 + 30 * (i % 11)) for i in range(frames)]
+
+    def run():
+        for target in targets:
+            update(target)
+
+    return min(timeit.repeat(run, number=1, repeat=5)) / frames
+
+
+def main():
+    pygame.init()
+    screen = pygame.Surface((800, 600))
+    print(f"{'cables':>6} {'per cable [us]':>15} {'system [us]':>12} {'speed-up':>9}")
+    for count in CABLE_COUNTS:
+        cables = make_cables(screen, count)
+
+        def update_each(target):
+            for cable in cables:
+                cable.update(target)
+
+        system = CableSystem(make_cables(screen, count))
+        before = frame_cost(update_each)
+        after = frame_cost(system.update)
+        print(f"{count:>6} {before * 1e6:>15.1f} {after * 1e6:>12.1f} {before / after:>8.1f}x")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Compares the frame cost of Cable.update, on the float and on the numpy path, against the original
+# pygame.Vector2 loop, and checks the float path gives exactly what the loop did.
+# Run from the repository root: python benchmarks/bench_cable_update.py
+import os
+import sys
+import timeit
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import pygame
+from helpers import Cable, CableSystem, SCALAR_SEGMENTS
+
+SEGMENT_COUNTS = (20, 100, 500)
+FRAMES = 200
+
+
+class VectorCable:
+    # The per-segment Vector2 update that Cable used before the array backend
+    def __init__(self, anchor, segments, length=5):
+        self.SEGMENTS, self.LENGTH = segments, length
+        self.GRAVITY = pygame.Vector2(0, 5.0)
+        self.anchor = anchor
+        self.points = [pygame.Vector2(anchor[0], anchor[1] + i * self.LENGTH) for i in range(self.SEGMENTS)]
+        self.old_points = self.points[:]
+        self.locked = False
+        self.locked_position = pygame.Vector2(anchor[0] + 100, anchor[1])
+
+    def update(self, target):
+        for i in range(1, self.SEGMENTS):
+            if self.locked and i == self.SEGMENTS - 1:
+                continue
+            velocity = (self.points[i] - self.old_points[i])
+            self.old_points[i] = self.points[i]
+            self.points[i] += velocity + self.GRAVITY
+
+        for _ in range(10):
+            self.points[0] = pygame.Vector2(self.anchor)
+            for i in range(self.SEGMENTS - 1):
+                delta = self.points[i + 1] - self.points[i]
+                if delta.length():
+                    correction = delta * ((delta.length() - self.LENGTH) / delta.length()) * 0.5
+                    self.points[i] += correction
+                    self.points[i + 1] -= correction
+
+        if self.locked:
+            self.points[-1] = pygame.Vector2(self.locked_position)
+        else:
+            self.points[-1] = pygame.Vector2(target)
+
+
+def frame_cost(update, frames=FRAMES):
+    targets = [(300 + 100 * (i % 7), 200 + 30 * (i % 11)) for i in range(frames)]
+
+    def run():
+        for target in targets:
+            update(target)
+
+    return min(timeit.repeat(run, number=1, repeat=5)) / frames
+
+
+def main():
+    pygame.init()
+    screen = pygame.Surface((800, 600))
+    targets = [(300 + 100 * (i % 7), 200 + 30 * (i % 11)) for i in range(FRAMES)]
+    vector_cable = VectorCable((133, 150), 20)
+    float_cable = Cable((133, 150), screen, (0, 77, 64), target=(711, 200))
+    float_cable.locked = False
+    for target in targets:
+        vector_cable.update(target)
+        float_cable.update(target)
+    assert all(tuple(a) == tuple(b) for a, b in zip(vector_cable.points, float_cable.points.tolist()))
+    print("floats: bit for bit the Vector2 loop over 200 frames")
+
+    print(f"{'segments':>8} {'Vector2 [us]':>14} {'floats [us]':>12} {'numpy [us]':>12} {'default':>8}")
+    for segments in SEGMENT_COUNTS:
+        vector_cable = VectorCable((133, 150), segments)
+        costs = []
+        for scalar_segments in (segments, 0):
+            cable = Cable((133, 150), screen, (0, 77, 64), target=(711, 200), segments=segments)
+            cable.locked = False
+            cable.scalar_segments = scalar_segments
+            costs.append(frame_cost(cable.update))
+        default = "floats" if segments <= SCALAR_SEGMENTS else "numpy"
+        print(f"{segments:>8} {frame_cost(vector_cable.update) * 1e6:>14.1f} {costs[0] * 1e6:>12.1f} {costs[1] * 1e6:>12.1f} {default:>8}")
+
+    # The app: three 20 segment cables in one CableSystem
+    costs = []
+    for scalar_segments in (SCALAR_SEGMENTS, 0):
+        cables = [Cable((133, 150 + 100 * i), screen, (0, 77, 64), target=(711, 200)) for i in range(3)]
+        system = CableSystem(cables)
+        cables[0].locked = False
+        system.scalar_segments = scalar_segments
+        costs.append(frame_cost(system.update))
+    vector_cables = [VectorCable((133, 150 + 100 * i), 20) for i in range(3)]
+    vector_cost = frame_cost(lambda target: [cable.update(target) for cable in vector_cables])
+    print(f"{'3 x 20':>8} {vector_cost * 1e6:>14.1f} {costs[0] * 1e6:>12.1f} {costs[1] * 1e6:>12.1f} {'floats':>8}   (CableSystem)")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
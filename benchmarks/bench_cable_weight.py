@@ -0,0 +1,98 @@
+# Checks the closed-form, cached weight forces against the original per-segment Vector2.project loop and
+# compares the cost of one physics step as cable_sim sees it: one update, then the haptic thread reading the
+# weight of every cable ten times (1000 Hz forces against 100 Hz cable steps).
+# Run from the repository root: python benchmarks/bench_cable_weight.py
+import os
+import random
+import sys
+import timeit
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import pygame
+from helpers import Cable, CableSystem
+
+STEPS = 200
+READS_PER_STEP = 10
+
+
+def loop_force_weight(cable):
+    # Cable.get_force_weight as it was
+    F = pygame.Vector2(0,0)
+    points = [pygame.Vector2(p) for p in cable.points.tolist()]
+    for i in range(len(points)-1):
+        a = len(points)-i-1
+        first = points[a]
+        sec = points[a-1]
+        dir = first - sec
+        dir = dir.normalize()
+        if first[1] <= sec[1]:
+            F[1] -= cable.segment_weight
+        F[0] += pygame.Vector2(0,cable.segment_weight).project(dir).project(pygame.Vector2(1,0))[0]
+    return F
+
+
+def make_cables(screen):
+    cables = [Cable((133, 150 + 100 * i), screen, (0, 77, 64), target=(711, 200 + 100 * i)) for i in range(3)]
+    cables[0].locked = False
+    return cables
+
+
+def check_parity(screen):
+    random.seed(1)
+    cables = make_cables(screen)
+    system = CableSystem(make_cables(screen))
+    worst = 0.0
+    for step in range(500):
+        target = (random.uniform(150, 690), random.uniform(50, 590))
+        for cable in cables:
+            cable.update(target)
+        system.update(target)
+        forces = system.get_forces_weight()
+        for index, cable in enumerate(cables):
+            expected = loop_force_weight(cable)
+            worst = max(worst, (cable.get_force_weight() - expected).length(),
+                        (pygame.Vector2(*forces[index]) - loop_force_weight(system.cables[index])).length())
+    assert worst < 1e-9, worst
+    return worst
+
+
+def step_cost(update, read):
+    targets = [(300 + 100 * (i % 7), 200 + 30 * (i % 11)) for i in range(STEPS)]
+
+    def run():
+        for target in targets:
+            update(target)
+            for _ in range(READS_PER_STEP):
+                read()
+
+    return min(timeit.repeat(run, number=1, repeat=5)) / STEPS
+
+
+def main():
+    pygame.init()
+    screen = pygame.Surface((800, 600))
+    print(f"largest difference to the Vector2 loop: {check_parity(screen):.2e}")
+
+    cables = make_cables(screen)
+
+    def update_all(target):
+        for cable in cables:
+            cable.update(target)
+
+    system = CableSystem(make_cables(screen))
+    rows = [
+        ("no reads, 3 Cable.update", step_cost(update_all, lambda: None)),
+        ("no reads, CableSystem.update", step_cost(system.update, lambda: None)),
+        ("Vector2 loop, every cable", step_cost(update_all, lambda: [loop_force_weight(cable) for cable in cables])),
+        ("Cable.get_force_weight", step_cost(update_all, lambda: [cable.get_force_weight() for cable in cables])),
+        ("CableSystem.get_forces_weight", step_cost(system.update, system.get_forces_weight)),
+    ]
+    print(f"{'weight read':>30} {'us per step':>12}   ({READS_PER_STEP} reads of 3 cables + 1 update)")
+    for name, seconds in rows:
+        print(f"{name:>30} {seconds * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Frame time of drawing the connector ends of all three cables, with and without the shared sprite cache.
+# Run from the repository root: python benchmarks/bench_connector_sprites.py
+import math
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import pygame
+from helpers import Cable, CableSystem, SpriteCache
+
+W, H = 800, 600
+FRAMES = 2000
+
+
+def run(screen, cache):
+    Cable.sprite_cache = cache
+    cables = [
+        Cable((W // 6, H // 4), screen, (0, 77, 64), target=(711, 200)),
+        Cable((W // 6, H // 4 + 100), screen, (30, 136, 229), target=(711, 300)),
+        Cable((W // 6, H // 4 + 200), screen, (255, 193, 7), target=(711, 400)),
+    ]
+    system = CableSystem(cables)
+    cables[0].locked = False
+    cables[1].enable_lightning(1e6)
+    cache.clear()
+
+    connector_time = 0.0
+    frame_time = 0.0
+    for frame in range(FRAMES):
+        t = frame / 100
+        system.update((400 + 250 * math.cos(t), 300 + 200 * math.sin(1.3 * t)))
+        start_time = time.perf_counter()
+        screen.fill((255, 255, 255))
+        for cable in cables:
+            cable.draw()
+        frame_time += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for cable in cables:
+            cable.draw_connector_end()
+        connector_time += time.perf_counter() - start_time
+    return connector_time / FRAMES, frame_time / FRAMES
+
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode((W, H))
+    print(f"{'mode':>22} {'connectors [us]':>16} {'cable draw [us]':>16} {'hits':>7} {'misses':>7} {'cached':>7}")
+    for name, cache in (("no cache", SpriteCache(max_size=0)),
+                        ("cache, 1 deg", SpriteCache(resolution=1.0)),
+                        ("cache, 3 deg", SpriteCache(resolution=3.0))):
+        connector, frame = run(screen, cache)
+        print(f"{name:>22} {connector * 1e6:>16.1f} {frame * 1e6:>16.1f} {cache.hits:>7} {cache.misses:>7} {len(cache.sprites):>7}")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Period between haptic ticks (torque writes when a device is connected) while the renderer hiccups: every
+# frame draws the cables, every 10th frame also holds the GIL for 30 ms like a slow font render or a window
+# move. Once with the haptic thread in the render process, as in cable_sim, once split over two processes
+# with multiprocess_sim.PhysicsProcess. The mouse sweeps across the screen, no device needed. The split only
+# pays off with a core for each process, on one core the scheduler time-slices them like threads.
+# Run from the repository root: python benchmarks/bench_multiprocess.py [seconds per variant]
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import pygame
+from haptics import HapticLoop
+from multiprocess_sim import PhysicsProcess
+from Physics import Physics
+from scene import CableScene, W, H, window_scale
+from stage_timer import StageTimer
+
+HICCUP_EVERY = 10
+HICCUP_MS = 30
+
+
+def hiccup(ms):
+    # Python work that keeps the GIL apart from the interpreter's switch interval
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        sum(i * i for i in range(1000))
+
+
+def mouse_at(t):
+    return (W // 2 + 250 * math.sin(t), H // 2 + 150 * math.sin(1.3 * t))
+
+
+def render_loop(scene, seconds, set_mouse_pos, step=None):
+    # The render side: 100 Hz frames drawing the cables, with the hiccups
+    surface = pygame.Surface((W, H))
+    start = time.perf_counter()
+    frame = 0
+    while time.perf_counter() - start < seconds:
+        frame_start = time.perf_counter()
+        set_mouse_pos(mouse_at(frame_start - start))
+        if step is not None:
+            step()
+        surface.fill((255, 255, 255))
+        for cable in scene.cables:
+            cable.screen = surface
+            cable.draw()
+        if frame % HICCUP_EVERY == 0:
+            hiccup(HICCUP_MS)
+        frame += 1
+        time.sleep(max(0.0, 0.01 - (time.perf_counter() - frame_start)))
+
+
+def single_process(seconds):
+    timer = StageTimer(enabled=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        physics = Physics(hardware_version=3, port=None, timer=timer)
+    scene = CableScene(pygame.Surface((W, H)))
+    lock = threading.Lock()
+    haptic = HapticLoop(physics, scene.compute_force, lock, window_scale=window_scale, window_size=(W, H), timer=timer)
+    haptic.snapshot = scene.compute_force(haptic.raw_pos)
+    haptic.start()
+
+    def step():
+        with lock:
+            scene.step(haptic.snapshot['mouse_pos'])
+            scene.place_connectors()
+
+    render_loop(scene, seconds, haptic.set_mouse_pos, step)
+    haptic.stop()
+    physics.close()
+    return timer.summary()['haptic period']
+
+
+def split_processes(seconds, directory):
+    scene = CableScene(pygame.Surface((W, H)))
+    path = os.path.join(directory, "Cable_data_bench.jsonl")
+    physics = PhysicsProcess(scene, path, profile=True)
+    physics.start(mouse_at(0))
+    frame = physics.state.new_frame()
+    while physics.read(frame) is None:
+        time.sleep(0.01)
+
+    def step():
+        if physics.read(frame) is not None:
+            scene.cable_system.points[...] = frame['points']
+
+    render_loop(scene, seconds, physics.set_mouse_pos, step)
+    physics.stop()
+    with open(os.path.splitext(path)[0] + "_timing.json", encoding='utf-8') as file:
+        return json.load(file)['haptic period']
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    pygame.init()
+    print(f"render hiccups: {HICCUP_MS} ms holding the GIL every {HICCUP_EVERY} frames, {seconds:g} s per variant, {os.cpu_count()} cores")
+    print(f"{'haptic period':>24}{'ticks':>8}{'mean':>8}{'p50':>8}{'p99':>8}{'max':>8} ms")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, run in (('one process', lambda: single_process(seconds)),
+                          ('physics process', lambda: split_processes(seconds, directory))):
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run()
+            print(f"{name:>24}{result['count']:>8}{result['mean']:>8.3f}{result['p50']:>8.3f}{result['p99']:>8.3f}{result['max']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
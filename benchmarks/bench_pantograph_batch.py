@@ -0,0 +1,84 @@
+# Checks Pantograph.forwardKinematicsBatch/torqueCalculationBatch against the scalar forwardKinematics/torqueCalculation
+# and compares their throughput in poses per second.
+# Run from the repository root: python benchmarks/bench_pantograph_batch.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+from HaplyHAPI import Pantograph
+
+SIZES = (1000, 100000, 1000000)
+CHECKED = 20000
+
+
+def workspace_angles(count, rng):
+    # Encoder angles around the working area of the version 3 device, plus a few fixed poses
+    angles = np.column_stack((rng.uniform(60, 170, count), rng.uniform(10, 120, count)))
+    angles[:5] = [[168, 12], [97.3, 82.7], [90, 90], [120, 60], [0, 180]]  # the last one fully spread
+    return angles
+
+
+def scalar(pantograph, angles, forces):
+    # positions, Jacobians and torques from the scalar path, one call at a time
+    positions = np.empty((len(angles), 2))
+    jacobians = np.empty((len(angles), 2, 2))
+    torques = np.empty((len(angles), 2))
+    valid = np.ones(len(angles), dtype=bool)
+    for i, (pose, force) in enumerate(zip(angles.tolist(), forces.tolist())):
+        try:
+            pantograph.forwardKinematics(pose)
+        except ValueError:
+            valid[i] = False  # math domain error, the batch gives nan
+            continue
+        positions[i] = pantograph.get_coordinate()
+        # unit forces give the Jacobian columns: tau = (J11 fx + J12 fy, J21 fx + J22 fy)
+        pantograph.torqueCalculation((1.0, 0.0))
+        jacobians[i, :, 0] = pantograph.get_torque()
+        pantograph.torqueCalculation((0.0, 1.0))
+        jacobians[i, :, 1] = pantograph.get_torque()
+        pantograph.torqueCalculation(force)
+        torques[i] = pantograph.get_torque()
+    return positions, jacobians, torques, valid
+
+
+def main():
+    rng = np.random.default_rng(1)
+    pantograph = Pantograph(3)
+
+    angles = workspace_angles(CHECKED, rng)
+    forces = rng.uniform(-2, 2, (CHECKED, 2))
+    positions, jacobians, torques, valid = scalar(pantograph, angles, forces)
+    batch_positions, batch_jacobians = pantograph.forwardKinematicsBatch(angles)
+    batch_torques = pantograph.torqueCalculationBatch(batch_jacobians, forces)
+
+    assert np.isnan(batch_positions[~valid]).any(axis=1).all()
+    for name, expected, actual in (("positions", positions, batch_positions), ("jacobians", jacobians, batch_jacobians),
+                                   ("torques", torques, batch_torques)):
+        error = np.max(np.abs(expected[valid] - actual[valid]))
+        print(f"{name}: max abs difference {error:.2e} over {valid.sum()} poses")
+        assert error < 1e-9, name
+    print(f"{(~valid).sum()} poses outside the scalar domain, all nan in the batch")
+
+    print(f"{'poses':>8} {'scalar [poses/s]':>17} {'batch [poses/s]':>16} {'speed-up':>9}")
+    for size in SIZES:
+        angles = workspace_angles(size, rng)
+        sample = angles[:min(size, CHECKED)].tolist()
+        start = time.perf_counter()
+        for pose in sample:
+            try:
+                pantograph.forwardKinematics(pose)
+            except ValueError:
+                pass
+        scalar_rate = len(sample) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pantograph.forwardKinematicsBatch(angles)
+        batch_rate = size / (time.perf_counter() - start)
+        print(f"{size:>8} {scalar_rate:>17.0f} {batch_rate:>16.0f} {batch_rate / scalar_rate:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
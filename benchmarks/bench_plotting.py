@@ -0,0 +1,89 @@
+# Time to open a long synthetic session as a figure and draw it, every raw sample against lines decimated to
+# the axis width (min/max and LTTB), plus the cost of re-decimating for a zoom. Checks that min/max keeps
+# every extreme of each pixel column.
+# Run from the repository root: python benchmarks/bench_plotting.py [hours]
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import plotting
+import session_format
+
+FRAME_RATE = 100  # Hz, the render loop rate
+
+
+def synthetic_columns(frames):
+    rng = np.random.default_rng(1)
+    t = np.arange(frames) / FRAME_RATE
+    mouse_pos = np.stack((400 + 200 * np.sin(t / 3), 300 + 150 * np.sin(t / 7)), axis=1)
+    force = np.stack((np.sin(t), np.cos(t)), axis=1) + rng.normal(0, 0.1, (frames, 2))
+    force[rng.integers(0, frames, 50)] = 40.0  # shocks, a single sample each
+    return {'time': t, 'Force': force, 'mouse_pos': np.floor(mouse_pos), 'end_pos': mouse_pos}
+
+
+def check_extremes(x, y, pixels):
+    # Every pixel column of the decimated line has the same min and max as the raw samples in it
+    dx, dy = plotting.decimate(x, y, pixels)
+    size = -(-len(y) // (pixels * plotting.POINTS_PER_PIXEL // 2))
+    raw = np.pad(y, (0, -len(y) % size), mode='edge').reshape(-1, size)
+    assert np.isin(raw.max(axis=1), dy).all() and np.isin(raw.min(axis=1), dy).all()
+    assert dy.max() == y.max() and dy.min() == y.min()
+    return len(dy)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def open_and_draw(path, method):
+    session_figure = plotting.SessionFigure(session_format.open_session(path), method=method)
+    session_figure.figure.canvas.draw()
+    return session_figure
+
+
+def open_and_draw_raw(path):
+    # helpers.plot_data as it was: every sample of every line
+    session = session_format.open_session(path)
+    figure = matplotlib.figure.Figure(figsize=(12, 8))
+    axes = figure.subplots(3, 1, sharex=True)
+    for ax, name in zip(axes, ('end_pos', 'mouse_pos', 'Force')):
+        ax.plot(session['time'], session[name][:, 0], "b")
+        ax.plot(session['time'], session[name][:, 1], "r")
+    figure.canvas.draw()
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    frames = int(hours * 3600 * FRAME_RATE)
+    columns = synthetic_columns(frames)
+    print(f"{hours:g} h session, {frames} frames, decimated min/max line: "
+          f"{check_extremes(columns['time'], columns['Force'][:, 0], 1000)} points")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Cable_data_bench.cses")
+        session_format.write_columns(path, columns)
+
+        rows = [("raw samples", lambda: open_and_draw_raw(path))]
+        rows += [(f"decimated, {method}", lambda method=method: open_and_draw(path, method)) for method in plotting.METHODS]
+        for name, function in rows:
+            seconds, _ = timed(function)
+            print(f"{name:>20}: {seconds * 1000:10.1f} ms to open and draw")
+
+        session_figure = open_and_draw(path, 'minmax')
+        ax = session_figure.axes[0]
+        t_end = columns['time'][-1]
+        zooms = [(t_end * i / 20, t_end * i / 20 + t_end / 10) for i in range(10)]
+        seconds, _ = timed(lambda: [ax.set_xlim(*zoom) or session_figure.update() for zoom in zooms])
+        print(f"{'zoom, min/max':>20}: {seconds / len(zooms) * 1000:10.1f} ms to re-decimate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# Startup cost of finding the Haply board: the old open-every-port scan, the filtered scan and the cached port.
+# Run from the repository root: python benchmarks/bench_port_discovery.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import serial.tools.list_ports
+import Physics
+
+REPEAT = 5
+
+
+def open_every_port():
+    # What serial_ports did before: open and close every port, then look at the description
+    result = []
+    for p in serial.tools.list_ports.comports():
+        if Physics.can_open(p.device) and p.description[0:12] == "Arduino Zero":
+            result.append(p.device)
+    return result
+
+
+def best_time(function):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start_time = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+
+def main():
+    ports = list(serial.tools.list_ports.comports())
+    print(f"{len(ports)} serial ports on this machine, cached port: {Physics.read_port_cache()}")
+    rows = [
+        ("open every port", lambda: open_every_port()),
+        ("filtered scan, no cache", lambda: Physics.find_haply_ports(use_cache=False)),
+        ("with cache", lambda: Physics.find_haply_ports(use_cache=True)),
+    ]
+    for name, function in rows:
+        seconds, result = best_time(function)
+        print(f"{name:>24}: {seconds * 1000:8.2f} ms  -> {result}")
+
+
+if __name__ == "__main__":
+    main()
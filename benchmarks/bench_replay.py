@@ -0,0 +1,90 @@
+# Records a headless_sim session with a shock, assist and special mode and every cable plugged in, replays it
+# and checks the replay reproduces the log exactly, also after seeking through checkpoints and with the keys
+# inferred instead of recorded. Then times the replay speed-up and seeking with and without checkpoints.
+# Run from the repository root: python benchmarks/bench_replay.py [repeats of the script]
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import pygame
+import headless_sim
+from replay import Replay
+from scene import CableScene, W, H
+from telemetry import TelemetryWriter, load_session
+
+
+def record_session(path, repeats):
+    clock = headless_sim.SimClock()
+    scene = CableScene(pygame.Surface((W, H)), clock=clock)
+    start = (W // 2, H - 50)
+    headless_sim.settle(scene, clock, 1.0, 0.01, start)
+    plug = headless_sim.plug_all_script(scene, start)
+    red = scene.cables[1].red_rect_rect.center
+    # a shock, assist on and off, special mode on and off, then the plug-in script `repeats` times (the later
+    # rounds press at the port positions of the first one, mostly more shocks)
+    waypoints = [(0, start), (0.5, red), (0.8, red)]
+    keys = [(0.6, ord(' ')), (0.7, ord('c')), (1.0, ord('v')), (1.5, ord('v')), (1.6, ord('c'))]
+    offset = 2.0
+    for _ in range(repeats):
+        waypoints += [(t + offset, pos) for t, pos in plug.waypoints]
+        keys += [(t + offset, key) for t, key in plug.keys]
+        offset += plug.duration + 0.5
+    telemetry = TelemetryWriter(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        headless_sim.run_headless(scene, clock, headless_sim.Trajectory(waypoints, keys), telemetry=telemetry,
+                                  stop_when_finished=False)
+    telemetry.close()
+    return load_session(path)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    pygame.init()
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()) as scores:
+        session = record_session(os.path.join(directory, "Cable_data_bench.jsonl"), repeats)
+    frames = len(session)
+    duration = session[-1]['time'] - session[0]['time']
+
+    with contextlib.redirect_stdout(scores):
+        replay = Replay(session)
+        seconds, records = timed(lambda: [replay.step_frame() for _ in range(frames)])
+    summary = replay.summary()
+    assert summary['force_max'] == 0 and summary['end_pos_max'] == 0, summary
+    assert [record['score'] for record in records] == [record['score'] for record in session]
+    print(f"{frames} frames, {duration:.1f} s session, shocks {summary['shocks']}, final score {summary['score']:.1f}")
+    print(f"{'replay, no window':>28}: {seconds:8.3f} s, {duration / seconds:6.1f}x real time, exact")
+
+    targets = [frames * i // 10 for i in (9, 2, 7, 4, 1)]
+    with contextlib.redirect_stdout(scores):
+        seconds, _ = timed(lambda: [Replay(session).run(target) for target in targets])
+    print(f"{'seek, replay from start':>28}: {seconds / len(targets) * 1000:8.1f} ms per seek")
+    with contextlib.redirect_stdout(scores):
+        for target in targets:
+            replay.seek(target)
+            assert replay.step_frame() == records[target]
+        seconds, _ = timed(lambda: [replay.seek(target) for target in targets])
+    print(f"{'seek, 1 s checkpoints':>28}: {seconds / len(targets) * 1000:8.1f} ms per seek, exact")
+
+    for record in session:
+        del record['keys']
+    with contextlib.redirect_stdout(scores):
+        inferred = Replay(session)
+        inferred.run()
+    assert inferred.keys_source == 'inferred' and inferred.summary()['force_max'] == 0
+    print(f"{'keys inferred from the log':>28}: exact")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Load time of a long synthetic session as JSON, JSON lines and the columnar format.
+# Run from the repository root: python benchmarks/bench_session_load.py [hours]
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+import session_format
+from telemetry import load_session
+
+FRAME_RATE = 100  # Hz, the render loop rate
+
+
+def synthetic_records(frames):
+    for i in range(frames):
+        t = i / FRAME_RATE
+        yield {'time': t, 'Force': (math.sin(t), math.cos(t)), 'Force_locked_cable': (0.4, -4.0),
+               'Force_wall': (0.0, 0.0), 'mouse_pos': (400 + int(200 * math.sin(t / 3)), 300),
+               'end_pos': (400 + int(200 * math.sin(t / 3)), 300), 'shocks': i // 10000,
+               'score': 50 - t, 'assist_active': i % 2 == 0, 'special_active': False}
+
+
+def timed(function):
+    start_time = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start_time, result
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    frames = int(hours * 3600 * FRAME_RATE)
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "Cable_data_bench.json")
+        jsonl_path = os.path.join(directory, "Cable_data_bench.jsonl")
+        with open(json_path, 'w') as file:
+            json.dump(list(synthetic_records(frames)), file)
+        with open(jsonl_path, 'w') as file:
+            for record in synthetic_records(frames):
+                file.write(json.dumps(record) + '\n')
+
+        convert_time, columnar_path = timed(lambda: session_format.convert_session(jsonl_path))
+        print(f"{hours:g} h session, {frames} frames, converted in {convert_time:.2f} s")
+        for path in (json_path, jsonl_path, columnar_path):
+            print(f"  {os.path.basename(path):>24}: {os.path.getsize(path) / 1e6:8.1f} MB")
+
+        def force_from_json(path):
+            return np.array([item['Force'] for item in load_session(path)])
+
+        rows = [
+            ("json, Force column", lambda: force_from_json(json_path)),
+            ("jsonl, Force column", lambda: force_from_json(jsonl_path)),
+            ("columnar, open only", lambda: session_format.ColumnarSession(columnar_path)),
+            ("columnar, Force column", lambda: np.asarray(session_format.ColumnarSession(columnar_path)['Force']).sum()),
+        ]
+        for name, function in rows:
+            seconds, _ = timed(function)
+            print(f"{name:>24}: {seconds * 1000:10.1f} ms")
+
+        check = session_format.ColumnarSession(columnar_path)
+        assert np.allclose(check['Force'], force_from_json(json_path))
+        assert len(check) == frames
+
+
+if __name__ == "__main__":
+    main()
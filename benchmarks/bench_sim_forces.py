@@ -0,0 +1,98 @@
+# Checks the float fast path of Graphics.sim_forces (Graphics.sim_step) and the batched Graphics.VirtualDevices
+# against the numpy version sim_forces had before, then compares their throughput in device steps per second
+# and times a stiffness/damping grid sweep.
+# Run from the repository root: python benchmarks/bench_sim_forces.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+from Graphics import VirtualDevices, sim_step
+
+WINDOW_SCALE = 3000
+STEPS = 500
+DEVICES = 200
+SIZES = (1, 100, 10000, 1000000)
+
+
+def numpy_sim_forces(pE, f, pM, sim_k, sim_b, window_scale=WINDOW_SCALE):
+    # The previous body of Graphics.sim_forces, returns the new pE and the effort
+    diff = np.array((pM[0] - pE[0], pM[1] - pE[1]))
+    scale = window_scale / 1e3
+    scaled_vel_from_force = np.array(f) * scale / sim_b
+    vel_from_mouse_spring = (sim_k / sim_b) * diff
+    dpE = vel_from_mouse_spring - scaled_vel_from_force
+    if abs(dpE[0]) < 1:
+        dpE[0] = 0
+    if abs(dpE[1]) < 1:
+        dpE[1] = 0
+    pE = np.round(pE + dpE)
+    return pE, np.clip(np.linalg.norm(sim_k * diff / window_scale) * 255 * 20, 0, 255)
+
+
+def inputs(rng, steps, devices):
+    # Mouse paths with jumps and slow drifts, wall-like forces pushing back along x
+    mouse = np.cumsum(rng.normal(0, 4, (steps, devices, 2)), axis=0) + 300
+    mouse[steps // 2:] += rng.uniform(-100, 100, (1, devices, 2))
+    forces = np.where(mouse[..., :1] > 320, 0.01 * (320 - mouse[..., :1]), 0.0) * [1, 0]
+    return mouse, forces + rng.normal(0, 0.05, forces.shape)
+
+
+def timed(function, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    rng = np.random.default_rng(1)
+    sim_k = rng.uniform(0.05, 1.0, DEVICES)
+    sim_b = rng.uniform(0.5, 2.0, DEVICES)
+    mouse, forces = inputs(rng, STEPS, DEVICES)
+
+    devices = VirtualDevices(np.full((DEVICES, 2), 300.0), sim_k, sim_b, WINDOW_SCALE)
+    reference = np.full((DEVICES, 2), 300.0)
+    scalar = [(300.0, 300.0)] * DEVICES
+    effort_error = 0.0
+    for step in range(STEPS):
+        devices.step(forces[step], mouse[step])
+        for i in range(DEVICES):
+            reference[i], effort = numpy_sim_forces(reference[i], forces[step, i], mouse[step, i], sim_k[i], sim_b[i])
+            x, y, scalar_effort = sim_step(scalar[i], forces[step, i], mouse[step, i], sim_k[i], sim_b[i], WINDOW_SCALE)
+            scalar[i] = (x, y)
+            effort_error = max(effort_error, abs(effort - scalar_effort), abs(effort - devices.effort[i]))
+        assert np.array_equal(np.array(scalar), reference), step
+        assert np.array_equal(devices.pE, reference), step
+    print(f"{DEVICES} devices x {STEPS} steps: positions identical in all three, effort within {effort_error:.1e}")
+    assert effort_error < 1e-9
+
+    pE, f, pM = [300.0, 300.0], [0.4, -0.1], [350.0, 280.0]
+    numpy_rate = 1 / timed(lambda: numpy_sim_forces(pE, f, pM, 0.5, 0.8), 20000)
+    scalar_rate = 1 / timed(lambda: sim_step(pE, f, pM, 0.5, 0.8, WINDOW_SCALE), 20000)
+    print(f"{'devices':>8} {'numpy [steps/s]':>16} {'floats [steps/s]':>17} {'batch [steps/s]':>16}")
+    for size in SIZES:
+        devices = VirtualDevices(np.full((size, 2), 300.0), rng.uniform(0.05, 1.0, size), rng.uniform(0.5, 2.0, size))
+        f = rng.normal(0, 0.5, (size, 2))
+        pM = rng.uniform(0, 600, (size, 2))
+        batch_rate = size / timed(lambda: devices.step(f, pM), max(1, 100000 // size))
+        print(f"{size:>8} {numpy_rate:>16.0f} {scalar_rate:>17.0f} {batch_rate:>16.0f}")
+
+    # Grid sweep: 100 x 100 gains, 2 s at 100 Hz of a 150 px mouse jump against a wall at x = 400
+    grid = VirtualDevices.grid(np.linspace(0.05, 1.0, 100), np.linspace(0.5, 2.0, 100), pE=(300, 300))
+    start = time.perf_counter()
+    force = np.zeros((len(grid.pE), 2))
+    settled = np.full(len(grid.pE), -1)
+    for step in range(200):
+        np.multiply(np.minimum(400 - grid.pE[:, 0], 0), -0.02, out=force[:, 0])
+        grid.step(force, (450.0, 300.0))
+        settled[(settled < 0) & (np.abs(grid.pE[:, 0] - 400) <= 2)] = step
+    seconds = time.perf_counter() - start
+    print(f"grid sweep: {len(grid.pE)} gain pairs x 200 steps in {seconds * 1000:.1f} ms, "
+          f"{(settled >= 0).mean() * 100:.0f}% settle at the wall, median {np.median(settled[settled >= 0]) * 10:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
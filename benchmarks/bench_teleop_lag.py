@@ -0,0 +1,70 @@
+# Plugs in every cable headless through a TeleopChannel for a range of round trip delays, with and without
+# compensation. The felt force is compared tick by tick to a run of the same script without any delay (both
+# run the whole script, so the ticks line up), next to how far from the handle the remote side worked with
+# the position as it arrived and as predicted, and the cost per haptic tick. The local wall proxy runs the
+# same wall model as the scene, so the compensated force error is that of a perfect local model: it shows
+# what the delayed rect costs, not how far a real remote would differ. The keys go through the channel as
+# well, the script is the default one of headless_sim. They act at the first force computation after they
+# are sent, a frame later than without a channel, which is the force error left at 0 ms.
+# Run from the repository root: python benchmarks/bench_teleop_lag.py
+import contextlib
+import io
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+import pygame
+import headless_sim
+from scene import CableScene, W, H
+from teleop import TeleopChannel
+
+ROUND_TRIPS_MS = [0, 20, 50, 100, 200, 400]
+
+
+def run(round_trip, compensate=None):
+    # compensate None runs the script without a TeleopChannel, the reference.
+    # Returns the run statistics, the force felt every tick and the channel summary.
+    clock = headless_sim.SimClock()
+    scene = CableScene(pygame.Surface((W, H)), clock=clock)
+    start = (W // 2, H - 50)
+    headless_sim.settle(scene, clock, 1.0, 0.01, start)
+    trajectory = headless_sim.plug_all_script(scene, start)
+    channel = None if compensate is None else TeleopChannel(scene, round_trip / 2, round_trip / 2, compensate, clock=clock)
+    compute_force = scene.compute_force if channel is None else channel.compute_force
+    handle_key = None if channel is None else channel.handle_key
+    forces = []
+
+    def recorded(raw_pos):
+        snapshot = compute_force(raw_pos)
+        forces.append((snapshot['Force'][0], snapshot['Force'][1]))
+        return snapshot
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = headless_sim.run_headless(scene, clock, trajectory, compute_force=recorded,
+                                             handle_key=handle_key, stop_when_finished=False)
+    return stats, np.array(forces), None if channel is None else channel.summary()
+
+
+def main():
+    pygame.init()
+    print(f"{'round trip':>10} {'compensation':>12} {'finished':>8} {'score':>6} {'F error rms':>11} {'F error max':>11} "
+          f"{'handle error rms/max: delayed':>30} {'predicted':>14} {'us/tick':>8}")
+    for round_trip_ms in ROUND_TRIPS_MS:
+        _, reference, _ = run(round_trip_ms / 1000)
+        for compensate in (False, True):
+            stats, forces, summary = run(round_trip_ms / 1000, compensate)
+            assert len(forces) == len(reference)
+            error = np.hypot(*(forces - reference).T)
+            delayed, predicted = summary['delayed'], summary['predicted']
+            print(f"{round_trip_ms:>7} ms {'on' if compensate else 'off':>12} {str(stats['finished']):>8} {stats['score']:>6.1f} "
+                  f"{np.sqrt(np.mean(error ** 2)):>9.2f} N {error.max():>9.1f} N "
+                  f"{delayed['position_rms']:>20.1f} / {delayed['position_max']:>4.0f} px "
+                  f"{predicted['position_rms']:>6.1f} / {predicted['position_max']:>4.0f} px "
+                  f"{stats['wall_time'] / len(forces) * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Time spent in Wall collision checks per frame with 3 and 300 holes: the old linear scan against
+# the sorted hole index with the per-frame result cache.
+# Run from the repository root: python benchmarks/bench_wall_collision.py
+import os
+import random
+import sys
+import timeit
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import pygame
+from helpers import Wall
+
+FRAMES = 2000
+CABLES = 3
+
+
+class LinearWall(Wall):
+    # The checks as they were: every call scans all holes
+    def check_collision(self, red_rect):
+        for hole_rect in self.holes_rects:
+            if hole_rect.colliderect(red_rect):
+                return False
+        return self.wall_rect.colliderect(red_rect)
+
+    def check_in_hole(self, red_rect):
+        for hole_rect in self.holes_rects:
+            if hole_rect.colliderect(red_rect):
+                return True
+        return False
+
+
+def make_wall(wall_class, screen, holes):
+    positions = [(711, 600 * (i + 1) / (holes + 1)) for i in range(holes)]
+    return wall_class(screen, (700, 0), (600, 600), positions, (22, 10), [(0, 0, 0)] * holes)
+
+
+def frame_checks(wall, frames):
+    # The calls one frame of cable_sim makes: end_pos selection, then collision_control for every cable
+    def run():
+        for rects in frames:
+            wall.new_frame()
+            unlocked = rects[0]
+            wall.check_collision(unlocked)
+            wall.check_in_hole(unlocked)
+            wall.check_in_hole(unlocked)
+            for rect in rects:
+                wall.collision_force(rect.center, rect)
+    return min(timeit.repeat(run, number=1, repeat=5)) / len(frames)
+
+
+def main():
+    pygame.init()
+    screen = pygame.Surface((800, 600))
+    random.seed(1)
+    frames = []
+    for _ in range(FRAMES):
+        frames.append([pygame.Rect(random.randint(660, 720), random.randint(0, 600), 20, 8) for _ in range(CABLES)])
+    print(f"{'holes':>6} {'linear [us/frame]':>18} {'indexed [us/frame]':>19} {'speed-up':>9}")
+    for holes in (3, 300):
+        before = frame_checks(make_wall(LinearWall, screen, holes), frames)
+        after = frame_checks(make_wall(Wall, screen, holes), frames)
+        print(f"{holes:>6} {before * 1e6:>18.1f} {after * 1e6:>19.1f} {before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
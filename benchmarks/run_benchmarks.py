@@ -0,0 +1,190 @@
+# Microbenchmarks of the hot paths of a frame and of a haptic tick, no Haply board needed.
+# Every case is timed in SAMPLES batches of calls, the median and p99 of the per-call time are reported in
+# microseconds. Batches are sized to take about --sample-time seconds so the timer resolution does not matter,
+# which also means p99 is the 99th percentile of batch averages rather than of single calls.
+# Run from the repository root:
+#   python benchmarks/run_benchmarks.py                                 table
+#   python benchmarks/run_benchmarks.py --json                          JSON on stdout
+#   python benchmarks/run_benchmarks.py --save benchmarks/baseline.json  record a baseline
+#   python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+#       exits with 1 when a median is more than --threshold times its baseline
+import argparse
+import json
+import os
+import platform
+import struct
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # keeps --json output clean
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+import pygame
+from bench_board_packing import MemoryPort, make_device
+from helpers import Cable, CableSystem, Wall, special_control
+from HaplyHAPI import Pantograph
+from Physics import Physics
+from scene import CableScene, hole_pos
+
+SAMPLES = 200
+
+
+def measure(function, samples=SAMPLES, sample_time=0.0005):
+    # Doubles the batch size until one batch takes sample_time, then times `samples` batches
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        if time.perf_counter() - start >= sample_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    times = np.empty(samples)
+    for i in range(samples):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times[i] = (time.perf_counter() - start) / number
+    return {'median_us': float(np.median(times)) * 1e6, 'p99_us': float(np.percentile(times, 99)) * 1e6,
+            'calls_per_sample': number, 'samples': samples}
+
+
+def cycle(values):
+    # Endless iterator over a few inputs, so cached results and branch history do not flatter a case
+    values = list(values)
+    state = {'i': 0}
+
+    def next_value():
+        state['i'] = (state['i'] + 1) % len(values)
+        return values[state['i']]
+    return next_value
+
+
+def make_cases():
+    # name: function to time, all state is set up here once
+    screen = pygame.Surface((800, 600))
+    cases = {}
+
+    cable = Cable((133, 150), screen, (0, 77, 64), target=hole_pos[0])
+    cable.locked = False
+    targets = cycle([(300 + 60 * (i % 7), 150 + 40 * (i % 9)) for i in range(63)])
+    for _ in range(50):
+        cable.update(targets())
+    cases['Cable.update'] = lambda: cable.update(targets())
+
+    def cable_force_weight():
+        cable.moved()  # as after a physics step, so the forces are computed rather than read from the cache
+        return cable.get_force_weight()
+    cases['Cable.get_force_weight'] = cable_force_weight
+    cases['Cable.get_force_weight (cached)'] = cable.get_force_weight
+    cases['Cable.draw_connector_end'] = cable.draw_connector_end
+
+    cables = [Cable((133, 150 + 100 * i), screen, (0, 77, 64), target=hole_pos[i]) for i in range(3)]
+    cable_system = CableSystem(cables)
+    cables[0].locked = False
+    cases['CableSystem.update (3 cables)'] = lambda: cable_system.update(targets())
+
+    def system_forces_weight():
+        cables[0].moved()
+        return cable_system.get_forces_weight()
+    cases['CableSystem.get_forces_weight (3 cables)'] = system_forces_weight
+    cases['CableSystem.get_forces_weight (3 cables, cached)'] = cable_system.get_forces_weight
+
+    wall = Wall(screen, (700, 0), (600, 600), hole_pos, (22, 10), [(0, 0, 0)] * len(hole_pos))
+    wall_cable = Cable((133, 150), screen, (0, 77, 64), target=hole_pos[0])
+    wall_cable.locked = False
+    for _ in range(50):
+        wall_cable.update((705, 250))
+    wall_cable.place_connector()  # connector in the wall between two holes, so the force line is drawn too
+    cases['Wall.collision_control'] = lambda: wall.collision_control((705, 250), wall_cable)
+    cases['special_control'] = lambda: special_control(wall_cable, None, hole_pos, True)
+
+    scene = CableScene(screen)
+    scene.cables[0].locked = False
+    mouse = cycle([(300 + 60 * (i % 7), 150 + 40 * (i % 9)) for i in range(63)])
+    cases['CableScene.compute_force'] = lambda: scene.compute_force(mouse())
+
+    pantograph = Pantograph(3)
+    angles = cycle([[100 + 5 * (i % 9), 80 - 5 * (i % 7)] for i in range(63)])
+    cases['Pantograph.forwardKinematics'] = lambda: pantograph.forwardKinematics(angles())
+    pantograph.forwardKinematics([110, 70])
+    forces = cycle([[0.5 * (i % 5) - 1, 0.25 * (i % 7) - 0.75] for i in range(35)])
+    cases['Pantograph.torqueCalculation'] = lambda: pantograph.torqueCalculation(forces())
+
+    port = MemoryPort(bytes([5]) + struct.pack('<2f', 97.3, 82.7))
+    board, device = make_device(port)
+    device.device_set_parameters()
+    torques = [0.25, -0.125]
+    pulses = bytearray(0)
+    cases['Board.transmit (2 floats)'] = lambda: board.transmit(2, 5, pulses, torques)
+    cases['Board.receive (2 floats)'] = lambda: board.receive(2, 5, 2)
+
+    # Only the geometry of Physics is needed, connect=False keeps it from searching for a board
+    physics = Physics(hardware_version=3, connect=False)
+    positions = cycle([[-0.05 + 0.01 * (i % 11), 0.06 + 0.01 * (i % 5)] for i in range(55)])
+    cases['Physics.derive_device_pos'] = lambda: physics.derive_device_pos(list(positions()))
+    return cases
+
+
+def compare(results, baseline, threshold):
+    # Returns (name, ratio) of every case that has a baseline, and whether any is over the threshold
+    rows = []
+    regressed = False
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result['median_us'] / baseline[name]['median_us']
+            rows.append((name, ratio))
+            regressed |= ratio > threshold
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the cable_sim hot paths.")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    parser.add_argument('--save', help="write the results to this baseline file")
+    parser.add_argument('--compare', help="compare against this baseline file")
+    parser.add_argument('--threshold', type=float, default=1.3, help="median/baseline ratio that counts as a regression")
+    parser.add_argument('--filter', default='', help="only run cases whose name contains this")
+    parser.add_argument('--samples', type=int, default=SAMPLES)
+    parser.add_argument('--sample-time', type=float, default=0.0005, help="seconds per timed batch")
+    args = parser.parse_args()
+
+    pygame.init()
+    results = {}
+    for name, function in make_cases().items():
+        if args.filter in name:
+            results[name] = measure(function, args.samples, args.sample_time)
+    report = {'python': platform.python_version(), 'numpy': np.__version__, 'pygame': pygame.version.ver,
+              'machine': platform.machine(), 'results': results}
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        rows, regressed = compare(results, baseline, args.threshold)
+        report['baseline'] = args.compare
+        report['ratios'] = dict(rows)
+        report['regressed'] = [name for name, ratio in rows if ratio > args.threshold]
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'case':>48} {'median [us]':>12} {'p99 [us]':>10}" + (f" {'vs baseline':>12}" if args.compare else ""))
+        for name, result in results.items():
+            line = f"{name:>48} {result['median_us']:>12.2f} {result['p99_us']:>10.2f}"
+            if args.compare and name in report['ratios']:
+                ratio = report['ratios'][name]
+                line += f" {ratio:>11.2f}x" + ("  SLOWER" if ratio > args.threshold else "")
+            print(line)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    if args.compare and regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
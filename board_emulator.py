@@ -0,0 +1,289 @@
+import argparse
+import collections
+import math
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+# Message types of the Haply board protocol as sent by HaplyHAPI.Board
+RESET = 0
+SETUP = 1
+TORQUES = 2
+
+
+def still_trajectory(angles=(168.0, 12.0)):
+    # Encoders resting at the fully retracted start position used by Physics
+    return lambda t: angles
+
+
+def sine_trajectory(center=(120.0, 60.0), amplitude=(15.0, 15.0), frequency=1.0):
+    # Both arms swinging, the second one a quarter period behind
+    def angles(t):
+        phase = 2 * math.pi * frequency * t
+        return (center[0] + amplitude[0] * math.sin(phase),
+                center[1] + amplitude[1] * math.sin(phase - math.pi / 2))
+    return angles
+
+
+TRAJECTORIES = {'still': still_trajectory, 'sine': sine_trajectory}
+
+
+class BoardEmulator:
+    def __init__(self, trajectory=None, latency=0.0, jitter=0.0, seed=None):
+        # Haply board on a pseudo-terminal: connect Physics(port=emulator.port) or Board(..., emulator.port, 0).
+        # Every torque write is answered with one encoder frame after latency plus a uniform random 0..jitter
+        # seconds, replies keep their order like on the real serial link. trajectory(t) gives the encoder
+        # angles in degrees t seconds after start().
+        self.trajectory = trajectory or still_trajectory()
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        # what the host configured with device_set_parameters, defaults until the setup message arrives
+        self.device_id = 5
+        self.actuators = 2
+        self.encoders = 2
+        self.sensors = 0
+        self.pwms = 0
+        self.encoder_parameters = []
+        self.torques = [0.0] * self.actuators
+
+        self.pending = collections.deque()  # (send time, frame)
+        self.counts = collections.Counter()
+        self.max_pending = 0
+        self.bad_frames = 0
+        self.running = False
+        self.thread = None
+        self.start_time = time.perf_counter()
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        self.stop()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self):
+        buffer = bytearray()
+        while self.running:
+            # sleep until the next reply is due or the host writes something
+            timeout = 0.01
+            if self.pending:
+                timeout = max(0.0, min(timeout, self.pending[0][0] - time.perf_counter()))
+            readable, _, _ = select.select([self.master], [], [], timeout)
+            if readable:
+                try:
+                    buffer += os.read(self.master, 4096)
+                except OSError:
+                    break
+                self.parse(buffer)
+
+            now = time.perf_counter()
+            while self.pending and self.pending[0][0] <= now:
+                os.write(self.master, self.pending.popleft()[1])
+                self.counts['replies'] += 1
+
+    def parse(self, buffer):
+        # Handles every complete message at the start of buffer and removes it, a partial one stays
+        while len(buffer) >= 2:
+            message = buffer[0]
+            if message == RESET:
+                length = 2
+            elif message == SETUP:
+                length = self.setup_length(buffer)
+                if length is None:
+                    return
+            elif message == TORQUES:
+                length = 2 + self.pwms + 4 * self.actuators
+            else:
+                self.bad_frames += 1
+                del buffer[0]
+                continue
+            if len(buffer) < length:
+                return
+
+            frame = bytes(buffer[:length])
+            del buffer[:length]
+            self.counts[message] += 1
+            if message == SETUP:
+                self.setup(frame)
+            elif message == TORQUES:
+                self.torques = list(struct.unpack_from('<%df' % self.actuators, frame, 2 + self.pwms))
+                self.reply()
+
+    def setup_length(self, buffer):
+        # Length of a device_set_parameters message: motor, encoder, sensor and pwm bytes, then 2 floats per encoder
+        position = 2
+        encoders = 0
+        for block in range(4):
+            if len(buffer) <= position:
+                return None
+            if block < 2:
+                # motor and encoder blocks: a port bit mask, then one direction byte per active port
+                count = bin(buffer[position] & 0x0F).count('1')
+                encoders = count
+            else:
+                # sensor and pwm blocks: a count, then one pin byte each
+                count = buffer[position]
+            position += 1 + count
+        return position + 8 * encoders
+
+    def setup(self, frame):
+        self.device_id = frame[1]
+        position = 2
+        self.actuators = bin(frame[position] & 0x0F).count('1')
+        position += 1 + self.actuators
+        self.encoders = bin(frame[position] & 0x0F).count('1')
+        position += 1 + self.encoders
+        self.sensors = frame[position]
+        position += 1 + self.sensors
+        self.pwms = frame[position]
+        position += 1 + self.pwms
+        self.encoder_parameters = list(struct.unpack_from('<%df' % (2 * self.encoders), frame, position))
+        self.torques = [0.0] * self.actuators
+
+    def reply(self):
+        angles = list(self.trajectory(time.perf_counter() - self.start_time))[:self.encoders]
+        values = [0.0] * self.sensors + angles
+        frame = struct.pack('<B%df' % len(values), self.device_id, *values)
+        due = time.perf_counter() + self.latency + self.random.uniform(0, self.jitter)
+        if self.pending:
+            due = max(due, self.pending[-1][0])
+        self.pending.append((due, frame))
+        self.max_pending = max(self.max_pending, len(self.pending))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def drain(physics, settle=0.05):
+    # Reads the replies still on their way, e.g. to the torque writes Physics makes while waiting for data
+    time.sleep(settle)
+    if not physics.background_reader:
+        while physics.haplyBoard.data_available():
+            physics.device.device_read_data()
+
+
+def last_sequence(physics):
+    sample = physics.haplyBoard.latest_sample()
+    return 0 if sample is None else sample[0]
+
+
+def measure_round_trip(physics, count):
+    # Ping-pong: write a force, wait for the encoder frame it triggers, in seconds
+    times = []
+    drain(physics)
+    for _ in range(count):
+        sequence = last_sequence(physics) if physics.background_reader else None
+        start = time.perf_counter()
+        physics.update_force([0.0, 0.0], wait=0)
+        if physics.background_reader:
+            while last_sequence(physics) == sequence:
+                time.sleep(0)  # lets the reader thread have the GIL
+            physics.get_device_pos()
+        else:
+            while not physics.haplyBoard.data_available():
+                time.sleep(0)
+            physics.get_device_pos()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def measure_loop(physics, seconds, rate=None):
+    # The haptic loop: newest position, force back, optionally paced at rate Hz.
+    # Returns the loop rate, the sample ages and the bytes waiting in the host input buffer.
+    # Without the background reader a sample is timestamped when it is read, so its age looks small
+    # and the backlog is what shows how old the frames really are.
+    ages, backlog = [], []
+    loops = 0
+    period = 1.0 / rate if rate else 0
+    start = next_tick = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        if physics.get_mouse_pos(window_scale=4000, window_size=(800, 600)) is not None:
+            age = physics.get_sample_info()[1]
+            if age is not None:
+                ages.append(age)
+        physics.update_force([0.0, 0.0], wait=0)
+        backlog.append(physics.haplyBoard.in_waiting())
+        loops += 1
+        if period:
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    return loops / (time.perf_counter() - start), ages, backlog
+
+
+def main():
+    # python board_emulator.py --latency 0.001 --jitter 0.0005 --trajectory sine
+    parser = argparse.ArgumentParser(description="Runs Physics against an emulated Haply board and reports the link timing.")
+    parser.add_argument('--latency', type=float, default=0.0005, help="reply latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra uniform random reply delay in seconds")
+    parser.add_argument('--trajectory', choices=sorted(TRAJECTORIES), default='sine')
+    parser.add_argument('--seconds', type=float, default=3.0, help="duration of the loop measurement")
+    parser.add_argument('--rate', type=float, help="pace the loop at this rate in Hz, default: as fast as possible")
+    parser.add_argument('--round-trips', type=int, default=500)
+    parser.add_argument('--background-reader', action='store_true', help="decode frames on the Board reader thread")
+    parser.add_argument('--serve', action='store_true', help="only run the emulator and print its port, until Ctrl+C")
+    args = parser.parse_args()
+
+    emulator = BoardEmulator(TRAJECTORIES[args.trajectory](), latency=args.latency, jitter=args.jitter, seed=1)
+    with emulator:
+        if args.serve:
+            print(f"Emulated Haply board on {emulator.port} (HAPLY_PORT={emulator.port} python cable_sim.py)")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                return
+
+        from Physics import Physics
+        physics = Physics(hardware_version=3, background_reader=args.background_reader, port=emulator.port,
+                          use_port_cache=False)
+        print(f"setup received: {emulator.actuators} actuators, {emulator.encoders} encoders, "
+              f"encoder parameters {emulator.encoder_parameters}")
+
+        round_trips = measure_round_trip(physics, args.round_trips)
+        print(f"round trip: median {percentile(round_trips, 50) * 1000:.3f} ms, "
+              f"p99 {percentile(round_trips, 99) * 1000:.3f} ms, max {max(round_trips) * 1000:.3f} ms")
+
+        hz, ages, backlog = measure_loop(physics, args.seconds, args.rate)
+        print(f"loop: {hz:.0f} Hz, sample age median {percentile(ages, 50) * 1000:.3f} ms, "
+              f"p99 {percentile(ages, 99) * 1000:.3f} ms")
+        print(f"backlog: host input buffer median {percentile(backlog, 50)} bytes, max {max(backlog)} bytes, "
+              f"emulator queue max {emulator.max_pending} replies")
+        print(f"emulator: {emulator.counts[RESET]} resets, {emulator.counts[SETUP]} setups, "
+              f"{emulator.counts[TORQUES]} torque writes, {emulator.counts['replies']} replies, {emulator.bad_frames} bad bytes")
+        physics.close()
+
+
+if __name__ == "__main__":
+    main()
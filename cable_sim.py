@@ -1,214 +1,181 @@
 import os
+import sys
 import traceback
+
+if "--headless" in sys.argv:
+    # python cable_sim.py --headless [headless_sim options]: scripted input, simulated clock, no window
+    from headless_sim import main
+    sys.argv.remove("--headless")
+    sys.exit(main())
+
+if "--multiprocess" in sys.argv:
+    # python cable_sim.py --multiprocess: physics and haptics in a process of their own, see multiprocess_sim.py.
+    # Started as a script of its own, the physics process re-imports the main script and this one is the game.
+    import subprocess
+    sys.exit(subprocess.call([sys.executable, os.path.join(os.path.dirname(os.path.realpath(__file__)), "multiprocess_sim.py")]
+                             + [arg for arg in sys.argv[1:] if arg != "--multiprocess"]))
+
 import pygame
-from helpers import Cable
-from helpers import Wall
-from helpers import plot_data
-from helpers import assist_controller
-from helpers import special_control
+from helpers import plot_session_end
+from helpers import special_overlay
 from Physics import Physics
+from scene import CableScene
+from scene import W, H, window_scale, hole_pos
+from haptics import HapticLoop
+from haptics import RateCounter
+from renderer import DirtyRenderer
+from fixed_step import FixedStepper
+from stage_timer import StageTimer
+from stage_timer import TimingOverlay
+from telemetry import TelemetryWriter
+from telemetry import finish_session
+from teleop import lag_text
+from teleop import teleop_from_env
+import threading
 import time
-import json
 import datetime
-import math
+import numpy as np
 
 pygame.init()
-physics = Physics(hardware_version=3)
+# Per-stage timing, CABLE_PROFILE=1 turns it on from the start and 'p' toggles it and its overlay
+timer = StageTimer(enabled=os.environ.get("CABLE_PROFILE") == "1")
+physics = Physics(hardware_version=3, background_reader=True, port=os.environ.get("HAPLY_PORT"), timer=timer)  # HAPLY_PORT skips discovery
 device_connected = physics.is_device_connected()
 pygame.mouse.set_visible(False)
 font = pygame.font.Font(pygame.font.get_default_font(), 36)
+small_font = pygame.font.Font(pygame.font.get_default_font(), 16)
+timing_overlay = TimingOverlay(timer, pygame.font.SysFont("monospace", 14))
 
 # Parameters
-W, H = 800, 600
-window_scale = 4000
 screen = pygame.display.set_mode((W, H))
 pygame.display.set_caption("Cable Sim")
 
-wall_pos = (700, 0)
-wall_size = (600, 600)
-hole_size = (22, 10)  # one pixel on each end bigger
-hole_pos = [(wall_pos[0] + (hole_size[0] / 2), wall_size[1] / 3),
-            (wall_pos[0] + (hole_size[0] / 2), wall_size[1] / 2),
-            (wall_pos[0] + (hole_size[0] / 2), 2 * wall_size[1] / 3),
-            ]
-hole_colors = [
-    (0, 77 / 2, 64 / 2),
-    (30 / 2, 136 / 2, 229 / 2),
-    (255 / 2, 193 / 2, 7 / 2)
-]
-wall = Wall(screen, wall_pos, wall_size, hole_pos, hole_size, hole_colors)
-
-cables = [
-    Cable((W // 6, H // 4), screen, (0, 77, 64), target=hole_pos[0]),
-    Cable((W // 6, H // 4 + 100), screen, (30, 136, 229), target=hole_pos[1]),
-    Cable((W // 6, H // 4 + 200), screen, (255, 193, 7), target=hole_pos[2])
-]
-dummy_cable = Cable((W // 6, H // 4), screen, (0, 77, 64), target=hole_pos[0])
+scene = CableScene(screen)
+wall = scene.wall
+cables = scene.cables
 
 handle = pygame.transform.scale_by(
     pygame.image.load(os.path.join(os.path.dirname(os.path.realpath(__file__)), "assets", "handle.png")),
     0.75).convert_alpha(screen)
-cables[0].update((0, 0))
-cables[0].draw_connector_end()
-
-shocks = 0
-review_data = list()
-start_time = time.time()
-score = 0
-assist_active = False
-special_active = False
-special_collision = False
-special_collision_last = False
-special_collision_point = (0,0)
+
+telemetry = TelemetryWriter(f"Cable_data_{datetime.datetime.now().strftime('%d_%m_%Y_%H_%M_%S')}.jsonl")
+
+
+# CABLE_LAG_MS=200 simulates that teleoperation round trip (see teleop_from_env), 'l' switches the compensation
+teleop = teleop_from_env(scene)
+compute_force = scene.compute_force if teleop is None else teleop.compute_force
+
+scene_lock = threading.Lock()
+# Runs on the haptic thread while holding scene_lock, so the cables cannot change underneath it
+haptic = HapticLoop(physics, compute_force, scene_lock, window_scale=window_scale, window_size=(W, H), rate=1000, timer=timer)
+haptic.set_mouse_pos(pygame.mouse.get_pos())
+with scene_lock:
+    haptic.snapshot = compute_force(haptic.raw_pos)
+haptic.start()
+render_rate = RateCounter()
+clock = pygame.time.Clock()
+
+# Static layers are rendered once, the renderer only pushes what moved ('r' switches to full flips and back)
+background = pygame.Surface((W, H)).convert()
+background.fill((255, 255, 255))
+wall.draw(background)
+overlay = special_overlay((W, H), hole_pos).convert_alpha()
+renderer = DirtyRenderer(screen, background, dirty_rects=True)
+# Cable physics runs in fixed 10 ms steps whatever the frame rate, drawn interpolated between the last two
+stepper = FixedStepper(dt=0.01, max_substeps=4, state=scene.cable_system.points)
 
 run = True
 try:
     while run:
-        time.sleep(0.01)
-        screen.fill((255, 255, 255))
-        data = dict()
-
-        if device_connected:
-            mouse_pos = physics.get_mouse_pos(window_scale=window_scale, window_size=(W, H))
-        else:
-            mouse_pos = pygame.mouse.get_pos()
-        
-        if special_active and special_collision:
-            mouse_pos0 = special_collision_point[0] + (mouse_pos[0]-special_collision_point[0])/2
-            mouse_pos1 = special_collision_point[1] + (mouse_pos[1]-special_collision_point[1])/2
-            mouse_pos = (mouse_pos0, mouse_pos1)
-
-            
+        with timer.stage('wait'):
+            clock.tick(100)
+        if haptic.error is not None:
+            raise haptic.error
+        renderer.begin_frame(full_clear=scene.special_active)
+        wall.new_frame()
+
+        if not device_connected:
+            haptic.set_mouse_pos(pygame.mouse.get_pos())
+
+        # The renderer only reads the latest haptic snapshot, the device itself belongs to the haptic thread
+        snapshot = haptic.snapshot
+        mouse_pos = snapshot['mouse_pos']
         mouse_rect = pygame.rect.Rect(*mouse_pos, 1, 1)
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-            elif event.type == pygame.KEYUP:
-                if event.key == ord('q'):
+        with scene_lock, timer.stage('input'):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
                     run = False
-                elif event.key == ord(' '):
-                    for cable in cables:
-                        # Unlocking the cable or warning the user based on mouse position
-                        if cable.locked:
-                            status = cable.check_hover_status(mouse_pos)
-
-                            if status == "red":
-                                cable.enable_lightning(5)
-                                shocks += 1
-                            elif status == "green":
-                                cable.locked = False
-
-                                # Locking the cable to the current mouse position
-                        else:
-                            if wall.check_in_hole(cable.red_rect_rect):
-                                accurracy = max(1, 100 - math.sqrt(
-                                    (cable.target[0] - cable.red_rect_rect.center[0]) ** 2 + (
-                                                cable.target[1] - cable.red_rect_rect.center[1]) ** 2))
-                                print(f"Cable{cable.colour} scored {accurracy} points!")
-                                score -= cable.scored_points
-                                score += accurracy
-                                cable.scored_points = accurracy
-                                if cables[0].scored_points > 0 and cables[1].scored_points > 0 and cables[
-                                    2].scored_points > 0:
-                                    run = False
-
-                            elif not wall.check_in_hole(cable.red_rect_rect) and cable.scored_points:
-                                print(f"Cable{cable.colour} removed {cable.scored_points} points!")
-                                score -= cable.scored_points
-                                cable.scored_points = 0
-
-                            cable.locked = True
-                            cable.locked_position = pygame.Vector2(end_pos)
-                elif event.key == ord('c'):
-                    assist_active = not assist_active
-                    
-                elif event.key == ord('v'):
-                    special_active = not special_active
-
-        unlocked_cable = dummy_cable
-        for cable in cables:
-            if not cable.locked:
-                unlocked_cable = cable
-
-        if mouse_pos[0] < 680:
-            end_pos = mouse_pos
-        elif wall.check_collision(unlocked_cable.red_rect_rect) and not wall.check_in_hole(
-                unlocked_cable.red_rect_rect):
-            end_pos = (682, mouse_pos[1])
-        elif wall.check_in_hole(unlocked_cable.red_rect_rect):
-            if mouse_pos[0] > 700:
-                end_pos = (700, mouse_pos[1])
-            else:
-                end_pos = (mouse_pos[0], mouse_pos[1])
-        else:
-            end_pos = mouse_pos
-
-        wall.draw()
-
-        F_locked_cable = pygame.Vector2(0, 0)
-        for cable in cables:
-            if not cable.locked:
-                F_locked_cable = cable.get_force_weight()
-
-        F_shock = pygame.Vector2(0, 0)
-        for cable in cables:
-            F_shock += cable.get_lightning_force()
-
-        F_wall = pygame.Vector2(0, 0)
-        for cable in cables:
-            cable.update(end_pos)
-            cable.draw()
-
-            proxy_pos, F_wall_part = wall.collision_control(mouse_pos, cable)
-            if not cable.locked:
-                F_wall += F_wall_part
-
-        if not unlocked_cable.locked and assist_active:
-            
-            F_assist = -0.7*F_locked_cable
-        else:
-            F_assist = pygame.Vector2(0,0)
-
-        F = F_shock + F_locked_cable - F_wall + F_assist
-
-        special_collision = special_control(unlocked_cable, screen, hole_pos, special_active)
-        if special_collision and not special_collision_last:
-            special_collision_point = end_pos
-            special_collision_last = True
-        if not special_collision:
-            special_collision_last = False
-
-        if device_connected:
-            physics.update_force(F)
-
-        text = f"score: {str(round(score - time.time() + start_time))}"
+                elif event.type == pygame.KEYUP:
+                    if event.key == ord('q'):
+                        run = False
+                    elif event.key == ord('r'):
+                        renderer.set_dirty_rects(not renderer.dirty_rects)
+                    elif event.key == ord('p'):
+                        timer.enabled = not timer.enabled
+                    elif teleop is None or not teleop.handle_key(event.key):
+                        scene.handle_key(event.key, mouse_pos)
+            if scene.finished:
+                run = False
+
+        with scene_lock, timer.stage('cable update'):
+            # the connectors follow the physics state here, the cables are drawn interpolated but that only draws
+            scene.update(mouse_pos, stepper)
+            drawn_points = scene.cable_system.views(stepper.interpolated())
+
+        with timer.stage('draw cables'):
+            for i, (cable, points) in enumerate(zip(cables, drawn_points)):
+                # a shocked cable animates every frame, otherwise it only changed if a point moved to another pixel
+                pixels = None if cable.lightning_enable else (np.floor(points).tobytes(), tuple(cable.red_rect_rect))
+                renderer.add(('cable', i), cable.draw(points), pixels)
+
+        with timer.stage('collision'):
+            for i, cable in enumerate(cables):
+                proxy_pos, F_wall_part = wall.collision_force(mouse_pos, cable.red_rect_rect)
+                if F_wall_part[0] and not cable.locked:
+                    renderer.add(('force', i), wall.draw_force(proxy_pos, F_wall_part), (tuple(proxy_pos), F_wall_part[0]))
+
+        with timer.stage('special'):
+            if scene.special_active:
+                renderer.add('overlay', screen.blit(overlay, (0, 0)), True)
+
+        hud_start = time.perf_counter_ns()
+        text = f"score: {str(round(scene.current_score()))}"
         text_surface = font.render(text, True, (0, 0, 0))
-        screen.blit(text_surface, dest=(0, 0))
-
-        screen.blit(handle, handle.get_rect(center=mouse_pos))
-        pygame.display.flip()
-
-        data['time'] = time.time() - start_time
-        data['Force'] = (F[0], F[1])
-        data['Force_locked_cable'] = (F_locked_cable[0], F_locked_cable[1])
-        data['Force_wall'] = (F_wall[0], F_wall[1])
-        data['mouse_pos'] = mouse_pos
-        data['end_pos'] = end_pos
-        data['shocks'] = shocks
-        data['score'] = score - time.time() + start_time
-        data['assist_active'] = assist_active
-        data['special_active'] = special_active
-        review_data.append(data)
+        renderer.add('score', screen.blit(text_surface, dest=(0, 0)), text)
+
+        rate_text = f"haptic: {haptic.rate.hz:.0f} Hz   render: {render_rate.hz:.0f} Hz"
+        if snapshot.get('sample_age') is not None:
+            rate_text += f"   sample age: {snapshot['sample_age'] * 1000:.1f} ms"
+        if stepper.dropped_steps:
+            rate_text += f"   dropped steps: {stepper.dropped_steps}"
+        if teleop is not None:
+            rate_text += "   " + lag_text(teleop.round_trip, snapshot['handle_error'], teleop.compensate)
+        rate_text += f"   pushed: {renderer.last_area / (W * H) * 100:.0f}% ({'dirty rects' if renderer.dirty_rects else 'full flip'})"
+        rate_surface = small_font.render(rate_text, True, (0, 0, 0))
+        renderer.add('rates', screen.blit(rate_surface, dest=(0, 40)), rate_text)
+
+        renderer.add('handle', screen.blit(handle, handle.get_rect(center=mouse_pos)), 0)
+        if timer.enabled:
+            renderer.add('timing', *timing_overlay.draw(screen))
+        timer.record('hud', time.perf_counter_ns() - hud_start)
+
+        with timer.stage('display'):
+            renderer.end_frame()
+        render_rate.tick()
+
+        with timer.stage('telemetry'):
+            data = scene.record(snapshot)
+            telemetry.write(data)
 except Exception as e:
     print(f"Exception occured: {e}")
     traceback.print_exc()
 
-print(f"Total score: {score}")
+haptic.stop()
 physics.close()
+print(renderer.summary())
+finish_session(telemetry, scene, stepper, timer, teleop)
 pygame.quit()
 
-with open(f"Cable_data_{datetime.datetime.now().strftime('%d_%m_%Y_%H_%M_%S')}.json", 'w') as file:
-    json.dump(review_data, file)
-
-# plot_data(review_data)
\ No newline at end of file
+# CABLE_PLOT=1 plots the session once it is written
+plot_session_end(telemetry.path)
\ No newline at end of file
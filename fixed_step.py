@@ -0,0 +1,102 @@
+import time
+import numpy as np
+
+
+class SimClock:
+    def __init__(self, start=0.0):
+        # Simulated seconds, only moves when advance() is called
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, dt):
+        self.now += dt
+
+
+class FixedStepper:
+    def __init__(self, dt=0.01, max_substeps=4, state=None, clock=time.perf_counter):
+        # Runs a simulation at a fixed dt from whatever time the frames take. Frame time is collected in an
+        # accumulator and spent in whole steps, at most max_substeps per frame: when a frame needs more, the
+        # rest is dropped (the simulation slows down instead of spiralling) and counted.
+        # state: array the steps change in place (e.g. CableSystem.points), its value before the last step
+        # is kept so interpolated() can draw between the last two steps.
+        self.dt = dt
+        self.max_substeps = max_substeps
+        self.clock = clock
+        self.state = state
+        self.previous = None if state is None else state.copy()
+        self.interpolated_state = None if state is None else np.empty_like(state)
+        self.accumulator = 0.0
+        self.last_time = None
+        self.steps = 0
+        self.frames = 0
+        self.dropped_steps = 0
+        self.dropping_frames = 0
+        self.last_dropped = 0
+
+    def advance(self, step, elapsed=None):
+        # Calls step() for every whole dt that elapsed (measured on clock when not given), returns the steps run
+        now = self.clock()
+        if elapsed is None:
+            elapsed = self.dt if self.last_time is None else now - self.last_time
+        self.last_time = now
+        self.accumulator += elapsed
+        self.frames += 1
+
+        due = int(self.accumulator / self.dt)
+        run = min(due, self.max_substeps)
+        self.last_dropped = due - run
+        if self.last_dropped:
+            self.dropped_steps += self.last_dropped
+            self.dropping_frames += 1
+            self.accumulator -= self.last_dropped * self.dt
+
+        for i in range(run):
+            if self.state is not None and i == run - 1:
+                self.previous[...] = self.state
+            step()
+            self.accumulator -= self.dt
+        self.steps += run
+        return run
+
+    @property
+    def alpha(self):
+        # How far the clock is between the last step and the next one, 0..1
+        return min(max(self.accumulator / self.dt, 0.0), 1.0)
+
+    def interpolated(self):
+        # The state between the last two steps at alpha, so drawing moves smoothly whatever the frame rate.
+        # This lags the simulation by up to one step.
+        np.subtract(self.state, self.previous, out=self.interpolated_state)
+        self.interpolated_state *= self.alpha
+        self.interpolated_state += self.previous
+        return self.interpolated_state
+
+    def summary(self):
+        return (f"physics: {self.steps} steps of {self.dt * 1000:g} ms in {self.frames} frames, "
+                f"{self.dropped_steps} steps dropped in {self.dropping_frames} frames")
+
+
+class StepInterpolator:
+    def __init__(self, state, dt=0.01):
+        # FixedStepper.interpolated() for steps taken elsewhere, e.g. in multiprocess_sim's physics process:
+        # push() every new step with the time it was taken, interpolated(now) draws between the last two.
+        # The times must come from a clock every process shares, time.perf_counter is one.
+        self.dt = dt
+        self.previous = state.copy()
+        self.current = state.copy()
+        self.time = None
+        self.interpolated_state = np.empty_like(state)
+
+    def push(self, state, t):
+        self.previous[...] = self.current
+        self.current[...] = state
+        self.time = t
+
+    def interpolated(self, now):
+        alpha = 0.0 if self.time is None else min(max((now - self.time) / self.dt, 0.0), 1.0)
+        np.subtract(self.current, self.previous, out=self.interpolated_state)
+        self.interpolated_state *= alpha
+        self.interpolated_state += self.previous
+        return self.interpolated_state
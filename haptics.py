@@ -0,0 +1,94 @@
+import threading
+import time
+import traceback
+import pygame
+from stage_timer import StageTimer
+
+
+class RateCounter:
+    def __init__(self, window=1.0):
+        # Counts ticks and reports the rate over the last full window (seconds)
+        self.window = window
+        self.count = 0
+        self.window_start = time.perf_counter()
+        self.hz = 0.0
+
+    def tick(self):
+        self.count += 1
+        now = time.perf_counter()
+        if now - self.window_start >= self.window:
+            self.hz = self.count / (now - self.window_start)
+            self.count = 0
+            self.window_start = now
+
+
+class HapticLoop(threading.Thread):
+    def __init__(self, physics, compute_force, lock, window_scale, window_size, rate=1000, timer=None):
+        # Reads the device, computes the force and writes the torques at `rate` Hz on its own thread.
+        # compute_force(raw_pos) runs while holding `lock` and returns the snapshot dict for the renderer,
+        # which must contain the handle position under 'mouse_pos' and the total force under 'Force'.
+        # timer: StageTimer for the force computation and the period between torque writes, a disabled one by default
+        super().__init__(daemon=True)
+        self.timer = timer if timer is not None else StageTimer()
+        self.physics = physics
+        self.compute_force = compute_force
+        self.lock = lock
+        self.window_scale = window_scale
+        self.window_size = window_size
+        self.period = 1.0 / rate
+        self.device_connected = physics.is_device_connected()
+        self.raw_pos = (0, 0)
+        self.snapshot = None
+        self.rate = RateCounter()
+        self.running = False
+        self.error = None
+
+    def set_mouse_pos(self, mouse_pos):
+        # Input for when no device is connected, written by the render thread
+        self.raw_pos = mouse_pos
+
+    def start(self):
+        self.running = True
+        super().start()
+
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        next_tick = time.perf_counter()
+        last_write = None
+        try:
+            while self.running:
+                if self.device_connected:
+                    device_pos = self.physics.get_mouse_pos(window_scale=self.window_scale, window_size=self.window_size)
+                    if device_pos is not None:
+                        self.raw_pos = device_pos
+
+                with self.lock, self.timer.stage('haptic force'):
+                    snapshot = self.compute_force(self.raw_pos)
+
+                if self.device_connected:
+                    self.physics.update_force(pygame.Vector2(snapshot['Force']), wait=0)
+                    snapshot['sample_sequence'], snapshot['sample_age'] = self.physics.get_sample_info()
+
+                # Swapping the reference is atomic, the renderer only ever sees complete snapshots
+                self.snapshot = snapshot
+                self.rate.tick()
+                if self.timer.enabled:
+                    now = time.perf_counter_ns()
+                    if last_write is not None:
+                        self.timer.record('haptic period', now - last_write)
+                    last_write = now
+
+                next_tick += self.period
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -10 * self.period:
+                    next_tick = time.perf_counter()  # far behind (e.g. a stall), do not try to catch up
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+            self.running = False
@@ -0,0 +1,209 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # no window, also when only the surfaces are drawn on
+
+import argparse
+import bisect
+import json
+import time
+import numpy as np
+import pygame
+from fixed_step import SimClock
+from scene import CableScene
+from scene import W, H
+from telemetry import TelemetryWriter
+from teleop import TeleopChannel
+
+KEY_NAMES = {'space': ord(' '), 'c': ord('c'), 'v': ord('v')}
+
+
+class Trajectory:
+    def __init__(self, waypoints, keys=()):
+        # Scripted handle input: waypoints [(t, (x, y)), ...] are interpolated linearly,
+        # keys [(t, key), ...] are key releases (ord values) at those times
+        self.waypoints = sorted(waypoints, key=lambda waypoint: waypoint[0])
+        self.times = [t for t, pos in self.waypoints]
+        self.keys = sorted(keys, key=lambda key: key[0])
+        self.key_times = [t for t, key in self.keys]
+        self.duration = max(self.times[-1], self.key_times[-1] if self.keys else 0)
+
+    def position(self, t):
+        i = bisect.bisect_right(self.times, t)
+        if i == 0:
+            return tuple(self.waypoints[0][1])
+        if i == len(self.waypoints):
+            return tuple(self.waypoints[-1][1])
+        (t0, p0), (t1, p1) = self.waypoints[i - 1], self.waypoints[i]
+        a = (t - t0) / (t1 - t0)
+        return (p0[0] + (p1[0] - p0[0]) * a, p0[1] + (p1[1] - p0[1]) * a)
+
+    def keys_between(self, t0, t1):
+        # Keys released in [t0, t1)
+        first = bisect.bisect_left(self.key_times, t0)
+        last = bisect.bisect_left(self.key_times, t1)
+        return [key for t, key in self.keys[first:last]]
+
+    @classmethod
+    def from_file(cls, path):
+        # {"waypoints": [[t, x, y], ...], "keys": [[t, "space"], ...]}, keys are names from KEY_NAMES or characters
+        with open(path, 'r', encoding='utf-8') as file:
+            script = json.load(file)
+        waypoints = [(t, (x, y)) for t, x, y in script['waypoints']]
+        keys = [(t, KEY_NAMES.get(key, ord(key[0]))) for t, key in script.get('keys', [])]
+        return cls(waypoints, keys)
+
+
+def plug_all_script(scene, start=(W // 2, H - 50), move_time=1.0, hold_time=0.2):
+    # Picks up every cable at its port and plugs it into its hole, from where the ports are in `scene` now
+    t = 0.0
+    waypoints = [(t, start)]
+    keys = []
+    for cable in scene.cables:
+        port = cable.green_square_rect.center
+        hole_y = cable.target[1]
+        t += move_time
+        waypoints.append((t, port))
+        t += hold_time
+        waypoints.append((t, port))
+        keys.append((t - hold_time / 2, ord(' ')))  # unlock
+        t += move_time
+        waypoints.append((t, (640, hole_y)))
+        t += move_time / 2
+        waypoints.append((t, (cable.target[0] + 1, hole_y)))
+        t += hold_time
+        waypoints.append((t, (cable.target[0] + 1, hole_y)))
+        keys.append((t - hold_time / 2, ord(' ')))  # plug in
+    waypoints.append((t + hold_time, (cable.target[0] + 1, hole_y)))
+    return Trajectory(waypoints, keys)
+
+
+def settle(scene, clock, seconds, dt, pos):
+    # Lets the hanging cables come to rest before a script is built from their positions
+    for _ in range(round(seconds / dt)):
+        scene.wall.new_frame()
+        scene.step(pos)
+        scene.place_connectors()
+        clock.advance(dt)
+
+
+def run_headless(scene, clock, trajectory, dt=0.01, force_rate=1000, draw=False, max_time=None, telemetry=None,
+                 stop_when_finished=True, compute_force=None, handle_key=None):
+    # Steps the scene at a fixed dt on the simulated clock, forces are computed force_rate times per simulated
+    # second like the haptic thread does. Returns the run statistics, including the speed-up over real time.
+    # compute_force: what the haptic thread would call instead of scene.compute_force, e.g. a TeleopChannel's,
+    # handle_key(key): what takes the key releases before the scene does, returning False for the scene's
+    force_steps = max(1, round(force_rate * dt))
+    end_time = trajectory.duration if max_time is None else max_time
+    sim_start = clock()
+    steps = 0
+    solver_iterations = np.zeros(len(scene.cables))
+    stretch_residuals = np.zeros(len(scene.cables))
+    if compute_force is None:
+        compute_force = scene.compute_force
+    snapshot = compute_force(trajectory.position(0))
+    mouse_pos = snapshot['mouse_pos']
+
+    wall_start = time.perf_counter()
+    while clock() - sim_start < end_time:
+        t = clock() - sim_start
+        # like cable_sim, a frame records the haptic snapshot it started from
+        frame_snapshot = snapshot
+        scene.wall.new_frame()
+        for key in trajectory.keys_between(t, t + dt):
+            if handle_key is None or not handle_key(key):
+                scene.handle_key(key, mouse_pos)
+        if stop_when_finished and scene.finished:
+            break
+
+        scene.step(mouse_pos)
+        solver_iterations += scene.cable_system.solver_iterations
+        # measured here, the solver itself only tracks it with a tolerance
+        stretch_residuals = np.maximum(stretch_residuals, scene.cable_system.get_stretch_residuals())
+        if draw:
+            scene.screen.fill((255, 255, 255))
+            scene.wall.draw()
+            for cable in scene.cables:
+                cable.draw()
+        else:
+            scene.place_connectors()
+        scene.set_special_collision(scene.check_special())
+
+        frame_start = clock()
+        for i in range(force_steps):
+            clock.now = frame_start + dt * i / force_steps  # when the haptic thread would compute this one
+            snapshot = compute_force(trajectory.position(t + dt * i / force_steps))
+        mouse_pos = snapshot['mouse_pos']
+
+        clock.now = frame_start
+        clock.advance(dt)
+        steps += 1
+        if telemetry is not None:
+            telemetry.write(scene.record(frame_snapshot))
+    wall_time = time.perf_counter() - wall_start
+
+    sim_time = clock() - sim_start
+    return {'steps': steps, 'sim_time': sim_time, 'wall_time': wall_time,
+            'speedup': sim_time / wall_time if wall_time > 0 else float('inf'),
+            'score': scene.score, 'shocks': scene.shocks, 'finished': scene.finished,
+            'solver_iterations': (solver_iterations / max(steps, 1)).tolist(), 'stretch_residuals': stretch_residuals.tolist()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs cable_sim headless on a simulated clock with scripted input.")
+    parser.add_argument('--script', help="JSON trajectory file, default: plug in every cable")
+    parser.add_argument('--dt', type=float, default=0.01, help="fixed timestep in seconds (default 0.01, the 100 Hz frame rate)")
+    parser.add_argument('--force-rate', type=float, default=1000, help="force computations per simulated second")
+    parser.add_argument('--settle', type=float, default=1.0, help="simulated seconds the cables hang before the script starts")
+    parser.add_argument('--max-time', type=float, help="simulated seconds to run, default: until the script ends")
+    parser.add_argument('--draw', action='store_true', help="still draw every frame on an offscreen surface")
+    parser.add_argument('--screenshot', help="save the last frame to this image file (implies --draw)")
+    parser.add_argument('--telemetry', help="write the per-frame records to this .jsonl file")
+    parser.add_argument('--tolerance', type=float, help="solve the cables until no point moves this many pixels in a pass instead of 10 passes")
+    parser.add_argument('--min-iterations', type=int, default=2)
+    parser.add_argument('--max-iterations', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=1, help="number of runs")
+    parser.add_argument('--lag-ms', type=float, help="simulate this teleoperation round trip delay, half each way")
+    parser.add_argument('--no-compensation', action='store_true', help="feel the delayed force as it is under --lag-ms")
+    args = parser.parse_args(argv)
+    draw = args.draw or args.screenshot is not None
+
+    pygame.init()
+    for run in range(args.repeat):
+        clock = SimClock()
+        scene = CableScene(pygame.Surface((W, H)), clock=clock)
+        scene.cable_system.tolerance = args.tolerance
+        scene.cable_system.min_iterations = args.min_iterations
+        scene.cable_system.max_iterations = args.max_iterations
+        start = (W // 2, H - 50)
+        settle(scene, clock, args.settle, args.dt, start)
+        if args.script:
+            trajectory = Trajectory.from_file(args.script)
+        else:
+            trajectory = plug_all_script(scene, start)
+
+        channel = None
+        if args.lag_ms is not None:
+            channel = TeleopChannel(scene, args.lag_ms / 2000, args.lag_ms / 2000, not args.no_compensation, clock=clock)
+
+        telemetry = TelemetryWriter(args.telemetry) if args.telemetry else None
+        stats = run_headless(scene, clock, trajectory, dt=args.dt, force_rate=args.force_rate, draw=draw,
+                             max_time=args.max_time, telemetry=telemetry,
+                             compute_force=None if channel is None else channel.compute_force,
+                             handle_key=None if channel is None else channel.handle_key)
+        if telemetry is not None:
+            telemetry.close()
+        if args.screenshot:
+            pygame.image.save(scene.screen, args.screenshot)
+
+        print(f"run {run + 1}: {stats['steps']} steps, {stats['sim_time']:.2f} s simulated in {stats['wall_time']:.3f} s, "
+              f"score {stats['score']:.1f}, shocks {stats['shocks']}, {'finished' if stats['finished'] else 'not finished'}")
+        print("solver passes per step: " + ", ".join(f"{passes:.1f}" for passes in stats['solver_iterations']) +
+              "   largest stretch: " + ", ".join(f"{residual:.2f}" for residual in stats['stretch_residuals']) + " px")
+        print(f"speed-up over real time: {stats['speedup']:.1f}x")
+        if channel is not None:
+            print(channel.summary_text())
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -2,25 +2,152 @@ import os
 import time
 import pygame
 import math
-import matplotlib.pyplot as plt
+import bisect
 import numpy as np
+from collections import OrderedDict
+
+class SpriteCache:
+    def __init__(self, resolution=1.0, max_size=1024):
+        # Rotated (and scaled) sprites shared by all cables, keyed by what they show and the quantized angle.
+        # resolution: degrees per cached angle step, max_size: sprites kept before the least recently used goes (0 disables caching)
+        self.resolution = resolution
+        self.max_size = max_size
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, angle, build):
+        # build(angle) makes the sprite for the quantized angle when it is not cached yet
+        step = round(angle / self.resolution) % round(360 / self.resolution)
+        cache_key = (key, step)
+        sprite = self.sprites.get(cache_key)
+        if sprite is not None:
+            self.hits += 1
+            self.sprites.move_to_end(cache_key)
+            return sprite
+
+        self.misses += 1
+        sprite = build(step * self.resolution)
+        if self.max_size > 0:
+            self.sprites[cache_key] = sprite
+            if len(self.sprites) > self.max_size:
+                self.sprites.popitem(last=False)
+        return sprite
+
+    def clear(self):
+        self.sprites.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def filled_sprite(size, colour, angle):
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    surface.fill(colour)
+    return pygame.transform.rotate(surface, angle)
+
+
+# Cables (all cables together for a CableSystem) of up to this many segments are solved in plain floats,
+# below about 100 segments the fixed cost of the numpy calls is more than the math (bench_cable_update.py)
+SCALAR_SEGMENTS = 80
+
+
+def relax_sequential(xs, ys, first, last, anchor, length, passes):
+    # The constraint passes of the original Vector2 loop on rows first..last of float lists: every pair in
+    # turn (Gauss-Seidel) with the same operations in the same order, so the result is bit for bit the same
+    ax, ay = float(anchor[0]), float(anchor[1])
+    for _ in range(passes):
+        xs[first] = ax
+        ys[first] = ay
+        for i in range(first, last):
+            dx = xs[i + 1] - xs[i]
+            dy = ys[i + 1] - ys[i]
+            d = math.sqrt(dx * dx + dy * dy)
+            if d:
+                s = (d - length) / d
+                cx = dx * s * 0.5
+                cy = dy * s * 0.5
+                xs[i] += cx
+                ys[i] += cy
+                xs[i + 1] -= cx
+                ys[i + 1] -= cy
+
+
+def relax_to_tolerance(xs, ys, first, last, anchor, length, min_passes, max_passes, tolerance):
+    # relax_sequential until no point between the anchor and the end moved more than tolerance in a pass,
+    # returns the passes made and how far the points moved in the last one. A point moves by the correction
+    # of the pair it starts less that of the pair it ends, so this costs no copy of the points.
+    ax, ay = float(anchor[0]), float(anchor[1])
+    passes, moved = 0, 0.0
+    for passes in range(1, max_passes + 1):
+        xs[first] = ax
+        ys[first] = ay
+        moved = 0.0
+        px = py = 0.0
+        for i in range(first, last):
+            dx = xs[i + 1] - xs[i]
+            dy = ys[i + 1] - ys[i]
+            d = math.sqrt(dx * dx + dy * dy)
+            cx = cy = 0.0
+            if d:
+                s = (d - length) / d
+                cx = dx * s * 0.5
+                cy = dy * s * 0.5
+                xs[i] += cx
+                ys[i] += cy
+                xs[i + 1] -= cx
+                ys[i + 1] -= cy
+            if i > first:
+                mx = cx - px
+                my = cy - py
+                moved = max(moved, mx * mx + my * my)
+            px, py = cx, cy
+        moved = math.sqrt(moved)
+        if passes >= min_passes and moved <= tolerance:
+            break
+    return passes, moved
+
+
+def largest_move(before, after):
+    # Largest distance between matching rows of two (N, 2) arrays, 0 when there are none
+    delta = after - before
+    return float(np.max(np.hypot(delta[:, 0], delta[:, 1]), initial=0.0))
+
 
 class Cable:
-    def __init__(self, anchor, screen, colour, target, segments=20,segment_weight=0.5, length=5):
+    sprite_cache = SpriteCache()
+    lightning_scale_steps = 32  # the shock icon pulses through this many cached sizes
+
+    def __init__(self, anchor, screen, colour, target, segments=20,segment_weight=0.5, length=5, clock=time.time):
         # Init parameters
+        self.clock = clock  # seconds for the shock timing, a simulated clock when running headless
         self.scored_points = 0
         self.target = target
         self.lightning = pygame.transform.scale_by(pygame.image.load(os.path.join(os.path.dirname(os.path.realpath(__file__)), "assets", "lightning.png")), 0.1)
         self.lightning_enable = False
-        self.lightning_enabled_on = time.time()
+        self.lightning_enabled_on = self.clock()
         self.lightning_show_for = 5 #seconds
         self.lightning_time_to_run = 0
         self.screen = screen
         self.SEGMENTS,self.segment_weight, self.LENGTH = segments,segment_weight, length
-        self.GRAVITY = pygame.Vector2(0, 5.0)
+        self.GRAVITY = np.array((0.0, 5.0))
         self.anchor = anchor
-        self.points = [pygame.Vector2(anchor[0], anchor[1] + i * self.LENGTH) for i in range(self.SEGMENTS)]
-        self.old_points = self.points[:]
+        # Segment positions as contiguous (N, 2) arrays, one row per segment
+        self.points = np.empty((self.SEGMENTS, 2))
+        self.points[:, 0] = anchor[0]
+        self.points[:, 1] = anchor[1] + np.arange(self.SEGMENTS) * self.LENGTH
+        self.old_points = self.points.copy()
+        self.moves = 0  # bumped whenever the points change, cached forces are kept until it changes
+        self.weight_cache = (None, None)
+        # Constraint solver: `iterations` passes, or with a tolerance (pixels) passes until no point moves
+        # more than that in a pass, between min_iterations and max_iterations passes. The anchor and the end,
+        # which update() pins afterwards whatever the solver did, are not counted.
+        self.iterations = 10
+        self.tolerance = None
+        self.min_iterations = 2
+        self.max_iterations = 40
+        self.scalar_segments = SCALAR_SEGMENTS  # solve in plain floats up to this many segments
+        self.solver_iterations = 0  # passes made in the last update
+        self.solver_residual = 0.0  # with a tolerance, the furthest a point moved in the last pass
         self.locked = True  # Initially locked
         self.locked_position = pygame.Vector2(anchor[0] + 100, anchor[1]) 
         self.colour = colour
@@ -28,90 +155,141 @@ class Cable:
         self.draw_connector_end()
 
     def update(self, target):
-        # Apply physics to each segment
-        for i in range(1, self.SEGMENTS):
-            if self.locked and i == self.SEGMENTS - 1:
-                continue  # Skips when locked
-
-            # Apply motion and gravity
-            velocity = (self.points[i] - self.old_points[i]) #* 0.98
-            self.old_points[i] = self.points[i]
-            self.points[i] += velocity + self.GRAVITY
-
-        # Segment constraints
-        for _ in range(10):
-            self.points[0] = pygame.Vector2(self.anchor)
-            for i in range(self.SEGMENTS - 1):
-                delta = self.points[i + 1] - self.points[i]
-                if delta.length():
-                    correction = delta * ((delta.length() - self.LENGTH) / delta.length()) * 0.5
-                    self.points[i] += correction
-                    self.points[i + 1] -= correction
+        # Apply motion and gravity to all free segments at once (skips the end when locked)
+        moving = slice(1, self.SEGMENTS - 1 if self.locked else self.SEGMENTS)
+        velocity = self.points[moving] - self.old_points[moving] #* 0.98
+        self.points[moving] += velocity + self.GRAVITY
+
+        # Segment constraints: short cables pair by pair in floats, long ones relaxed on the even and then
+        # the odd pairs so each batch is independent
+        passes = self.iterations if self.tolerance is None else self.max_iterations
+        iteration, self.solver_residual = 0, 0.0
+        if self.SEGMENTS <= self.scalar_segments:
+            xs, ys = self.points[:, 0].tolist(), self.points[:, 1].tolist()
+            if self.tolerance is None:
+                relax_sequential(xs, ys, 0, self.SEGMENTS - 1, self.anchor, self.LENGTH, passes)
+                iteration = passes
+            else:
+                iteration, self.solver_residual = relax_to_tolerance(xs, ys, 0, self.SEGMENTS - 1, self.anchor,
+                    self.LENGTH, self.min_iterations, self.max_iterations, self.tolerance)
+            self.points[:, 0] = xs
+            self.points[:, 1] = ys
+        else:
+            for iteration in range(1, passes + 1):
+                converging = self.tolerance is not None and iteration >= self.min_iterations
+                if converging:
+                    before = self.points[1:-1].copy()
+                self.points[0] = self.anchor
+                self.relax_segments(self.points[0:-1:2], self.points[1::2])
+                self.relax_segments(self.points[1:-1:2], self.points[2::2])
+                if converging:
+                    self.solver_residual = largest_move(before, self.points[1:-1])
+                    if self.solver_residual <= self.tolerance:
+                        break
+        self.solver_iterations = iteration
+
+        # old_points follows the solved positions, so only the dragged end carries velocity
+        self.old_points[moving] = self.points[moving]
 
         # Locking mechanism
         if self.locked:
-            self.points[-1] = pygame.Vector2(self.locked_position)
+            self.points[-1] = self.locked_position
         else:
-            self.points[-1] = pygame.Vector2(target)
-
-    def draw(self):
-        # Draw cable and connector ends
+            self.points[-1] = target
+        self.moves += 1
+
+    def get_stretch_residual(self):
+        # Largest |segment length - LENGTH| in pixels, for checking a solver setting rather than every update.
+        # The last segment is left out, a plugged cable is pinned there however far the end is.
+        delta = np.diff(self.points[:-1], axis=0)
+        return float(np.max(np.abs(np.hypot(delta[:, 0], delta[:, 1]) - self.LENGTH), initial=0.0))
+
+    def relax_segments(self, first, second):
+        # Pull every (first, second) pair back towards LENGTH, both views are updated in place
+        delta = second - first
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        stretch = np.divide(length - self.LENGTH, length, out=np.zeros_like(length), where=length > 0)
+        correction = delta * (stretch * 0.5)[:, None]
+        first += correction
+        second -= correction
+
+    def draw(self, points=None):
+        # Draw cable and connector ends, returns the area drawn on
+        # points: where to draw the segments instead of self.points, e.g. interpolated between physics steps.
+        # Drawing given points only draws, the connector rects are left where place_connector put them.
+        line_points = (self.points if points is None else points).tolist()
+        drawn = pygame.Rect(line_points[0], (0, 0))
         for i in range(self.SEGMENTS - 1):
-            pygame.draw.line(self.screen, (0, 0, 0), self.points[i], self.points[i + 1], 2)
+            drawn.union_ip(pygame.draw.line(self.screen, (0, 0, 0), line_points[i], line_points[i + 1], 2))
             #pygame.draw.circle(self.screen, (255, 0, 0), self.points[i], 2)
-        self.draw_connector_end()
+        drawn.union_ip(self.draw_connector_end(points))
+        return drawn
 
-    def draw_connector_end(self):
+    def connector_placement(self, points):
+        # Where the connector goes at the end of points, without changing the cable:
+        # (end, angle, unit direction, plug sprite, plug rect, port sprite, port rect)
         # Align with the end of the cable
-        end = self.points[-1]
-        prev = self.points[-2]
+        end = pygame.Vector2(*points[-1])
+        prev = pygame.Vector2(*points[-2])
         direction = end - prev
         angle = math.degrees(math.atan2(direction.y, direction.x))
-
-        self.unit_direction = direction.normalize()
+        unit_direction = direction.normalize()
 
         # --- Connector (Red Plug) ---
-        rectangle = pygame.Surface((20, 8), pygame.SRCALPHA)
-        rectangle.fill((216, 27, 96))
-        rotated_rect = pygame.transform.rotate(rectangle, -angle)
-        self.red_rect_rect = rotated_rect.get_rect()
-        self.red_rect_rect.center = end + self.unit_direction * 10
-
-        self.screen.blit(rotated_rect, self.red_rect_rect.topleft)
+        rotated_rect = self.sprite_cache.get(('plug', (216, 27, 96)), -angle,
+                                             lambda a: filled_sprite((20, 8), (216, 27, 96), a))
+        red_rect = rotated_rect.get_rect(center=end + unit_direction * 10)
 
         # --- Safe Connection Area (Green Port) ---
-        square = pygame.Surface((12, 12), pygame.SRCALPHA)
-        square.fill(self.colour)
-    
-        rotated_square = pygame.transform.rotate(square, -angle)
-        self.green_square_rect = rotated_square.get_rect()
-        self.green_square_rect.center = end
-    
-        self.green_square_rect.center = end - self.unit_direction * 6
+        rotated_square = self.sprite_cache.get(('port', tuple(self.colour)), -angle,
+                                               lambda a: filled_sprite((12, 12), self.colour, a))
+        green_rect = rotated_square.get_rect(center=end - unit_direction * 6)
+        return end, angle, unit_direction, rotated_rect, red_rect, rotated_square, green_rect
+
+    def place_connector(self, points=None):
+        # Places the connector rects at the end of the cable without drawing, returns its connector_placement
+        placement = self.connector_placement(self.points if points is None else points)
+        # Rects are built first and then assigned, so other threads never see a half-placed rect
+        self.unit_direction, self.red_rect_rect, self.green_square_rect = placement[2], placement[4], placement[6]
+
+        if self.lightning_enable:
+            self.lightning_time_to_run = self.lightning_enabled_on + self.lightning_show_for - self.clock()
+
+        return placement
+
+    def draw_connector_end(self, points=None):
+        # Places and draws the connector, or with points only draws it there
+        if points is None:
+            placement = self.place_connector()
+        else:
+            placement = self.connector_placement(points)
+        end, angle, unit_direction, rotated_rect, red_rect, rotated_square, green_rect = placement
 
-        self.screen.blit(rotated_square, self.green_square_rect.topleft)
+        drawn = self.screen.blit(rotated_rect, red_rect.topleft)
+        drawn.union_ip(self.screen.blit(rotated_square, green_rect.topleft))
 
         # --- Draw Shocked ---
         if self.lightning_enable:
-            self.lightning_time_to_run = self.lightning_enabled_on + self.lightning_show_for - time.time()
-            rotated_square = pygame.transform.rotate(pygame.transform.scale_by(self.lightning, (math.sin(self.lightning_time_to_run*math.pi*2)+1)/2), -angle)
-            
-            time_to_run = self.lightning_enabled_on + self.lightning_show_for - time.time()
-            rotated_square = pygame.transform.rotate(pygame.transform.scale_by(self.lightning, (math.sin(time_to_run*math.pi*2)+1)/2), -angle)
+            scale_step = round((math.sin(self.lightning_time_to_run*math.pi*2)+1)/2 * self.lightning_scale_steps)
+            rotated_square = self.sprite_cache.get(('lightning', scale_step), -angle,
+                                                   lambda a: pygame.transform.rotate(pygame.transform.scale_by(self.lightning, scale_step / self.lightning_scale_steps), a))
 
-            self.shock_square_rect = rotated_square.get_rect()
-            self.shock_square_rect.center = end + 24*self.unit_direction
+            shock_square_rect = rotated_square.get_rect(center=end + 24 * unit_direction)
+            drawn.union_ip(self.screen.blit(rotated_square, shock_square_rect.topleft))
 
-            self.screen.blit(rotated_square, self.shock_square_rect.topleft)
+        if points is None:
+            self.expire_lightning()
+        return drawn  # area drawn on
 
-            if self.lightning_time_to_run < 0:
-                self.lightning_enable = False
+    def expire_lightning(self):
+        if self.lightning_enable and self.lightning_time_to_run < 0:
+            self.lightning_enable = False
 
     def enable_lightning(self, show_for = None):
         if show_for is not None:
             self.lightning_show_for = show_for
         self.lightning_enable = True
-        self.lightning_enabled_on = time.time()
+        self.lightning_enabled_on = self.clock()
 
     def check_hover_status(self, mouse_pos):
         # Check where the mouse is hovering
@@ -128,18 +306,212 @@ class Cable:
             lightning_perturbation = pygame.Vector2(0, 0)
         return 3*lightning_perturbation
 
+    def moved(self):
+        # Call after changing points outside update(), so cached forces are recomputed
+        self.moves += 1
+
+    def get_segment_forces(self):
+        # Weight carried along each segment as a (SEGMENTS - 1, 2) array, computed once per physics step:
+        # x is the segment weight projected on the segment and then on the x axis, y is -segment_weight
+        # for every segment that points up or is level. Read only, the cached array is shared.
+        moves, forces = self.weight_cache
+        if moves != self.moves:
+            forces = segment_weight_forces(self.points, self.segment_weight)
+            forces.flags.writeable = False
+            self.weight_cache = (self.moves, forces)
+        return forces
+
     def get_force_weight(self):
-        F = pygame.Vector2(0,0)
-        for i in range(len(self.points)-1):
-            a = len(self.points)-i-1
-            first = self.points[a]
-            sec = self.points[a-1]
-            dir = first - sec
-            dir = dir.normalize()
-            if first[1] <= sec[1]:
-                F[1] -= self.segment_weight
-            F[0] += pygame.Vector2(0,self.segment_weight).project(dir).project(pygame.Vector2(1,0))[0]
-        return F
+        return pygame.Vector2(*self.get_segment_forces().sum(axis=0))
+
+
+def segment_weight_forces(points, segment_weight):
+    # Closed form of the old per segment Vector2.project chain: (0, w) projected on the unit direction
+    # (cos, sin) is w*sin*(cos, sin), its x component is w*sin*cos. Zero length segments give no force.
+    delta = np.diff(points, axis=0)
+    length = np.hypot(delta[:, 0], delta[:, 1])
+    cos = np.divide(delta[:, 0], length, out=np.zeros_like(length), where=length > 0)
+    sin = np.divide(delta[:, 1], length, out=np.zeros_like(length), where=length > 0)
+    forces = np.empty((len(delta), 2))
+    forces[:, 0] = segment_weight * cos * sin
+    forces[:, 1] = -segment_weight * (delta[:, 1] <= 0)
+    return forces
+
+
+class CableSystem:
+    def __init__(self, cables):
+        # All cable segments live in one (rows, 2) buffer, every Cable keeps a view on its own rows.
+        # Each cable starts on an even row (odd cables get one padding row) so the even and odd
+        # segment pairs of every cable line up with two strided views over the whole buffer.
+        self.cables = list(cables)
+        counts = np.array([cable.SEGMENTS for cable in self.cables])
+        rows = counts + counts % 2
+        self.starts = np.concatenate(([0], np.cumsum(rows)[:-1]))
+        self.ends = self.starts + counts - 1
+        self.points = np.zeros((rows.sum(), 2))
+        self.old_points = np.zeros((rows.sum(), 2))
+        owner = np.full(len(self.points), -1)
+        for index, (cable, start, end) in enumerate(zip(self.cables, self.starts, self.ends)):
+            self.points[start:end + 1] = cable.points
+            self.old_points[start:end + 1] = cable.old_points
+            cable.points = self.points[start:end + 1]
+            cable.old_points = self.old_points[start:end + 1]
+            owner[start:end + 1] = index
+
+        self.anchors = np.array([cable.anchor for cable in self.cables], dtype=float)
+        self.gravity = np.zeros_like(self.points)
+        self.free = owner >= 0
+        self.free[self.starts] = False
+        # rows the solver alone decides, the ends are pinned after it
+        self.interior = self.free.copy()
+        self.interior[self.ends] = False
+        for index, cable in enumerate(self.cables):
+            self.gravity[owner == index] = cable.GRAVITY
+
+        # Rest length of the segment starting at each row, zero where the next row is another cable or padding
+        same_cable = (owner[:-1] == owner[1:]) & (owner[:-1] >= 0)
+        lengths = np.array([float(cable.LENGTH) for cable in self.cables])[owner[:-1]] * same_cable
+        self.even_lengths, self.odd_lengths = lengths[0::2], lengths[1::2]
+        self.even_mask, self.odd_mask = same_cable[0::2] * 0.5, same_cable[1::2] * 0.5
+        self.segment_lengths = lengths
+        # segments counted by get_stretch_residuals, all but the last one of every cable
+        self.inner_segments = same_cable.copy()
+        self.inner_segments[self.ends - 1] = False
+        # cable owning each even and odd pair (0 for padding, their mask is zero anyway)
+        self.even_owner, self.odd_owner = np.maximum(owner[0:-1:2], 0), np.maximum(owner[1:-1:2], 0)
+
+        # Weight of the segment starting at each row, zero across cable boundaries and padding
+        weights = np.array([float(cable.segment_weight) for cable in self.cables])
+        self.pair_weights = weights[owner[:-1]] * same_cable
+        self.weight_cache = (None, None)
+        for cable in self.cables:
+            cable.moved()
+
+        # Constraint solver settings for all cables, as on Cable
+        self.lengths = [float(cable.LENGTH) for cable in self.cables]
+        self.segments = int(counts.sum())
+        self.scalar_segments = SCALAR_SEGMENTS  # solve in plain floats up to this many segments in total
+        self.iterations = 10
+        self.tolerance = None
+        self.min_iterations = 2
+        self.max_iterations = 40
+        self.solver_iterations = np.zeros(len(self.cables), dtype=int)  # passes per cable in the last update
+        self.solver_residuals = np.zeros(len(self.cables))  # with a tolerance, per cable as Cable.solver_residual
+
+    def update(self, targets):
+        # targets is one end position for all cables or one per cable
+        targets = np.broadcast_to(np.asarray(targets, dtype=float), (len(self.cables), 2))
+        locked = np.array([cable.locked for cable in self.cables])
+
+        # Apply motion and gravity to every free segment of every cable in one step
+        moving = self.free.copy()
+        moving[self.ends[locked]] = False
+        velocity = self.points[moving] - self.old_points[moving]
+        self.points[moving] += velocity + self.gravity[moving]
+
+        # Segment constraints, pair by pair in floats for short cables, otherwise batched over the even and
+        # then the odd pairs of all cables
+        if self.tolerance is None and self.segments <= self.scalar_segments:
+            self.relax_sequential(self.iterations)
+            self.solver_iterations[:] = self.iterations
+            self.solver_residuals[:] = 0.0
+        elif self.segments <= self.scalar_segments:
+            self.relax_sequential_to_tolerance()
+        elif self.tolerance is None:
+            for _ in range(self.iterations):
+                self.points[self.starts] = self.anchors
+                self.relax_segments(self.points[0:-1:2], self.points[1::2], self.even_lengths, self.even_mask)
+                self.relax_segments(self.points[1:-1:2], self.points[2::2], self.odd_lengths, self.odd_mask)
+            self.solver_iterations[:] = self.iterations
+            self.solver_residuals[:] = 0.0
+        else:
+            self.solve_to_tolerance()
+
+        self.old_points[moving] = self.points[moving]
+
+        # Locking mechanism
+        locked_positions = np.array([tuple(cable.locked_position) for cable in self.cables], dtype=float)
+        self.points[self.ends] = np.where(locked[:, None], locked_positions, targets)
+        for cable, iterations, residual in zip(self.cables, self.solver_iterations, self.solver_residuals):
+            cable.solver_iterations = int(iterations)
+            cable.solver_residual = float(residual)
+            cable.moved()
+
+    def solve_to_tolerance(self):
+        # Passes until every cable is within tolerance, a converged cable is left alone from then on
+        active = np.ones(len(self.cables), dtype=bool)
+        self.solver_iterations[:] = 0
+        even_mask, odd_mask = self.even_mask, self.odd_mask
+        self.solver_residuals[:] = 0.0
+        for iteration in range(1, self.max_iterations + 1):
+            converging = iteration >= self.min_iterations
+            if converging:
+                before = self.points.copy()
+            self.points[self.starts[active]] = self.anchors[active]
+            self.relax_segments(self.points[0:-1:2], self.points[1::2], self.even_lengths, even_mask)
+            self.relax_segments(self.points[1:-1:2], self.points[2::2], self.odd_lengths, odd_mask)
+            self.solver_iterations[active] += 1
+            if converging:
+                delta = self.points - before
+                moved = np.maximum.reduceat(np.hypot(delta[:, 0], delta[:, 1]) * self.interior, self.starts)
+                self.solver_residuals[active] = moved[active]
+                converged = active & (moved <= self.tolerance)
+                if converged.any():
+                    active &= ~converged
+                    if not active.any():
+                        break
+                    even_mask = self.even_mask * active[self.even_owner]
+                    odd_mask = self.odd_mask * active[self.odd_owner]
+
+    def relax_sequential(self, passes):
+        xs, ys = self.points[:, 0].tolist(), self.points[:, 1].tolist()
+        for start, end, anchor, length in zip(self.starts, self.ends, self.anchors, self.lengths):
+            relax_sequential(xs, ys, start, end, anchor, length, passes)
+        self.points[:, 0] = xs
+        self.points[:, 1] = ys
+
+    def relax_sequential_to_tolerance(self):
+        # relax_to_tolerance for each cable, every cable stops on its own
+        xs, ys = self.points[:, 0].tolist(), self.points[:, 1].tolist()
+        for index, (start, end, anchor, length) in enumerate(zip(self.starts, self.ends, self.anchors, self.lengths)):
+            self.solver_iterations[index], self.solver_residuals[index] = relax_to_tolerance(
+                xs, ys, start, end, anchor, length, self.min_iterations, self.max_iterations, self.tolerance)
+        self.points[:, 0] = xs
+        self.points[:, 1] = ys
+
+    def views(self, points):
+        # Per cable views of an array laid out like self.points, e.g. FixedStepper.interpolated()
+        return [points[start:end + 1] for start, end in zip(self.starts, self.ends)]
+
+    def get_stretch_residuals(self):
+        # Largest |segment length - LENGTH| per cable in pixels, as Cable.get_stretch_residual
+        delta = np.diff(self.points, axis=0)
+        error = np.abs(np.hypot(delta[:, 0], delta[:, 1]) - self.segment_lengths) * self.inner_segments
+        return np.maximum.reduceat(error, self.starts)
+
+    def relax_segments(self, first, second, lengths, mask):
+        # Same correction as Cable.relax_segments, mask holds 0.5 for real pairs and 0 elsewhere
+        delta = second - first
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        stretch = np.divide(length - lengths, length, out=np.zeros_like(length), where=length > 0)
+        correction = delta * (stretch * mask)[:, None]
+        first += correction
+        second -= correction
+
+    def get_forces_weight(self):
+        # Weight force of every cable as a (cables, 2) array, same values as Cable.get_force_weight.
+        # Computed in one pass over the shared buffer and cached until one of the cables moves.
+        moves = tuple(cable.moves for cable in self.cables)
+        cached_moves, forces = self.weight_cache
+        if cached_moves != moves:
+            segment_forces = segment_weight_forces(self.points, 1.0) * self.pair_weights[:, None]
+            forces = np.add.reduceat(segment_forces, self.starts, axis=0)
+            forces.flags.writeable = False
+            self.weight_cache = (moves, forces)
+        return forces
+
+    def get_force_weight(self, index):
+        return pygame.Vector2(*self.get_forces_weight()[index])
 
 
 def assist_controller(cable, is_active):
@@ -149,25 +521,32 @@ def assist_controller(cable, is_active):
         assist_force = pygame.Vector2(0, 0)
 
     # Apply force to each segment except the anchor
-    for i in range(1, cable.SEGMENTS):
-        cable.points[i] += assist_force
+    cable.points[1:] += assist_force
+    cable.old_points[1:] += assist_force  # a shift, not a velocity for the next update
+    cable.moved()
 
     return assist_force
 
 
+def special_overlay(size, hole_pos):
+    # Translucent circles around the holes shown while the special mode is on
+    overlay = pygame.Surface(size, pygame.SRCALPHA)
+    for pos in hole_pos:
+        pygame.draw.circle(overlay, (255, 69, 0, 80), (int(pos[0] - 11), int(pos[1])), 100)
+    return overlay
+
+
 def special_control(cable, screen, hole_pos, special_active):
+    # screen can be None when the caller draws a cached special_overlay itself
     special_collision = False
 
     if special_active:
-        overlay = pygame.Surface(screen.get_size(), pygame.SRCALPHA)  
-
         for pos in hole_pos:
-            pygame.draw.circle(overlay, (255, 69, 0, 80), (int(pos[0] - 11), int(pos[1])), 100)
-            
-            if pygame.Vector2(cable.points[-1]).distance_to(pygame.Vector2(pos)) < 100:
+            if pygame.Vector2(*cable.points[-1]).distance_to(pygame.Vector2(pos)) < 100:
                 special_collision = True
 
-        screen.blit(overlay, (0, 0))
+        if screen is not None:
+            screen.blit(special_overlay(screen.get_size(), hole_pos), (0, 0))
 
     return special_collision
 
@@ -185,126 +564,130 @@ class Wall:
         self.prev_xh = pygame.Vector2(0.0, 0.0)
         self.kc = 100  # Stiffness constant for the force feedback
         self.holes_rects = list()
+        self.scan_holes = 8  # up to this many holes are scanned directly instead of indexed
 
         # Define the full wall and the hole as pygame.Rect objects
         self.wall_rect = pygame.Rect(self.position, self.size)
         for hole in self.holes_positions:
-            self.holes_rects.append(pygame.Rect(
-                                    hole[0] - self.hole_size[0] // 2,
-                                    hole[1] - self.hole_size[1] // 2,
-                                    self.hole_size[0],
-                                    self.hole_size[1])
-                                    )
-            
-
-    def draw(self):
+            self.holes_rects.append(self.make_hole_rect(hole))
+        self.build_hole_index()
+
+    def make_hole_rect(self, hole):
+        return pygame.Rect(hole[0] - self.hole_size[0] // 2,
+                           hole[1] - self.hole_size[1] // 2,
+                           self.hole_size[0],
+                           self.hole_size[1])
+
+    def add_hole(self, position, colour):
+        self.holes_positions = list(self.holes_positions) + [position]
+        self.hole_colors = list(self.hole_colors) + [colour]
+        self.holes_rects.append(self.make_hole_rect(position))
+        self.build_hole_index()
+
+    def build_hole_index(self):
+        # Holes sorted by their top edge, so the holes a rect can touch are found with two bisections
+        order = sorted(range(len(self.holes_rects)), key=lambda i: self.holes_rects[i].top)
+        self.hole_tops = [self.holes_rects[i].top for i in order]
+        self.hole_order = [self.holes_rects[i] for i in order]
+        self.max_hole_height = max((rect.height for rect in self.holes_rects), default=0)
+        self.new_frame()
+
+    def new_frame(self):
+        # Collision results only depend on the rect, they are kept until the next frame or a new hole
+        self.collision_cache = dict()
+
+    def hole_hit(self, red_rect):
+        # A hole can only overlap the rect if its top lies in (red_rect.top - max_hole_height, red_rect.bottom)
+        first = bisect.bisect_right(self.hole_tops, red_rect.top - self.max_hole_height)
+        last = bisect.bisect_left(self.hole_tops, red_rect.bottom)
+        for hole_rect in self.hole_order[first:last]:
+            if hole_rect.colliderect(red_rect):
+                return True
+        return False
+
+    def collision_state(self, red_rect):
+        # (in a hole, colliding with the wall) for a connector rect, cached per frame.
+        # With a handful of holes one scan is cheaper than the cache lookup and the bisections.
+        if len(self.hole_tops) <= self.scan_holes:
+            in_hole = red_rect.collidelist(self.holes_rects) >= 0
+            return in_hole, not in_hole and self.wall_rect.colliderect(red_rect)
+
+        key = tuple(red_rect)
+        state = self.collision_cache.get(key)
+        if state is None:
+            in_hole = self.hole_hit(red_rect)
+            state = (in_hole, not in_hole and self.wall_rect.colliderect(red_rect))
+            self.collision_cache[key] = state
+        return state
+
+    def draw(self, surface=None):
+        # surface: draw somewhere else than the screen, e.g. a cached background
+        if surface is None:
+            surface = self.screen
         wall_rect = pygame.Rect(self.position, self.size)
-        pygame.draw.rect(self.screen, (64, 64, 64), wall_rect)
+        pygame.draw.rect(surface, (64, 64, 64), wall_rect)
 
         for i, hole_rect in enumerate(self.holes_rects):
-            pygame.draw.rect(self.screen, self.hole_colors[i], hole_rect)
+            pygame.draw.rect(surface, self.hole_colors[i], hole_rect)
 
     def check_collision(self, red_rect):
-        for hole_rect in self.holes_rects:
-            if hole_rect.colliderect(red_rect):
-                return False
-        
-        
-        if self.wall_rect.colliderect(red_rect):
-            return True
-                
-        return False
+        # Inside the wall but not in a hole
+        return self.collision_state(red_rect)[1]
     
     def check_in_hole(self, red_rect):
-        for hole_rect in self.holes_rects:
-            if hole_rect.colliderect(red_rect):
-                return True
-        return False
+        return self.collision_state(red_rect)[0]
 
-    def collision_control(self, cable_end_pos, cable):
+    def collision_force(self, cable_end_pos, red_rect):
+        # Proxy position and wall force for a connector, without drawing (safe off the render thread)
         hx, hy = cable_end_pos  # Cable end position
 
         proxy_pos = pygame.Vector2([hx, hy])
         fe = pygame.Vector2([0.0, 0.0])
 
         # Check if cable end is inside the wall but NOT in the hole
-        if self.check_collision(red_rect=cable.red_rect_rect):
+        if self.check_collision(red_rect=red_rect):
             fe[0] = self.kc * (self.wall_rect.left-22 - hx)
             proxy_pos = pygame.Vector2(self.wall_rect.left-22, hy)
 
-            if not cable.locked:
-                force_end = proxy_pos - fe * 0.01  # Scale factor for drawing
-                pygame.draw.line(self.screen, (0, 0, 255), proxy_pos, force_end, 2)
-
-        elif self.check_in_hole(cable.red_rect_rect) and cable_end_pos[0] > 700:
+        elif self.check_in_hole(red_rect) and cable_end_pos[0] > 700:
             fe[0] = self.kc * (self.wall_rect.left - hx)
             proxy_pos = pygame.Vector2(self.wall_rect.left, hy)
 
-            if not cable.locked:
-                force_end = proxy_pos - fe * 0.01  # Scale factor for drawing
-                pygame.draw.line(self.screen, (0, 0, 255), proxy_pos, force_end, 2)
-
         return proxy_pos, fe  # Return adjusted position and force
 
+    def draw_force(self, proxy_pos, fe):
+        # Force line from the proxy position, returns the area drawn on
+        force_end = proxy_pos - fe * 0.01  # Scale factor for drawing
+        return pygame.draw.line(self.screen, (0, 0, 255), proxy_pos, force_end, 2)
 
+    def collision_control(self, cable_end_pos, cable):
+        proxy_pos, fe = self.collision_force(cable_end_pos, cable.red_rect_rect)
 
+        if fe[0] and not cable.locked:
+            self.draw_force(proxy_pos, fe)
 
+        return proxy_pos, fe  # Return adjusted position and force
 
 
 
 
-def plot_data(review_data):
-    t = list()
-    force = list()
-    end_pos = list()
-    mouse_pos = list()
-    for item in review_data:
-        t.append(item['time'])
-        force.append(item['Force'])
-        end_pos.append(item['end_pos'])
-        mouse_pos.append(item['mouse_pos'])
-
-    force = np.array(force)
-    end_pos = np.array(end_pos)
-    mouse_pos = np.array(mouse_pos)
-
-    plt.subplot(413)
-    plt.plot(t,force,"b")
-    plt.plot(t,force,"r")
-    plt.ylabel("F [N]")
-    plt.show()
-
-    plt.figure(3)
-    plt.subplot(411)
-    plt.title("VARIABLES")
-    plt.plot(t,end_pos[:,0],"b",label="x")
-    plt.plot(t,end_pos[:,1],"r",label="y")
-    plt.legend()
-    plt.ylabel("end_pos [m]")
-
-    plt.subplot(412)
-    plt.plot(t,mouse_pos[:,0],"b")
-    plt.plot(t,mouse_pos[:,1],"r")
-    plt.ylabel("mouse_pos [m]")
-
-
-
 
 
-    # plt.figure(4)
-    # plt.title("ENDPOINT BEHAVIOUR")
-    # plt.plot(0,0,"ok",label="shoulder")
-    # plt.plot(state[:,1],state[:,2],"lime",label="reference")
-    # plt.plot(state[:,3],state[:,4],"r",label="actual")
-    # plt.axis('equal')
-    # plt.xlabel("x [m]")
-    # plt.ylabel("y [m]")
-    # plt.legend()
 
-    # plt.tight_layout()
 
+def plot_data(review_data, method='minmax', title=None, block=False):
+    # review_data: list of per-frame dicts or a ColumnarSession, only the plotted columns are read.
+    # Opens a window with the lines decimated to the axis width (redone on zoom) and returns without blocking
+    # unless asked to, call plt.show() once all sessions are open.
+    # Imported here, helpers is also loaded by the haptic and physics processes that never plot
+    import plotting
+    return plotting.show_session(review_data, method, title, block)
 
 
-    plt.show()
+def plot_session_end(path):
+    # The plot at the end of a cable_sim or multiprocess_sim session, only with CABLE_PLOT=1, blocks until closed
+    if os.environ.get("CABLE_PLOT") == "1":
+        from session_format import open_session
+        plot_data(open_session(path), title=os.path.basename(path), block=True)
 
 
@@ -0,0 +1,345 @@
+# cable_sim split over two processes: python multiprocess_sim.py (or python cable_sim.py --multiprocess).
+# The physics process owns the device, the haptic loop, the cable physics, the wall forces and the game state,
+# this process only owns the window. The state goes over a SharedDoubleBuffer, so whatever holds up the
+# renderer (window moves, vsync, font rendering, the GIL) cannot hold up a torque write.
+# The game frame (CableScene.update), the teleoperation lag (CABLE_LAG_MS, 'l'), the end of session
+# (finish_session, CABLE_PLOT) and the drawing between physics steps are the ones cable_sim uses.
+import datetime
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+import numpy as np
+import pygame
+from fixed_step import FixedStepper
+from fixed_step import StepInterpolator
+from haptics import HapticLoop
+from haptics import RateCounter
+from helpers import plot_session_end
+from helpers import special_overlay
+from Physics import Physics
+from renderer import DirtyRenderer
+from scene import CableScene
+from scene import W, H, window_scale, hole_pos
+from shared_buffer import SharedDoubleBuffer
+from stage_timer import StageTimer
+from stage_timer import TimingOverlay
+from telemetry import TelemetryWriter
+from telemetry import finish_session
+from teleop import lag_text
+from teleop import teleop_from_env
+
+INPUT_FIELDS = {'mouse_pos': ('f8', (2,))}  # the mouse, the handle when no device is connected
+FLAGS = ('assist_active', 'special_active', 'special_collision', 'finished')
+
+
+def state_fields(scene):
+    # What the physics process publishes after every physics step
+    cables = len(scene.cables)
+    return {
+        'points': ('f8', scene.cable_system.points.shape),
+        'mouse_pos': ('f8', (2,)),  # handle position
+        'end_pos': ('f8', (2,)),
+        'forces': ('f8', (3, 2)),  # Force, Force_locked_cable, Force_wall
+        'wall_forces': ('f8', (cables, 4)),  # per cable the wall proxy position and force, zero while locked
+        'locked': ('u1', (cables,)),
+        'lightning': ('f8', (cables, 3)),  # per cable lightning_enable, lightning_enabled_on, lightning_show_for
+        'score': ('f8', ()),  # current_score()
+        'shocks': ('i8', ()),
+        'flags': ('u1', (len(FLAGS),)),
+        'rates': ('f8', (3,)),  # haptic Hz, physics Hz, device sample age in s (nan without a device)
+        'dropped_steps': ('i8', ()),
+        'steps': ('i8', ()),  # physics steps so far and the time.perf_counter of the last one, for interpolating
+        'step_time': ('f8', ()),
+        'lag': ('f8', (3,)),  # round trip in s, remote handle error in px, compensate (nan without CABLE_LAG_MS)
+    }
+
+
+def publish(state, scene, snapshot, rates, stepper, step_time, teleop):
+    mouse_pos = snapshot['mouse_pos']
+    with state.writing() as frame:
+        frame['points'][...] = scene.cable_system.points
+        frame['mouse_pos'][...] = mouse_pos
+        frame['end_pos'][...] = scene.end_pos
+        for row, name in zip(frame['forces'], ('Force', 'Force_locked_cable', 'Force_wall')):
+            row[...] = tuple(snapshot[name])
+        for i, cable in enumerate(scene.cables):
+            proxy_pos, F_wall_part = scene.wall.collision_force(mouse_pos, cable.red_rect_rect)
+            frame['wall_forces'][i] = 0 if cable.locked else (*proxy_pos, *F_wall_part)
+            frame['locked'][i] = cable.locked
+            frame['lightning'][i] = (cable.lightning_enable, cable.lightning_enabled_on, cable.lightning_show_for)
+        frame['score'][...] = scene.current_score()
+        frame['shocks'][...] = scene.shocks
+        frame['flags'][...] = [getattr(scene, name) for name in FLAGS]
+        frame['rates'][...] = rates
+        frame['dropped_steps'][...] = stepper.dropped_steps
+        frame['steps'][...] = stepper.steps
+        frame['step_time'][...] = step_time
+        frame['lag'][...] = np.nan if teleop is None else (teleop.round_trip, snapshot['handle_error'], teleop.compensate)
+
+
+def apply_frame(scene, frame):
+    # Copies a published frame into the scene the render process draws. The lightning animation runs on
+    # time.time in both processes, the same clock.
+    scene.cable_system.points[...] = frame['points']
+    for cable, locked, lightning in zip(scene.cables, frame['locked'], frame['lightning']):
+        cable.locked = bool(locked)
+        cable.lightning_enable = bool(lightning[0])
+        cable.lightning_enabled_on, cable.lightning_show_for = float(lightning[1]), float(lightning[2])
+    scene.place_connectors()
+    scene.end_pos = tuple(frame['end_pos'])
+    scene.shocks = int(frame['shocks'])
+    for name, value in zip(FLAGS, frame['flags']):
+        setattr(scene, name, bool(value))
+
+
+def physics_main(state_name, fields, input_name, keys, stop, options):
+    # Entry point of the physics process: the device and the haptic loop at 1 kHz, the cable physics and the
+    # game logic at the 10 ms physics step, a published frame after every step and the telemetry
+    # Only the haptic thread and the physics step share this interpreter: hand the GIL back to the haptic
+    # thread within 0.5 ms of a cable update instead of the default 5 ms
+    sys.setswitchinterval(0.0005)
+    state = SharedDoubleBuffer(fields, name=state_name)
+    inputs = SharedDoubleBuffer(INPUT_FIELDS, name=input_name)
+    parent = multiprocessing.parent_process()
+    timer = StageTimer(enabled=options['profile'])
+    physics = Physics(hardware_version=3, background_reader=True, port=options['port'], timer=timer)
+    scene = CableScene(pygame.Surface((W, H)))
+    teleop = teleop_from_env(scene)
+    compute_force = scene.compute_force if teleop is None else teleop.compute_force
+    scene_lock = threading.Lock()
+    haptic = HapticLoop(physics, compute_force, scene_lock, window_scale=window_scale, window_size=(W, H),
+                        rate=1000, timer=timer)
+    mouse = inputs.new_frame()
+    inputs.read(mouse)
+    haptic.set_mouse_pos(tuple(mouse['mouse_pos']))
+    with scene_lock:
+        haptic.snapshot = compute_force(haptic.raw_pos)
+    haptic.start()
+    stepper = FixedStepper(dt=0.01, max_substeps=4)
+    physics_rate = RateCounter()
+    telemetry = TelemetryWriter(options['telemetry'])
+
+    next_step = step_time = time.perf_counter()
+    try:
+        while not stop.is_set() and parent.is_alive():
+            if haptic.error is not None:
+                raise haptic.error
+            if not haptic.device_connected and inputs.read(mouse) is not None:
+                haptic.set_mouse_pos(tuple(mouse['mouse_pos']))
+            snapshot = haptic.snapshot
+            mouse_pos = snapshot['mouse_pos']
+
+            with scene_lock, timer.stage('cable update'):
+                scene.wall.new_frame()
+                while True:
+                    try:
+                        key = keys.get_nowait()
+                    except queue.Empty:
+                        break
+                    if teleop is None or not teleop.handle_key(key):
+                        scene.handle_key(key, mouse_pos)
+                if scene.update(mouse_pos, stepper):
+                    step_time = time.perf_counter()
+                sample_age = snapshot.get('sample_age')
+                publish(state, scene, snapshot, (haptic.rate.hz, physics_rate.hz, np.nan if sample_age is None else sample_age),
+                        stepper, step_time, teleop)
+            physics_rate.tick()
+
+            with timer.stage('telemetry'):
+                telemetry.write(scene.record(snapshot))
+            if scene.finished:
+                break
+
+            next_step += stepper.dt
+            delay = next_step - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -10 * stepper.dt:
+                next_step = time.perf_counter()
+    except Exception as e:
+        print(f"Exception occured in the physics process: {e}")
+        traceback.print_exc()
+
+    haptic.stop()
+    physics.close()
+    finish_session(telemetry, scene, stepper, timer, teleop)
+    state.close()
+    inputs.close()
+
+
+class PhysicsProcess:
+    def __init__(self, scene, telemetry_path, port=None, profile=False):
+        # The physics process and this side of its channels: the state it publishes, the mouse position
+        # it reads and a queue of key releases (keys must not be lost, the mouse only needs its newest value).
+        # scene: a CableScene like the one the process builds, for the buffer layout
+        # port: HAPLY_PORT, profile: time the stages and the haptic period, written to <telemetry>_timing.json
+        context = multiprocessing.get_context('spawn')  # a fresh interpreter, not a fork of this one's SDL state
+        self.state = SharedDoubleBuffer(state_fields(scene))
+        self.inputs = SharedDoubleBuffer(INPUT_FIELDS)
+        self.keys = context.Queue()
+        self.stop_event = context.Event()
+        self.telemetry_path = telemetry_path
+        options = {'telemetry': telemetry_path, 'port': port, 'profile': profile}
+        self.process = context.Process(target=physics_main, name="cable physics",
+                                       args=(self.state.name, self.state.fields, self.inputs.name, self.keys,
+                                             self.stop_event, options))
+
+    def start(self, mouse_pos):
+        self.set_mouse_pos(mouse_pos)
+        self.process.start()
+
+    def set_mouse_pos(self, mouse_pos):
+        self.inputs.write({'mouse_pos': mouse_pos})
+
+    def send_key(self, key):
+        self.keys.put(key)
+
+    def read(self, frame):
+        # Newest published frame into frame, see SharedDoubleBuffer.read
+        return self.state.read(frame)
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def stop(self, timeout=5.0):
+        # Asks the process to finish (it writes its summaries and closes the device), returns its exit code
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.keys.close()
+        self.state.close()
+        self.inputs.close()
+        return self.process.exitcode
+
+
+def main():
+    pygame.init()
+    # Render stage timing, CABLE_PROFILE=1 turns it on from the start (also in the physics process), 'p' toggles it
+    timer = StageTimer(enabled=os.environ.get("CABLE_PROFILE") == "1")
+    pygame.mouse.set_visible(False)
+    font = pygame.font.Font(pygame.font.get_default_font(), 36)
+    small_font = pygame.font.Font(pygame.font.get_default_font(), 16)
+    timing_overlay = TimingOverlay(timer, pygame.font.SysFont("monospace", 14))
+
+    screen = pygame.display.set_mode((W, H))
+    pygame.display.set_caption("Cable Sim")
+    # Only drawn, every frame is copied in from the physics process
+    scene = CableScene(screen)
+
+    telemetry_path = f"Cable_data_{datetime.datetime.now().strftime('%d_%m_%Y_%H_%M_%S')}.jsonl"
+    physics = PhysicsProcess(scene, telemetry_path, port=os.environ.get("HAPLY_PORT"), profile=timer.enabled)
+    physics.start(pygame.mouse.get_pos())
+
+    handle = pygame.transform.scale_by(
+        pygame.image.load(os.path.join(os.path.dirname(os.path.realpath(__file__)), "assets", "handle.png")),
+        0.75).convert_alpha(screen)
+    background = pygame.Surface((W, H)).convert()
+    background.fill((255, 255, 255))
+    scene.wall.draw(background)
+    overlay = special_overlay((W, H), hole_pos).convert_alpha()
+    renderer = DirtyRenderer(screen, background, dirty_rects=True)
+    render_rate = RateCounter()
+    clock = pygame.time.Clock()
+    frame = physics.state.new_frame()
+    frames_drawn = 0
+    # Drawn between the last two physics steps like cable_sim does, a step behind the physics process
+    interpolator = StepInterpolator(scene.cable_system.points, dt=0.01)
+    last_steps = 0
+
+    run = True
+    try:
+        while run:
+            with timer.stage('wait'):
+                clock.tick(100)
+            if not physics.is_alive():
+                print("The physics process stopped")
+                break
+
+            with timer.stage('input'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        run = False
+                    elif event.type == pygame.KEYUP:
+                        if event.key == ord('q'):
+                            run = False
+                        elif event.key == ord('r'):
+                            renderer.set_dirty_rects(not renderer.dirty_rects)
+                        elif event.key == ord('p'):
+                            timer.enabled = not timer.enabled
+                        else:
+                            physics.send_key(event.key)
+                physics.set_mouse_pos(pygame.mouse.get_pos())
+
+            if physics.read(frame) is not None:
+                frames_drawn += 1
+                if frame['steps'] != last_steps:
+                    last_steps = int(frame['steps'])
+                    interpolator.push(frame['points'], float(frame['step_time']))
+            elif not frames_drawn:
+                continue  # nothing published yet, the device is still being looked for
+            apply_frame(scene, frame)
+            if scene.finished:
+                run = False
+            mouse_pos = tuple(frame['mouse_pos'])
+            renderer.begin_frame(full_clear=scene.special_active)
+
+            with timer.stage('draw cables'):
+                drawn_points = scene.cable_system.views(interpolator.interpolated(time.perf_counter()))
+                for i, (cable, points) in enumerate(zip(scene.cables, drawn_points)):
+                    pixels = None if cable.lightning_enable else np.floor(points).tobytes()
+                    renderer.add(('cable', i), cable.draw(points), pixels)
+                for i, (x, y, fx, fy) in enumerate(frame['wall_forces']):
+                    if fx:
+                        renderer.add(('force', i), scene.wall.draw_force(pygame.Vector2(x, y), pygame.Vector2(fx, fy)), (x, y, fx))
+                if scene.special_active:
+                    renderer.add('overlay', screen.blit(overlay, (0, 0)), True)
+
+            hud_start = time.perf_counter_ns()
+            text = f"score: {str(round(float(frame['score'])))}"
+            text_surface = font.render(text, True, (0, 0, 0))
+            renderer.add('score', screen.blit(text_surface, dest=(0, 0)), text)
+
+            haptic_hz, physics_hz, sample_age = frame['rates']
+            rate_text = f"haptic: {haptic_hz:.0f} Hz   physics: {physics_hz:.0f} Hz   render: {render_rate.hz:.0f} Hz"
+            if not np.isnan(sample_age):
+                rate_text += f"   sample age: {sample_age * 1000:.1f} ms"
+            if frame['dropped_steps']:
+                rate_text += f"   dropped steps: {int(frame['dropped_steps'])}"
+            round_trip, handle_error, compensate = frame['lag']
+            if not np.isnan(round_trip):
+                rate_text += "   " + lag_text(round_trip, handle_error, compensate)
+            rate_text += f"   pushed: {renderer.last_area / (W * H) * 100:.0f}% ({'dirty rects' if renderer.dirty_rects else 'full flip'})"
+            rate_surface = small_font.render(rate_text, True, (0, 0, 0))
+            renderer.add('rates', screen.blit(rate_surface, dest=(0, 40)), rate_text)
+
+            renderer.add('handle', screen.blit(handle, handle.get_rect(center=mouse_pos)), 0)
+            if timer.enabled:
+                renderer.add('timing', *timing_overlay.draw(screen))
+            timer.record('hud', time.perf_counter_ns() - hud_start)
+
+            with timer.stage('display'):
+                renderer.end_frame()
+            render_rate.tick()
+    except Exception as e:
+        print(f"Exception occured: {e}")
+        traceback.print_exc()
+
+    published, retries = int(physics.state.sequences[0]), physics.state.retries
+    exitcode = physics.stop()
+    print(renderer.summary())
+    print(f"shared state: {published} frames published, {frames_drawn} drawn, {retries} copies retried")
+    if timer.stages:
+        print(timer.summary_text())
+    pygame.quit()
+    plot_session_end(physics.telemetry_path)
+    return exitcode
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,20 +1,19 @@
 import os
-import json
 import helpers
-import time
+import session_format
+import matplotlib.pyplot as plt
 
-filenames = list()
-for item in os.listdir():
-    if "Cable_data" in item:
-        filenames.append(item)
+# one entry per session, open_session prefers the columnar file when it has been converted
+filenames = session_format.find_sessions()
 
 
 print(f"found these files: {filenames}")
 
+# every session gets its own window, they all stay open until the last one is closed
 for filename in filenames:
     print(f"showing file: {filename}")
-    time.sleep(1)
-    with open(filename, 'r') as file:
-        review_data = json.load(file)
+    review_data = session_format.open_session(filename)
 
-    helpers.plot_data(review_data)
\ No newline at end of file
+    helpers.plot_data(review_data, title=os.path.basename(filename))
+
+plt.show()
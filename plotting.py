@@ -0,0 +1,229 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+from session_format import find_sessions, open_session, session_column
+
+# Lines are cut down to this many points per pixel of axis width before drawing. min/max keeps two points
+# per pixel column (the extremes, in time order), so spikes and the envelope look exactly like the raw plot.
+POINTS_PER_PIXEL = 2
+METHODS = ('minmax', 'lttb')
+CHUNK_SAMPLES = 1 << 16  # samples min/max decimation looks at in one go
+
+
+def visible_range(x, x_min, x_max):
+    # Index range of the sorted x that covers [x_min, x_max], one extra sample on each side so the line
+    # still reaches the edges of the axis
+    start = max(int(np.searchsorted(x, x_min, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_max, side='right')) + 1, len(x))
+    return start, stop
+
+
+def bucket_extremes(blocks):
+    # Positions of the smallest and largest sample in every row of blocks, NaN left out (0 for a row of NaN).
+    # Done CHUNK_SAMPLES at a time, argmin copies a strided column (e.g. one axis of Force) before searching.
+    # argmin stops at the first NaN, so only the rows where it did are copied and searched again.
+    low, high = np.empty(len(blocks), dtype=np.intp), np.empty(len(blocks), dtype=np.intp)
+    step = max(1, CHUNK_SAMPLES // blocks.shape[1])
+    for start in range(0, len(blocks), step):
+        low[start:start + step] = blocks[start:start + step].argmin(axis=1)
+        high[start:start + step] = blocks[start:start + step].argmax(axis=1)
+    missing = np.flatnonzero(np.isnan(blocks[np.arange(len(blocks)), low]))
+    if missing.size:
+        rows = blocks[missing]
+        nan = np.isnan(rows)
+        low[missing] = np.where(nan, np.inf, rows).argmin(axis=1)
+        high[missing] = np.where(nan, -np.inf, rows).argmax(axis=1)
+    return low, high
+
+
+def minmax_indices(y, buckets):
+    # Indices of the smallest and largest sample of each of `buckets` equal runs of y, in order, plus the
+    # first and last sample. The full runs are reduced on a view of y, a memmapped column is never copied.
+    n = len(y)
+    size = -(-n // buckets)
+    full = n // size
+    low, high = bucket_extremes(y[:full * size].reshape(full, size))
+    offsets = np.arange(full) * size
+    low, high = low + offsets, high + offsets
+    if full * size < n:
+        # the shorter last run
+        tail_low, tail_high = bucket_extremes(y[full * size:].reshape(1, -1))
+        low = np.append(low, tail_low + full * size)
+        high = np.append(high, tail_high + full * size)
+    indices = np.sort(np.stack((low, high), axis=1), axis=1).ravel()
+    return np.unique(np.concatenate(([0], indices, [n - 1])))
+
+
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keeps the first and last sample and from every bucket in between the
+    # one spanning the largest triangle with the previous pick and the mean of the next bucket
+    n = len(x)
+    y = np.nan_to_num(y)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    counts = np.diff(edges)
+    # the bucket means all at once, the last bucket looks ahead to the last sample
+    mean_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[n - 1])[1:]
+    mean_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[n - 1])[1:]
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    picked = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        x0, y0 = x[picked], y[picked]
+        area = np.abs((x0 - mean_x[i]) * (y[start:stop] - y0) - (x0 - x[start:stop]) * (mean_y[i] - y0))
+        picked = start + int(area.argmax())
+        indices[i + 1] = picked
+    return indices
+
+
+def decimate(x, y, pixels, method='minmax', x_range=None):
+    # The samples of (x, y) worth drawing on an axis `pixels` wide showing x_range (default: everything).
+    # x must be sorted. Returns views of x and y when there are already few enough samples.
+    start, stop = (0, len(x)) if x_range is None else visible_range(x, *x_range)
+    x, y = x[start:stop], y[start:stop]
+    points = max(int(pixels * POINTS_PER_PIXEL), 4)
+    if len(x) <= points:
+        return x, y
+    if method == 'lttb':
+        indices = lttb_indices(x, y, points)
+    else:
+        indices = minmax_indices(y, points // 2)
+    return x[indices], y[indices]
+
+
+def axis_pixels(ax):
+    return max(int(ax.get_window_extent().width), 1)
+
+
+class DecimatedLine:
+    def __init__(self, ax, x, y, *args, method='minmax', **kwargs):
+        # A line plotted from a decimated copy of (x, y), redone for the visible range and axis width by
+        # update(). The full arrays are kept as they are, memory-mapped columns stay on disk.
+        self.ax = ax
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.method = method
+        self.line, = ax.plot([], [], *args, **kwargs)
+
+    def update(self, x_range=None):
+        self.line.set_data(*decimate(self.x, self.y, axis_pixels(self.ax), self.method, x_range))
+
+
+class SessionFigure:
+    def __init__(self, review_data, figure=None, method='minmax', title=None):
+        # The plot_data panels (end_pos, mouse_pos, Force over time) from decimated lines.
+        # figure: a pyplot figure for the interactive window, default a plain Figure for headless export
+        self.figure = Figure(figsize=(12, 8)) if figure is None else figure
+        t = np.asarray(session_column(review_data, 'time'), dtype=float)
+        end_pos = session_column(review_data, 'end_pos')
+        mouse_pos = session_column(review_data, 'mouse_pos')
+        force = session_column(review_data, 'Force')
+
+        axes = self.figure.subplots(3, 1, sharex=True)
+        self.lines = []
+        axes[0].set_title(title or "VARIABLES")
+        for ax, column, label in ((axes[0], end_pos, "end_pos"), (axes[1], mouse_pos, "mouse_pos"), (axes[2], force, "F")):
+            self.lines.append(DecimatedLine(ax, t, column[:, 0], "b", label="x", method=method))
+            self.lines.append(DecimatedLine(ax, t, column[:, 1], "r", label="y", method=method))
+        axes[0].legend()
+        axes[0].set_ylabel("end_pos [px]")
+        axes[1].set_ylabel("mouse_pos [px]")
+        axes[2].set_ylabel("F [N]")
+        axes[2].set_xlabel("t [s]")
+        self.axes = axes
+        self.figure.tight_layout()
+        if len(t):
+            axes[2].set_xlim(t[0], t[-1])
+        self.update()
+        for ax in axes:
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+
+    def update(self, ax=None):
+        # Re-decimates every line for the current x limits (the axes share them)
+        x_range = self.axes[0].get_xlim()
+        for line in self.lines:
+            line.update(x_range)
+
+    def connect(self):
+        # Re-decimate whenever the view is zoomed, panned or resized
+        self.axes[0].callbacks.connect('xlim_changed', self.update)
+        self.figure.canvas.mpl_connect('resize_event', lambda event: self.update())
+        return self
+
+    def save(self, path, dpi=100):
+        if dpi != self.figure.dpi:
+            # the axes are wider in pixels at a higher resolution
+            self.figure.set_dpi(dpi)
+            self.update()
+        self.figure.savefig(path, dpi=dpi)
+
+
+def show_session(review_data, method='minmax', title=None, block=False):
+    # Opens the session in a window that re-decimates on zoom, without blocking unless asked to
+    import matplotlib.pyplot as plt
+    session_figure = SessionFigure(review_data, plt.figure(figsize=(12, 8)), method, title).connect()
+    plt.show(block=block)
+    if not block:
+        plt.pause(0.001)
+    return session_figure
+
+
+def export_session(filename, directory, formats=('png',), method='minmax', dpi=100):
+    # Renders one session headless to directory/<session>.<format> for every format, returns the paths
+    session_figure = SessionFigure(open_session(filename), method=method, title=os.path.basename(filename))
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    paths = []
+    for extension in formats:
+        paths.append(os.path.join(directory, f"{stem}.{extension}"))
+        session_figure.save(paths[-1], dpi)
+    return paths
+
+
+def export_sessions(filenames, directory, formats=('png',), method='minmax', dpi=100, workers=None):
+    # export_session for every file over a process pool, returns the written paths per file
+    os.makedirs(directory, exist_ok=True)
+    arguments = [(filename, directory, formats, method, dpi) for filename in filenames]
+    if workers == 1 or len(filenames) == 1:
+        return [export_session(*argument) for argument in arguments]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(export_session, *zip(*arguments)))
+
+
+def main():
+    # python plotting.py [sessions or directories] [--out figures] [--format png svg] [--show]
+    parser = argparse.ArgumentParser(description="Plots Cable_data sessions, decimated to the axis width.")
+    parser.add_argument('paths', nargs='*', default=['.'], help="session files or directories of sessions")
+    parser.add_argument('--out', default='figures', help="directory for the exported figures")
+    parser.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'])
+    parser.add_argument('--method', default='minmax', choices=METHODS)
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--workers', type=int, help="worker processes, default: one per core")
+    parser.add_argument('--show', action='store_true', help="open interactive windows instead of exporting")
+    args = parser.parse_args()
+
+    filenames = []
+    for path in args.paths:
+        filenames += find_sessions(path) if os.path.isdir(path) else [path]
+    if not filenames:
+        print("no Cable_data sessions found")
+        return 1
+
+    if args.show:
+        import matplotlib.pyplot as plt
+        for filename in filenames:
+            show_session(open_session(filename), args.method, os.path.basename(filename))
+        plt.show()
+        return 0
+
+    for paths in export_sessions(filenames, args.out, args.format, args.method, args.dpi, args.workers):
+        print("\n".join(paths))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
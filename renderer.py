@@ -0,0 +1,80 @@
+import time
+import pygame
+
+
+class DirtyRenderer:
+    def __init__(self, screen, background, dirty_rects=True):
+        # Restores a cached static background and pushes only the screen regions that changed.
+        # Every frame: begin_frame(), draw the moving elements and add() each of them, then end_frame().
+        # An element is pushed when its rect or signature differs from the previous frame,
+        # a signature of None means the element always counts as changed.
+        self.screen = screen
+        self.background = background
+        self.screen_rect = screen.get_rect()
+        self.dirty_rects = dirty_rects
+        self.drawn = {}
+        self.current = {}
+        self.push_all = True
+        self.frame_start = 0.0
+        # per mode: [frames, pushed pixels, frame seconds]
+        self.stats = {True: [0, 0, 0.0], False: [0, 0, 0.0]}
+        self.last_area = 0
+
+    def set_dirty_rects(self, dirty_rects):
+        if dirty_rects != self.dirty_rects:
+            self.dirty_rects = dirty_rects
+            self.push_all = True
+
+    def set_background(self, background):
+        self.background = background
+        self.push_all = True
+
+    def begin_frame(self, full_clear=False):
+        # full_clear: restore the whole background, needed after drawing translucent full-screen layers
+        self.frame_start = time.perf_counter()
+        if not self.dirty_rects or full_clear or self.push_all:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect, signature in self.drawn.values():
+                self.screen.blit(self.background, rect, rect)
+        self.current = {}
+
+    def add(self, key, rect, signature=None):
+        self.current[key] = (pygame.Rect(rect), signature)
+
+    def end_frame(self):
+        if not self.dirty_rects or self.push_all:
+            pygame.display.flip()
+            area = self.screen_rect.width * self.screen_rect.height
+            self.push_all = False
+        else:
+            rects = []
+            for key, (rect, signature) in self.current.items():
+                previous = self.drawn.get(key)
+                if previous is None or signature is None or previous != (rect, signature):
+                    rects.append(rect)
+                    if previous is not None:
+                        rects.append(previous[0])
+            for key in self.drawn.keys() - self.current.keys():
+                rects.append(self.drawn[key][0])
+            rects = [rect.clip(self.screen_rect) for rect in rects]
+            rects = [rect for rect in rects if rect.width and rect.height]
+            pygame.display.update(rects)
+            area = sum(rect.width * rect.height for rect in rects)
+
+        self.drawn = self.current
+        self.last_area = area
+        mode = self.stats[self.dirty_rects]
+        mode[0] += 1
+        mode[1] += area
+        mode[2] += time.perf_counter() - self.frame_start
+
+    def summary(self):
+        lines = []
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        for dirty_rects, (frames, area, seconds) in self.stats.items():
+            if frames:
+                name = "dirty rects" if dirty_rects else "full flip"
+                lines.append(f"{name}: {frames} frames, {area / frames / screen_area * 100:.1f}% of the screen pushed, "
+                             f"{seconds / frames * 1000:.2f} ms per frame")
+        return "\n".join(lines)
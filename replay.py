@@ -0,0 +1,313 @@
+import argparse
+import bisect
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pygame
+from analyze_sessions import format_table, write_csv
+from fixed_step import FixedStepper, SimClock
+from helpers import special_overlay
+from scene import CableScene, KEY_BITS, W, H, hole_pos
+from session_format import find_sessions, has_column, open_session, session_column
+from telemetry import TelemetryWriter
+
+# Summary columns of a batch replay: (key, header, format)
+COLUMNS = [
+    ('session', 'session', '{}'),
+    ('frames', 'frames', '{:d}'),
+    ('keys', 'keys', '{}'),
+    ('speedup', 'speed-up', '{:.0f}x'),
+    ('force_rms', 'F error rms [N]', '{:.3f}'),
+    ('force_max', 'F error max [N]', '{:.3f}'),
+    ('end_pos_max', 'end_pos error max [px]', '{:.1f}'),
+    ('recorded_score', 'score', '{:.1f}'),
+    ('score', 'replayed', '{:.1f}'),
+    ('recorded_shocks', 'shocks', '{:d}'),
+    ('shocks', 'replayed', '{:d}'),
+]
+
+
+def infer_keys(session):
+    # KEY_BITS per frame for logs from before the 'keys' field. c and v show up as assist/special flips; space
+    # as a shock or as the carried cable weight (Force_locked_cable, zero while every cable is plugged or parked)
+    # switching on or off in the next frame's snapshot, which is taken before that frame's keys.
+    frames = len(session)
+    keys = np.zeros(frames, dtype=np.uint8)
+    for flag, key in (('assist_active', ord('c')), ('special_active', ord('v'))):
+        if has_column(session, flag):
+            flips = np.flatnonzero(np.diff(session_column(session, flag).astype(bool))) + 1
+            keys[flips] |= KEY_BITS[key]
+    if has_column(session, 'shocks'):
+        keys[np.flatnonzero(np.diff(session_column(session, 'shocks')) > 0) + 1] |= KEY_BITS[ord(' ')]
+    carrying = np.any(session_column(session, 'Force_locked_cable') != 0, axis=1)
+    keys[np.flatnonzero(np.diff(carrying))] |= KEY_BITS[ord(' ')]
+    return keys
+
+
+def session_keys(session):
+    # The recorded keys when the session has them, otherwise what infer_keys makes of it, and which one it was
+    if has_column(session, 'keys'):
+        keys = session_column(session, 'keys').astype(np.uint8)
+        if keys.any():
+            return keys, 'recorded'
+    return infer_keys(session), 'inferred'
+
+
+class Replay:
+    def __init__(self, session, screen=None, checkpoint_interval=1.0, solver=None, dt=0.01, max_substeps=4):
+        # Plays a recorded session back through a fresh CableScene on a SimClock: every frame feeds the recorded
+        # handle position and key releases through the same steps as cable_sim (haptic snapshot, keys, fixed
+        # step cable physics, connectors, special mode) and compares the forces and the cable end to the log.
+        # A checkpoint of the scene is kept every checkpoint_interval seconds of the session, seek() starts
+        # from the nearest one before the target instead of from the first frame.
+        # solver: CableSystem solver settings to try, e.g. {'tolerance': 2.0}
+        self.times = np.asarray(session_column(session, 'time'), dtype=float)
+        self.mouse_pos = np.asarray(session_column(session, 'mouse_pos'), dtype=float)
+        self.recorded_force = np.asarray(session_column(session, 'Force'), dtype=float)
+        self.recorded_end_pos = np.asarray(session_column(session, 'end_pos'), dtype=float)
+        self.keys, self.keys_source = session_keys(session)
+        self.frames = len(self.times)
+
+        self.clock = SimClock()
+        self.scene = CableScene(pygame.Surface((W, H)) if screen is None else screen, clock=self.clock)
+        for name, value in (solver or {}).items():
+            setattr(self.scene.cable_system, name, value)
+        self.stepper = FixedStepper(dt=dt, max_substeps=max_substeps, clock=self.clock)
+        self.snapshot = None
+        self.record = None
+        self.position = 0  # next frame to play
+        self.force_error = np.full(self.frames, np.nan)
+        self.end_pos_error = np.full(self.frames, np.nan)
+
+        # Frame times are sums of float steps, a hair extra keeps a frame of exactly dt from rounding to no step
+        self.elapsed = np.diff(self.times, prepend=self.times[0] - dt) + 1e-9
+        if self.frames:
+            self.preroll(self.times[0] - dt)
+        # the first frame of every checkpoint_interval, checkpointed when it is first played
+        self.checkpoint_at = set()
+        if self.frames:
+            starts = np.arange(self.times[0], self.times[-1], checkpoint_interval)
+            self.checkpoint_at = set(np.searchsorted(self.times, starts).tolist())
+        self.checkpoints = {}
+        self.checkpoint_frames = []
+
+    def preroll(self, seconds):
+        # Steps the cables with the handle at its first position for the time before the first record,
+        # e.g. the settle time of a headless_sim run
+        pos = tuple(self.mouse_pos[0])
+        for _ in range(round(seconds / self.stepper.dt)):
+            self.scene.wall.new_frame()
+            self.scene.step(pos)
+            self.scene.place_connectors()
+            self.clock.advance(self.stepper.dt)
+
+    @property
+    def time(self):
+        # Session time of the next frame
+        return self.times[min(self.position, self.frames - 1)] if self.frames else 0.0
+
+    def save_checkpoint(self):
+        self.checkpoints[self.position] = (self.clock.now, self.scene.get_state(), self.stepper.accumulator)
+        bisect.insort(self.checkpoint_frames, self.position)
+
+    def load_checkpoint(self, frame):
+        self.clock.now, state, self.stepper.accumulator = self.checkpoints[frame]
+        self.scene.set_state(state)
+        self.position = frame
+
+    def step_frame(self):
+        # Plays the next frame, returns its telemetry record
+        i = self.position
+        scene = self.scene
+        if i in self.checkpoint_at and i not in self.checkpoints:
+            self.save_checkpoint()
+
+        scene.wall.new_frame()
+        self.snapshot = snapshot = scene.compute_force(scene.raw_position(tuple(self.mouse_pos[i])))
+        mouse_pos = snapshot['mouse_pos']
+        for key, bit in KEY_BITS.items():
+            if self.keys[i] & bit:
+                scene.handle_key(key, mouse_pos)
+        self.stepper.advance(lambda: scene.step(mouse_pos), elapsed=self.elapsed[i])
+        scene.place_connectors()
+        scene.set_special_collision(scene.check_special())
+
+        self.clock.now = self.times[i] + scene.start_time
+        self.record = scene.record(snapshot)
+        self.force_error[i] = np.hypot(*(np.asarray(snapshot['Force']) - self.recorded_force[i]))
+        self.end_pos_error[i] = np.hypot(*(np.asarray(scene.end_pos, dtype=float) - self.recorded_end_pos[i]))
+        self.position += 1
+        return self.record
+
+    def run(self, until=None, telemetry=None):
+        # Plays frames up to (not including) frame `until`, default the end of the session
+        until = self.frames if until is None else min(until, self.frames)
+        while self.position < until:
+            record = self.step_frame()
+            if telemetry is not None:
+                telemetry.write(record)
+
+    def seek(self, frame):
+        # Continues from the latest checkpoint at or before frame (or from here when that is closer) up to frame
+        frame = max(0, min(frame, self.frames))
+        index = bisect.bisect_right(self.checkpoint_frames, frame) - 1
+        if index >= 0 and not self.checkpoint_frames[index] <= self.position <= frame:
+            self.load_checkpoint(self.checkpoint_frames[index])
+        elif frame < self.position:
+            raise ValueError(f"no checkpoint before frame {frame}")
+        self.run(frame)
+
+    def seek_time(self, t):
+        self.seek(int(np.searchsorted(self.times, t)))
+
+    def summary(self):
+        played = self.force_error[~np.isnan(self.force_error)]
+        return {'frames': self.frames, 'keys': self.keys_source,
+                'force_rms': float(np.sqrt(np.mean(played ** 2))) if len(played) else 0.0,
+                'force_max': float(np.max(played)) if len(played) else 0.0,
+                'end_pos_max': float(np.nanmax(self.end_pos_error)) if len(played) else 0.0,
+                'score': float(self.scene.current_score()), 'shocks': self.scene.shocks}
+
+
+def replay_session(filename, solver=None):
+    # Replays one session as fast as possible and compares it to the log, an 'error' entry when that fails
+    name = os.path.basename(filename)
+    try:
+        session = open_session(filename)
+        with contextlib.redirect_stdout(io.StringIO()):  # the scene prints every score
+            start = time.perf_counter()
+            replay = Replay(session, solver=solver)
+            replay.run()
+            seconds = time.perf_counter() - start
+        result = {'session': name, **replay.summary()}
+        result['speedup'] = (replay.times[-1] - replay.times[0]) / seconds if replay.frames > 1 else 0.0
+        if replay.frames and has_column(session, 'score'):
+            result['recorded_score'] = float(session_column(session, 'score')[-1])
+        if replay.frames and has_column(session, 'shocks'):
+            result['recorded_shocks'] = int(session_column(session, 'shocks')[-1])
+        return result
+    except Exception as e:
+        return {'session': name, 'error': f"{type(e).__name__}: {e}"}
+
+
+def replay_sessions(filenames, solver=None, workers=None):
+    # replay_session for every file over a process pool, in the order of filenames
+    if workers == 1:
+        return [replay_session(filename, solver) for filename in filenames]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(replay_session, filenames, [solver] * len(filenames)))
+
+
+def show(replay, speed=1.0, rate=60):
+    # Plays the replay in a window at `speed` times real time (0: as fast as possible).
+    # space pauses, left/right seek 5 s, up/down double/halve the speed, q quits
+    screen = replay.scene.screen
+    overlay = special_overlay((W, H), hole_pos).convert_alpha()
+    font = pygame.font.Font(pygame.font.get_default_font(), 16)
+    display_clock = pygame.time.Clock()
+    paused = False
+    anchor_time, anchor_wall = replay.time, time.perf_counter()
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYUP and event.key == ord('q')):
+                running = False
+            elif event.type == pygame.KEYUP:
+                if event.key == ord(' '):
+                    paused = not paused
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    replay.seek_time(replay.time + (5 if event.key == pygame.K_RIGHT else -5))
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed /= 2
+                anchor_time, anchor_wall = replay.time, time.perf_counter()
+
+        if not paused and replay.position < replay.frames:
+            if speed:
+                target = anchor_time + (time.perf_counter() - anchor_wall) * speed
+                replay.run(int(np.searchsorted(replay.times, target, side='right')))
+            else:
+                replay.run(replay.position + 100)
+
+        scene = replay.scene
+        screen.fill((255, 255, 255))
+        scene.wall.draw()
+        for cable in scene.cables:
+            cable.draw()
+        if scene.special_active:
+            screen.blit(overlay, (0, 0))
+        if replay.snapshot is not None:
+            pygame.draw.circle(screen, (0, 0, 0), replay.snapshot['mouse_pos'], 6, 2)
+        text = (f"t {replay.time:.2f} s   frame {replay.position}/{replay.frames}   "
+                f"{'paused' if paused else f'{speed:g}x' if speed else 'max speed'}   "
+                f"score {scene.current_score():.0f}   shocks {scene.shocks}")
+        screen.blit(font.render(text, True, (0, 0, 0)), (0, 0))
+        pygame.display.flip()
+        display_clock.tick(rate)
+
+
+def main():
+    # python replay.py session [--show] [--speed 4] [--seek 30]
+    # python replay.py directory_or_sessions... [--tolerance 2]: replays them all and compares to the logs
+    parser = argparse.ArgumentParser(description="Replays recorded Cable_data sessions through the cable physics.")
+    parser.add_argument('paths', nargs='*', default=['.'], help="session files or directories of sessions")
+    parser.add_argument('--show', action='store_true', help="play the first session in a window")
+    parser.add_argument('--speed', type=float, default=1.0, help="times real time in the window, 0: as fast as possible")
+    parser.add_argument('--seek', type=float, help="start the window at this session time in seconds")
+    parser.add_argument('--checkpoint-interval', type=float, default=1.0, help="session seconds between checkpoints")
+    parser.add_argument('--telemetry', help="write the replayed records of the first session to this .jsonl file")
+    parser.add_argument('--iterations', type=int, help="constraint solver passes to replay with")
+    parser.add_argument('--tolerance', type=float, help="replay with the tolerance driven solver, in pixels a point may still move per pass")
+    parser.add_argument('--max-iterations', type=int)
+    parser.add_argument('--workers', type=int, help="worker processes for several sessions, default: one per core")
+    parser.add_argument('--csv', help="also write the comparison table to this CSV file")
+    args = parser.parse_args()
+    solver = {name: value for name, value in (('iterations', args.iterations), ('tolerance', args.tolerance),
+                                              ('max_iterations', args.max_iterations)) if value is not None}
+
+    filenames = []
+    for path in args.paths:
+        filenames += find_sessions(path) if os.path.isdir(path) else [path]
+    if not filenames:
+        print("no Cable_data sessions found")
+        return 1
+
+    if args.show or args.telemetry:
+        if args.show:
+            pygame.init()
+            screen = pygame.display.set_mode((W, H))
+            pygame.display.set_caption(f"Replay {os.path.basename(filenames[0])}")
+        else:
+            screen = None
+        replay = Replay(open_session(filenames[0]), screen, args.checkpoint_interval, solver)
+        if args.seek is not None:
+            replay.seek_time(args.seek)
+        if args.show:
+            show(replay, args.speed)
+        else:
+            telemetry = TelemetryWriter(args.telemetry)
+            replay.run(telemetry=telemetry)
+            telemetry.close()
+        pygame.quit()
+        summary = replay.summary()
+        print(f"{summary['frames']} frames ({summary['keys']} keys): force error rms {summary['force_rms']:.3f} N, "
+              f"max {summary['force_max']:.3f} N, end_pos error max {summary['end_pos_max']:.1f} px")
+        return 0
+
+    start = time.perf_counter()
+    results = replay_sessions(filenames, solver, args.workers)
+    seconds = time.perf_counter() - start
+    print(format_table(results, COLUMNS))
+    print(f"{len(results)} sessions replayed in {seconds:.2f} s ({args.workers or os.cpu_count()} workers)")
+    if args.csv:
+        write_csv(results, args.csv, COLUMNS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+import math
+import time
+import pygame
+from helpers import Cable
+from helpers import CableSystem
+from helpers import Wall
+from helpers import special_control
+
+# Layout of the cable_sim scene
+W, H = 800, 600
+window_scale = 4000
+
+wall_pos = (700, 0)
+wall_size = (600, 600)
+hole_size = (22, 10)  # one pixel on each end bigger
+hole_pos = [(wall_pos[0] + (hole_size[0] / 2), wall_size[1] / 3),
+            (wall_pos[0] + (hole_size[0] / 2), wall_size[1] / 2),
+            (wall_pos[0] + (hole_size[0] / 2), 2 * wall_size[1] / 3),
+            ]
+hole_colors = [
+    (0, 77 / 2, 64 / 2),
+    (30 / 2, 136 / 2, 229 / 2),
+    (255 / 2, 193 / 2, 7 / 2)
+]
+cable_colors = [(0, 77, 64), (30, 136, 229), (255, 193, 7)]
+# Bits of the per-frame 'keys' telemetry field, one per game key released in that frame
+KEY_BITS = {ord(' '): 1, ord('c'): 2, ord('v'): 4}
+
+
+class CableScene:
+    def __init__(self, screen, clock=time.time):
+        # The cables, the wall, the forces and the game state of cable_sim, without a window, device or loop.
+        # screen: surface the cables and wall draw on, clock: seconds for the score and the shocks
+        # (time.time when playing, a simulated clock when running headless)
+        self.screen = screen
+        self.clock = clock
+        self.wall = Wall(screen, wall_pos, wall_size, hole_pos, hole_size, hole_colors)
+        self.cables = [
+            Cable((W // 6, H // 4 + 100 * i), screen, colour, target=hole_pos[i], clock=clock)
+            for i, colour in enumerate(cable_colors)
+        ]
+        self.cable_system = CableSystem(self.cables)
+        self.dummy_cable = Cable((W // 6, H // 4), screen, cable_colors[0], target=hole_pos[0], clock=clock)
+        self.cables[0].update((0, 0))
+        self.cables[0].draw_connector_end()
+
+        self.shocks = 0
+        self.start_time = clock()
+        self.score = 0
+        self.assist_active = False
+        self.special_active = False
+        self.special_collision = False
+        self.special_collision_last = False
+        self.special_collision_point = (0, 0)
+        self.end_pos = (0, 0)
+        self.finished = False  # every cable scored
+        self.keys = 0  # KEY_BITS of the keys handled since the last record()
+
+    def unlocked_cable(self):
+        unlocked_cable = self.dummy_cable
+        for cable in self.cables:
+            if not cable.locked:
+                unlocked_cable = cable
+        return unlocked_cable
+
+    def compute_force(self, raw_pos):
+        # Handle position after the special mode and the total force on it, as a snapshot dict
+        mouse_pos = raw_pos
+        if self.special_active and self.special_collision:
+            mouse_pos0 = self.special_collision_point[0] + (mouse_pos[0]-self.special_collision_point[0])/2
+            mouse_pos1 = self.special_collision_point[1] + (mouse_pos[1]-self.special_collision_point[1])/2
+            mouse_pos = (mouse_pos0, mouse_pos1)
+
+        unlocked_cable = self.dummy_cable
+        F_locked_cable = pygame.Vector2(0, 0)
+        for cable, F_weight in zip(self.cables, self.cable_system.get_forces_weight()):
+            if not cable.locked:
+                unlocked_cable = cable
+                F_locked_cable = pygame.Vector2(*F_weight)
+
+        F_shock = pygame.Vector2(0, 0)
+        for cable in self.cables:
+            F_shock += cable.get_lightning_force()
+
+        F_wall = pygame.Vector2(0, 0)
+        for cable in self.cables:
+            if not cable.locked:
+                proxy_pos, F_wall_part = self.wall.collision_force(mouse_pos, cable.red_rect_rect)
+                F_wall += F_wall_part
+
+        if not unlocked_cable.locked and self.assist_active:
+            F_assist = -0.7*F_locked_cable
+        else:
+            F_assist = pygame.Vector2(0,0)
+
+        F = F_shock + F_locked_cable - F_wall + F_assist
+
+        return {'mouse_pos': mouse_pos, 'Force': F, 'Force_locked_cable': F_locked_cable, 'Force_wall': F_wall}
+
+    def raw_position(self, mouse_pos):
+        # The device position compute_force turns into mouse_pos in the current special mode state,
+        # for feeding recorded handle positions back in
+        if self.special_active and self.special_collision:
+            x, y = self.special_collision_point
+            return (x + 2 * (mouse_pos[0] - x), y + 2 * (mouse_pos[1] - y))
+        return mouse_pos
+
+    def handle_key(self, key, mouse_pos):
+        # Key releases of the game: space plugs/unplugs, c toggles the assist, v the special mode.
+        # Returns False for keys the scene does not use.
+        if key == ord(' '):
+            self.press_space(mouse_pos)
+        elif key == ord('c'):
+            self.assist_active = not self.assist_active
+        elif key == ord('v'):
+            self.special_active = not self.special_active
+        else:
+            return False
+        self.keys |= KEY_BITS[key]
+        return True
+
+    def press_space(self, mouse_pos):
+        for cable in self.cables:
+            # Unlocking the cable or warning the user based on mouse position
+            if cable.locked:
+                status = cable.check_hover_status(mouse_pos)
+
+                if status == "red":
+                    cable.enable_lightning(5)
+                    self.shocks += 1
+                elif status == "green":
+                    cable.locked = False
+
+                    # Locking the cable to the current mouse position
+            else:
+                if self.wall.check_in_hole(cable.red_rect_rect):
+                    accurracy = max(1, 100 - math.sqrt(
+                        (cable.target[0] - cable.red_rect_rect.center[0]) ** 2 + (
+                                    cable.target[1] - cable.red_rect_rect.center[1]) ** 2))
+                    print(f"Cable{cable.colour} scored {accurracy} points!")
+                    self.score -= cable.scored_points
+                    self.score += accurracy
+                    cable.scored_points = accurracy
+                    if all(cable.scored_points > 0 for cable in self.cables):
+                        self.finished = True
+
+                elif not self.wall.check_in_hole(cable.red_rect_rect) and cable.scored_points:
+                    print(f"Cable{cable.colour} removed {cable.scored_points} points!")
+                    self.score -= cable.scored_points
+                    cable.scored_points = 0
+
+                cable.locked = True
+                cable.locked_position = pygame.Vector2(self.end_pos)
+
+    def step(self, mouse_pos):
+        # Moves the cable end towards the handle (stopped by the wall) and steps the cable physics
+        unlocked_cable = self.unlocked_cable()
+
+        if mouse_pos[0] < 680:
+            end_pos = mouse_pos
+        elif self.wall.check_collision(unlocked_cable.red_rect_rect) and not self.wall.check_in_hole(
+                unlocked_cable.red_rect_rect):
+            end_pos = (682, mouse_pos[1])
+        elif self.wall.check_in_hole(unlocked_cable.red_rect_rect):
+            if mouse_pos[0] > 700:
+                end_pos = (700, mouse_pos[1])
+            else:
+                end_pos = (mouse_pos[0], mouse_pos[1])
+        else:
+            end_pos = mouse_pos
+
+        self.end_pos = end_pos
+        self.cable_system.update(end_pos)
+        return unlocked_cable
+
+    def update(self, mouse_pos, stepper):
+        # The game part of a frame, with the scene locked: the physics steps that are due (stepper: a
+        # FixedStepper), the connectors placed on the new state and the special mode check. cable_sim and the
+        # physics process of multiprocess_sim both run their frames through here. Returns the steps run.
+        steps = stepper.advance(lambda: self.step(mouse_pos))
+        self.place_connectors()
+        self.set_special_collision(self.check_special())
+        return steps
+
+    def place_connectors(self):
+        # What drawing the cables does to the game state, for when nothing is drawn
+        for cable in self.cables:
+            cable.place_connector()
+            cable.expire_lightning()
+
+    def check_special(self):
+        return special_control(self.unlocked_cable(), None, hole_pos, self.special_active)
+
+    def set_special_collision(self, special_collision):
+        # The special mode halves the handle motion from the point where the cable came near a hole
+        self.special_collision = special_collision
+        if special_collision and not self.special_collision_last:
+            self.special_collision_point = self.end_pos
+            self.special_collision_last = True
+        if not special_collision:
+            self.special_collision_last = False
+
+    def current_score(self):
+        return self.score - self.clock() + self.start_time
+
+    def record(self, snapshot):
+        # One telemetry record for the current frame
+        data = dict()
+        F = snapshot['Force']
+        F_locked_cable = snapshot['Force_locked_cable']
+        F_wall = snapshot['Force_wall']
+        data['time'] = self.clock() - self.start_time
+        data['Force'] = (F[0], F[1])
+        data['Force_locked_cable'] = (F_locked_cable[0], F_locked_cable[1])
+        data['Force_wall'] = (F_wall[0], F_wall[1])
+        data['mouse_pos'] = snapshot['mouse_pos']
+        data['end_pos'] = self.end_pos
+        data['shocks'] = self.shocks
+        data['score'] = self.current_score()
+        data['assist_active'] = self.assist_active
+        data['special_active'] = self.special_active
+        data['keys'] = self.keys
+        self.keys = 0
+        if 'Force_delayed' in snapshot:
+            # under simulated teleoperation lag (teleop.TeleopChannel): the force without and with compensation,
+            # the age in seconds of the handle position behind it and how far off that position was in pixels
+            for name in ('Force_delayed', 'Force_compensated'):
+                data[name] = (snapshot[name][0], snapshot[name][1])
+            data['latency'] = snapshot['latency']
+            data['handle_error'] = snapshot['handle_error']
+        return data
+
+    def get_state(self):
+        # Everything a frame changes, as copies, for set_state() to go back to (the clock is not included)
+        return {
+            'points': self.cable_system.points.copy(),
+            'old_points': self.cable_system.old_points.copy(),
+            'cables': [(cable.locked, tuple(cable.locked_position), cable.scored_points, cable.lightning_enable,
+                        cable.lightning_enabled_on, cable.lightning_show_for, cable.lightning_time_to_run)
+                       for cable in self.cables],
+            'scene': (self.shocks, self.start_time, self.score, self.assist_active, self.special_active,
+                      self.special_collision, self.special_collision_last, self.special_collision_point,
+                      self.end_pos, self.finished, self.keys),
+        }
+
+    def set_state(self, state):
+        # Restores a get_state() copy, set the clock to the time it was taken first
+        self.cable_system.points[...] = state['points']
+        self.cable_system.old_points[...] = state['old_points']
+        for cable, cable_state in zip(self.cables, state['cables']):
+            (cable.locked, locked_position, cable.scored_points, cable.lightning_enable,
+             cable.lightning_enabled_on, cable.lightning_show_for, cable.lightning_time_to_run) = cable_state
+            cable.locked_position = pygame.Vector2(locked_position)
+            cable.moved()
+            cable.place_connector()
+        (self.shocks, self.start_time, self.score, self.assist_active, self.special_active,
+         self.special_collision, self.special_collision_last, self.special_collision_point,
+         self.end_pos, self.finished, self.keys) = state['scene']
@@ -0,0 +1,197 @@
+import json
+import os
+import struct
+import sys
+import numpy as np
+from telemetry import load_session
+
+# Columnar session file: MAGIC, a little endian uint32 header length, a JSON header and then one
+# raw little endian array per field, each starting on a 64 byte boundary so it can be memory-mapped.
+MAGIC = b'CABLESES'
+VERSION = 1
+ALIGNMENT = 64
+EXTENSION = '.cses'
+
+# field name: (dtype, values per frame, value used when a frame does not have the field)
+FIELDS = {
+    'time': ('<f8', 1, np.nan),
+    'Force': ('<f8', 2, np.nan),
+    'Force_locked_cable': ('<f8', 2, np.nan),
+    'Force_wall': ('<f8', 2, np.nan),
+    'mouse_pos': ('<f8', 2, np.nan),
+    'end_pos': ('<f8', 2, np.nan),
+    'shocks': ('<i4', 1, 0),
+    'score': ('<f8', 1, np.nan),
+    'assist_active': ('u1', 1, 0),
+    'special_active': ('u1', 1, 0),
+    'keys': ('u1', 1, 0),  # scene.KEY_BITS
+}
+# Fields only some sessions have, a column is written when any frame has the field
+OPTIONAL_FIELDS = {
+    # under simulated teleoperation lag, see scene.CableScene.record
+    'Force_delayed': ('<f8', 2, np.nan),
+    'Force_compensated': ('<f8', 2, np.nan),
+    'latency': ('<f8', 1, np.nan),
+    'handle_error': ('<f8', 1, np.nan),
+}
+
+
+class ColumnarSession:
+    def __init__(self, path):
+        # Opens a columnar session, columns are memory-mapped only when they are first used
+        self.path = path
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a columnar session file")
+            header_length, = struct.unpack('<I', file.read(4))
+            self.header = json.loads(file.read(header_length))
+        self.rows = self.header['rows']
+        self.columns = list(self.header['columns'])
+        self.loaded = {}
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, name):
+        return name in self.header['columns']
+
+    def __getitem__(self, name):
+        if name not in self.loaded:
+            column = self.header['columns'][name]
+            if self.rows == 0:
+                self.loaded[name] = np.zeros(column['shape'], dtype=column['dtype'])
+            else:
+                self.loaded[name] = np.memmap(self.path, dtype=column['dtype'], mode='r',
+                                              offset=column['offset'], shape=tuple(column['shape']))
+        return self.loaded[name]
+
+
+def empty_column(field, rows):
+    dtype, width, default = field
+    return np.full((rows,) if width == 1 else (rows, width), default, dtype=dtype)
+
+
+def columns_from_records(records, rows=None):
+    # Builds one array per field from per-frame dicts, records may be any iterable when rows is given.
+    # Fields in neither FIELDS nor OPTIONAL_FIELDS are left out, with a warning.
+    if rows is None:
+        records = list(records)
+        rows = len(records)
+    arrays = {name: empty_column(field, rows) for name, field in FIELDS.items()}
+    unknown = set()
+    count = 0
+    for record in records:
+        for name, value in record.items():
+            if name not in arrays:
+                if name not in OPTIONAL_FIELDS:
+                    unknown.add(name)
+                    continue
+                arrays[name] = empty_column(OPTIONAL_FIELDS[name], rows)
+            if value is not None:
+                arrays[name][count] = value
+        count += 1
+    if unknown:
+        sys.stderr.write(f"fields without a column left out: {', '.join(sorted(unknown))}\n")
+    if count != rows:
+        # fewer complete records than lines, e.g. a truncated last line
+        arrays = {name: array[:count] for name, array in arrays.items()}
+    return arrays
+
+
+def write_columns(path, arrays, source=None):
+    rows = len(next(iter(arrays.values()))) if arrays else 0
+    sizes = {name: -(-array.nbytes // ALIGNMENT) * ALIGNMENT for name, array in arrays.items()}
+
+    # Grow the header space until the header, with the final column offsets in it, fits
+    start = ALIGNMENT
+    while True:
+        columns = {}
+        offset = start
+        for name, array in arrays.items():
+            columns[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += sizes[name]
+        header = {'version': VERSION, 'rows': rows, 'source': source, 'columns': columns}
+        header_bytes = json.dumps(header).encode('utf-8')
+        if len(MAGIC) + 4 + len(header_bytes) <= start:
+            break
+        start = -(-(len(MAGIC) + 4 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    header_bytes += b' ' * (start - len(MAGIC) - 4 - len(header_bytes))
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack('<I', len(header_bytes)))
+        file.write(header_bytes)
+        for name, array in arrays.items():
+            file.seek(columns[name]['offset'])
+            file.write(np.ascontiguousarray(array).tobytes())
+        file.truncate(offset)
+
+
+def convert_session(filename, out_path=None):
+    # Converts a Cable_data_*.json or *.jsonl log into a columnar session file next to it
+    if out_path is None:
+        out_path = os.path.splitext(filename)[0] + EXTENSION
+    if filename.endswith('.jsonl'):
+        # Stream the lines straight into preallocated columns instead of building every dict first
+        with open(filename, 'rb') as file:
+            rows = sum(1 for _ in file)
+        with open(filename, 'r', encoding='utf-8') as file:
+            arrays = columns_from_records(iter_json_lines(file), rows)
+    else:
+        arrays = columns_from_records(load_session(filename))
+    write_columns(out_path, arrays, source=os.path.basename(filename))
+    return out_path
+
+
+def iter_json_lines(file):
+    for line in file:
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            return  # truncated tail of a crashed session
+
+
+def open_session(filename):
+    # Columnar file when there is one (converted or given directly), otherwise the per-frame dicts.
+    # A columnar file older than the log it was converted from is converted again first.
+    columnar = os.path.splitext(filename)[0] + EXTENSION
+    if not filename.endswith(EXTENSION) and not os.path.exists(columnar):
+        return load_session(filename)
+    session = ColumnarSession(columnar)
+    source = filename
+    if filename.endswith(EXTENSION):
+        source = session.header['source'] and os.path.join(os.path.dirname(filename), session.header['source'])
+    if source and os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(columnar):
+        convert_session(source, columnar)
+        session = ColumnarSession(columnar)
+    return session
+
+
+def find_sessions(directory='.'):
+    # One file per Cable_data_* session in directory, sorted, open_session picks the columnar file when there is one
+    filenames = dict()
+    for item in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(item)
+        if "Cable_data" in item and extension in ('.json', '.jsonl', EXTENSION) and not stem.endswith(('_timing', '_teleop')):
+            filenames.setdefault(stem, os.path.join(directory, item))
+    return list(filenames.values())
+
+
+def session_column(session, name):
+    # One field of a session as an array, for columnar sessions and lists of per-frame dicts alike
+    if isinstance(session, ColumnarSession):
+        return session[name]
+    return np.array([item[name] for item in session])
+
+
+def has_column(session, name):
+    # Whether a session has the field, older logs lack some
+    if isinstance(session, ColumnarSession):
+        return name in session
+    return len(session) > 0 and name in session[0]
+
+
+if __name__ == "__main__":
+    # python session_format.py Cable_data_*.json[l]
+    for filename in sys.argv[1:]:
+        print(f"{filename} -> {convert_session(filename)}")
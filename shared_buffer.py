@@ -0,0 +1,82 @@
+import contextlib
+import numpy as np
+from multiprocessing import shared_memory
+
+HEADER = 3  # int64 counters in front of the slots: frames published, sequence of slot 0, sequence of slot 1
+
+
+def align(size, to=8):
+    return -(-size // to) * to
+
+
+class SharedDoubleBuffer:
+    def __init__(self, fields, name=None):
+        # Newest-value channel between processes in one multiprocessing.shared_memory block: two slots holding
+        # the numpy arrays fields = {key: (dtype, shape)} and sequence counters, no lock on either side.
+        # The writer fills the slot the newest frame is not in and then publishes it. Readers copy the newest
+        # published slot and retry when the writer got to that slot during the copy (its sequence is odd while
+        # being written and moves on when it is). A reader that is slower than the writer skips frames.
+        # name: attach to the block another process created with the same fields, None creates a new one
+        self.fields = {key: (np.dtype(dtype), tuple(shape)) for key, (dtype, shape) in fields.items()}
+        offsets, size = {}, 0
+        for key, (dtype, shape) in self.fields.items():
+            offsets[key] = size
+            size = align(size + dtype.itemsize * int(np.prod(shape)))
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=HEADER * 8 + 2 * size)
+        self.name = self.shm.name
+        # Aligned int64 stores are atomic, a reader never sees half a counter
+        self.sequences = np.ndarray((HEADER,), np.int64, buffer=self.shm.buf)
+        self.slots = [{key: np.ndarray(shape, dtype, buffer=self.shm.buf, offset=HEADER * 8 + i * size + offsets[key])
+                       for key, (dtype, shape) in self.fields.items()} for i in range(2)]
+        if self.owner:
+            self.sequences[:] = 0
+        self.read_sequence = 0  # last frame read by this side
+        self.retries = 0  # copies thrown away because the writer overtook them
+
+    def new_frame(self):
+        # Zeroed arrays laid out like a slot, for read() to copy into
+        return {key: np.zeros(shape, dtype) for key, (dtype, shape) in self.fields.items()}
+
+    @contextlib.contextmanager
+    def writing(self):
+        # with buffer.writing() as frame: frame['points'][...] = ...  publishes on leaving the block.
+        # Fields that are not written keep what they held two frames ago, so write every field every frame.
+        published = int(self.sequences[0]) + 1
+        slot = published % 2
+        self.sequences[1 + slot] = 2 * published - 1
+        yield self.slots[slot]
+        self.sequences[1 + slot] = 2 * published
+        self.sequences[0] = published
+
+    def write(self, values):
+        # Publishes a frame from a dict of arrays or scalars, one per field
+        with self.writing() as frame:
+            for key, value in values.items():
+                frame[key][...] = value
+
+    def read(self, frame, max_retries=100):
+        # Copies the newest frame into frame (from new_frame()) and returns its number, or None when there
+        # is no frame newer than the last one read (frame is then left as it was)
+        for _ in range(max_retries):
+            published = int(self.sequences[0])
+            if published == self.read_sequence:
+                return None
+            slot = published % 2
+            sequence = int(self.sequences[1 + slot])
+            if sequence == 2 * published:
+                for key, array in frame.items():
+                    array[...] = self.slots[slot][key]
+                if int(self.sequences[1 + slot]) == sequence:
+                    self.read_sequence = published
+                    return published
+            self.retries += 1
+        return None
+
+    def close(self):
+        # The numpy views must go before the block can be closed, the creating side also removes it
+        self.sequences = None
+        self.slots = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,148 @@
+import json
+import math
+import threading
+import time
+import numpy as np
+
+BUCKETS_PER_OCTAVE = 4
+BUCKETS = 40 * BUCKETS_PER_OCTAVE  # 1 ns up to about 18 minutes
+
+
+class NullTiming:
+    # What StageTimer.stage returns while disabled, entering and leaving it does nothing
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMING = NullTiming()
+
+
+class Stage:
+    def __init__(self, name, window):
+        # Durations of one stage in ns: the last `window` samples for rolling percentiles and
+        # a log2 histogram (BUCKETS_PER_OCTAVE buckets per doubling) of the whole session
+        self.name = name
+        self.samples = np.zeros(window, dtype=np.int64)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, ns):
+        self.samples[self.count % len(self.samples)] = ns
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        self.buckets[min(BUCKETS - 1, int(math.log2(ns) * BUCKETS_PER_OCTAVE)) if ns > 0 else 0] += 1
+
+    def rolling(self):
+        # p50/p95/p99/max in ms over the last window
+        samples = self.samples[:min(self.count, len(self.samples))]
+        if not len(samples):
+            return None
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99)) / 1e6
+        return {'p50': p50, 'p95': p95, 'p99': p99, 'max': samples.max() / 1e6}
+
+    def session(self):
+        # Whole session percentiles in ms from the histogram, upper bucket edges (at most 19% high)
+        result = {'count': self.count, 'mean': self.total / self.count / 1e6 if self.count else 0.0,
+                  'max': self.max / 1e6}
+        cumulative = np.cumsum(self.buckets)
+        for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            bucket = int(np.searchsorted(cumulative, q * self.count))
+            result[name] = min(2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE), self.max) / 1e6
+        return result
+
+
+class StageTiming:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.stage.add(time.perf_counter_ns() - self.start)
+        return False
+
+
+class StageTimer:
+    def __init__(self, enabled=False, window=1000):
+        # Times named stages with perf_counter_ns: `with timer.stage('cable update'): ...`.
+        # While disabled stage() only returns NULL_TIMING, so the instrumentation can stay in the hot loops.
+        # Stages may be timed from several threads, but each stage should belong to one thread.
+        self.enabled = enabled
+        self.window = window
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def get_stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            with self.lock:
+                stage = self.stages.setdefault(name, Stage(name, self.window))
+        return stage
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_TIMING
+        return StageTiming(self.get_stage(name))
+
+    def record(self, name, ns):
+        # For durations measured elsewhere
+        if self.enabled:
+            self.get_stage(name).add(ns)
+
+    def lines(self):
+        # One line per stage with the rolling percentiles, for the overlay
+        lines = [f"{'stage':<18}{'p50':>7}{'p95':>7}{'p99':>7}{'max':>7} ms"]
+        for name, stage in list(self.stages.items()):
+            rolling = stage.rolling()
+            if rolling is not None:
+                lines.append(f"{name:<18}{rolling['p50']:>7.2f}{rolling['p95']:>7.2f}{rolling['p99']:>7.2f}{rolling['max']:>7.2f}")
+        return lines
+
+    def summary(self):
+        return {name: stage.session() for name, stage in list(self.stages.items()) if stage.count}
+
+    def summary_text(self):
+        lines = [f"{'stage':<22}{'calls':>8}{'mean':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8} ms"]
+        for name, result in self.summary().items():
+            lines.append(f"{name:<22}{result['count']:>8}{result['mean']:>8.3f}{result['p50']:>8.3f}"
+                         f"{result['p95']:>8.3f}{result['p99']:>8.3f}{result['max']:>8.3f}")
+        return "\n".join(lines)
+
+    def write_summary(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2)
+
+
+class TimingOverlay:
+    def __init__(self, timer, font, position=(0, 60), interval=0.25):
+        # Draws the timer's rolling percentiles, re-rendered every `interval` seconds
+        self.timer = timer
+        self.font = font
+        self.position = position
+        self.interval = interval
+        self.rendered = []
+        self.rendered_at = 0.0
+
+    def draw(self, screen):
+        # Returns the area drawn on and a signature that only changes when the text does
+        now = time.perf_counter()
+        if now - self.rendered_at >= self.interval:
+            self.rendered = [self.font.render(line, True, (0, 0, 0), (255, 255, 255)) for line in self.timer.lines()]
+            self.rendered_at = now
+        x, y = self.position
+        drawn = screen.get_rect().clip((x, y, 0, 0))
+        for surface in self.rendered:
+            drawn.union_ip(screen.blit(surface, (x, y)))
+            y += surface.get_height()
+        return drawn, self.rendered_at
@@ -0,0 +1,121 @@
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+
+
+class TelemetryWriter:
+    def __init__(self, path, max_queue=10000, chunk_size=256, flush_interval=0.5, sync_interval=2.0):
+        # Streams per-frame records to an append-only JSON lines file from a background thread.
+        # write() never blocks: when the bounded queue is full the record is dropped and counted.
+        # Every chunk is flushed to the OS right away and fsynced every sync_interval seconds,
+        # so a crash loses at most the records still in the queue. When the thread fails (e.g. a record
+        # json cannot encode, a full disk) it stops, and write() and close() raise its error.
+        self.path = path
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.sync_interval = sync_interval
+        self.queue = queue.Queue(max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.chunks = 0
+        self.error = None
+
+        if os.path.exists(path):
+            recover_telemetry(path)
+        self.file = open(path, 'a', encoding='utf-8')
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        if self.error is not None:
+            raise self.error
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        last_sync = time.monotonic()
+        try:
+            while self.running or not self.queue.empty():
+                chunk = []
+                try:
+                    chunk.append(self.queue.get(timeout=self.flush_interval))
+                    while len(chunk) < self.chunk_size:
+                        chunk.append(self.queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+                if chunk:
+                    self.file.write(''.join(json.dumps(record) + '\n' for record in chunk))
+                    self.file.flush()
+                    self.written += len(chunk)
+                    self.chunks += 1
+
+                if time.monotonic() - last_sync >= self.sync_interval:
+                    os.fsync(self.file.fileno())
+                    last_sync = time.monotonic()
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+            self.running = False
+
+    def stats(self):
+        return {'written': self.written, 'dropped': self.dropped, 'queued': self.queue.qsize(), 'chunks': self.chunks}
+
+    def close(self):
+        # Writes out everything still queued, then syncs and closes the file, raises the error of a failed thread
+        self.running = False
+        self.thread.join()
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        finally:
+            self.file.close()
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+
+def recover_telemetry(path):
+    # Cuts off a half written last line left by a crash, returns the number of complete records
+    with open(path, 'rb+') as file:
+        data = file.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            file.truncate(end)
+    return data[:end].count(b'\n')
+
+
+def load_session(filename):
+    # Loads a session as a list of per-frame dicts, from a JSON lines log or an old Cable_data_*.json list
+    with open(filename, 'r', encoding='utf-8') as file:
+        if filename.endswith('.json'):
+            return json.load(file)
+        records = []
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break  # truncated tail of a crashed session
+        return records
+
+
+def finish_session(telemetry, scene, stepper, timer, teleop=None):
+    # The end of a session in cable_sim and in multiprocess_sim's physics process: the summaries, the ones
+    # that are written next to the log, and the log closed
+    base = os.path.splitext(telemetry.path)[0]
+    print(stepper.summary())
+    if timer.stages:
+        print(timer.summary_text())
+        timer.write_summary(base + "_timing.json")
+    if teleop is not None:
+        print(teleop.summary_text())
+        teleop.write_summary(base + "_teleop.json")
+    print(f"Total score: {scene.score}")
+    telemetry_stats = telemetry.close()
+    print(f"Telemetry: {telemetry_stats['written']} records written to {telemetry.path}, {telemetry_stats['dropped']} dropped")
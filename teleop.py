@@ -0,0 +1,225 @@
+import json
+import math
+import os
+import time
+import pygame
+from collections import deque
+from scene import KEY_BITS
+
+
+class DelayLine:
+    def __init__(self, delay, capacity=1024):
+        # Bounded ring buffer that hands out what was pushed `delay` seconds ago. When more than `capacity`
+        # samples are in flight the oldest undelivered ones are overwritten, the output then runs with less
+        # delay instead of the buffer growing (counted in overruns, one per push that cut the delay short).
+        self.delay = delay
+        self.capacity = capacity
+        self.times = [-math.inf] * capacity
+        self.items = [None] * capacity
+        self.written = 0
+        self.read_index = -1  # sample being delivered now
+        self.overruns = 0
+
+    def push(self, t, item):
+        slot = self.written % self.capacity
+        self.times[slot] = t
+        self.items[slot] = item
+        self.written += 1
+        oldest = self.written - self.capacity  # older samples have been overwritten
+        if self.read_index < oldest:
+            self.read_index = oldest
+            self.overruns += 1
+
+    def read(self, now, arrived=None):
+        # The newest item pushed at or before now - delay and its push time, (None, None) before the first one.
+        # arrived: list the items delivered for the first time by this read are appended to, oldest first
+        target = now - self.delay
+        while self.read_index + 1 < self.written and self.times[(self.read_index + 1) % self.capacity] <= target:
+            self.read_index += 1
+            if arrived is not None:
+                arrived.append(self.items[self.read_index % self.capacity])
+        if self.read_index < 0:
+            return None, None
+        slot = self.read_index % self.capacity
+        return self.items[slot], self.times[slot]
+
+    def pending(self):
+        return self.written - 1 - self.read_index
+
+
+class MotionPredictor:
+    def __init__(self, smoothing=0.02, max_horizon=0.15, still_radius=0.5, still_time=0.01):
+        # Extrapolates the handle from a delayed position stream: velocity is a low-pass filtered finite
+        # difference (smoothing: time constant in seconds) and the prediction is position + velocity * horizon,
+        # with the horizon capped at max_horizon since a hand cannot be predicted much further ahead.
+        # Once the handle stayed within still_radius px for still_time seconds it is taken to be at rest and
+        # the prediction is where it rests, the filtered velocity would otherwise still carry it on.
+        self.smoothing = smoothing
+        self.max_horizon = max_horizon
+        self.still_radius = still_radius
+        self.still_time = still_time
+        self.last_time = None
+        self.last_pos = (0.0, 0.0)
+        self.velocity = [0.0, 0.0]
+        self.rest_pos = (0.0, 0.0)
+        self.rest_time = None  # since when the handle is within still_radius of rest_pos
+
+    def update(self, t, pos):
+        if self.last_time is not None and t > self.last_time:
+            dt = t - self.last_time
+            a = dt / (self.smoothing + dt)
+            self.velocity[0] += a * ((pos[0] - self.last_pos[0]) / dt - self.velocity[0])
+            self.velocity[1] += a * ((pos[1] - self.last_pos[1]) / dt - self.velocity[1])
+        if self.rest_time is None or math.hypot(pos[0] - self.rest_pos[0], pos[1] - self.rest_pos[1]) > self.still_radius:
+            self.rest_pos = (pos[0], pos[1])
+            self.rest_time = t
+        self.last_time = t
+        self.last_pos = (pos[0], pos[1])
+
+    def still(self):
+        return self.last_time is not None and self.last_time - self.rest_time >= self.still_time
+
+    def predict(self, horizon):
+        # Returns the predicted position and the horizon actually used
+        if self.still():
+            return self.last_pos, 0.0
+        horizon = min(horizon, self.max_horizon)
+        return (self.last_pos[0] + self.velocity[0] * horizon, self.last_pos[1] + self.velocity[1] * horizon), horizon
+
+
+class TeleopChannel:
+    def __init__(self, scene, forward_delay=0.05, feedback_delay=0.05, compensate=True, capacity=1024,
+                 predictor=None, clock=time.perf_counter):
+        # Simulated teleoperation between the handle (operator side) and the scene (remote side): handle
+        # positions and game keys reach the scene forward_delay seconds late and its forces come back
+        # feedback_delay later, both through bounded DelayLines. Use compute_force(raw_pos) in place of
+        # scene.compute_force and handle_key(key) before scene.handle_key, compute_force applies the keys as
+        # they come out of the line (so it changes the game state, like handle_key it runs with the scene locked).
+        # With compensate the remote side runs on where the handle is predicted to be by now (forward_delay
+        # ahead of what arrives, keys act there too), and the operator side replaces the delayed wall force
+        # with a local proxy of the Wall: the last reported connector rect moved along with the handle, against
+        # the same wall model, without delay.
+        # Every tick logs how far from the handle the remote side works, with the position as it arrives and as
+        # predicted. How the felt force compares to no lag at all needs an undelayed run of the same input,
+        # see benchmarks/bench_teleop_lag.py.
+        self.scene = scene
+        self.forward = DelayLine(forward_delay, capacity)
+        self.feedback = DelayLine(feedback_delay, capacity)
+        self.compensate = compensate
+        self.predictor = predictor if predictor is not None else MotionPredictor()
+        self.clock = clock
+        self.outgoing_keys = deque()  # handle_key to the next compute_force, which sends them
+        self.ticks = 0
+        self.error_sums = {'delayed': 0.0, 'predicted': 0.0}
+        self.error_max = {'delayed': 0.0, 'predicted': 0.0}
+
+    @property
+    def round_trip(self):
+        return self.forward.delay + self.feedback.delay
+
+    def handle_key(self, key):
+        # 'l' switches the compensation, the game keys go to the scene with the next position sent.
+        # Returns False for other keys.
+        if key == ord('l'):
+            self.compensate = not self.compensate
+        elif key in KEY_BITS:
+            self.outgoing_keys.append(key)
+        else:
+            return False
+        return True
+
+    def compute_force(self, raw_pos):
+        now = self.clock()
+        scene = self.scene
+        keys = []
+        while self.outgoing_keys:
+            keys.append(self.outgoing_keys.popleft())
+        self.forward.push(now, (raw_pos, keys))
+
+        # Remote side: the handle as it arrives, extrapolated when compensating
+        arrived = []
+        sample, sent = self.forward.read(now, arrived)
+        if sample is None:
+            sample, sent = (raw_pos, []), now
+        remote_raw = sample[0]
+        self.predictor.update(sent, remote_raw)
+        predicted, _ = self.predictor.predict(self.forward.delay)
+        # Both aim at where the handle is now, raw_pos, the distance is what the lag costs in position
+        errors = {'delayed': math.hypot(remote_raw[0] - raw_pos[0], remote_raw[1] - raw_pos[1]),
+                  'predicted': math.hypot(predicted[0] - raw_pos[0], predicted[1] - raw_pos[1])}
+        self.ticks += 1
+        for name, error in errors.items():
+            self.error_sums[name] += error * error
+            self.error_max[name] = max(self.error_max[name], error)
+        if self.compensate:
+            remote_raw = predicted
+        remote = scene.compute_force(remote_raw)
+        for _, arrived_keys in arrived:
+            for key in arrived_keys:
+                scene.handle_key(key, remote['mouse_pos'])
+        cable = scene.unlocked_cable()
+        remote['red_rect'] = None if cable.locked else cable.red_rect_rect.copy()
+        remote['raw_pos'] = remote_raw
+        remote['sent'] = sent
+        remote['handle_error'] = errors['predicted' if self.compensate else 'delayed']
+        self.feedback.push(now, remote)
+
+        # Operator side: the force as it comes back, and with the wall part replaced by the local proxy
+        returned, _ = self.feedback.read(now)
+        if returned is None:
+            returned = remote
+        F_delayed = pygame.Vector2(returned['Force'])
+        F_wall_local = pygame.Vector2(0, 0)
+        # the cable the scene holds now, a release only takes the proxy away once it reached the scene
+        if returned['red_rect'] is not None and not cable.locked:
+            dx, dy = raw_pos[0] - returned['raw_pos'][0], raw_pos[1] - returned['raw_pos'][1]
+            handle_pos = (returned['mouse_pos'][0] + dx, returned['mouse_pos'][1] + dy)
+            _, F_wall_local = scene.wall.collision_force(handle_pos, returned['red_rect'].move(round(dx), round(dy)))
+        F_compensated = F_delayed + returned['Force_wall'] - F_wall_local
+
+        snapshot = dict(remote)
+        snapshot['Force'] = F_compensated if self.compensate else F_delayed
+        snapshot['Force_delayed'] = F_delayed
+        snapshot['Force_compensated'] = F_compensated
+        # age of the handle position behind the remote part of the force, prediction or not
+        snapshot['latency'] = now - returned['sent']
+        snapshot['handle_error'] = returned['handle_error']
+        return snapshot
+
+    def summary(self):
+        # Distance between the handle and the position the remote side worked with (rms and max, px), for the
+        # position as it arrived and as predicted
+        ticks = max(self.ticks, 1)
+        result = {'forward_ms': self.forward.delay * 1000, 'feedback_ms': self.feedback.delay * 1000,
+                  'compensate': self.compensate, 'ticks': self.ticks,
+                  'overruns': self.forward.overruns + self.feedback.overruns}
+        for name in ('delayed', 'predicted'):
+            result[name] = {'position_rms': math.sqrt(self.error_sums[name] / ticks), 'position_max': self.error_max[name]}
+        return result
+
+    def summary_text(self):
+        result = self.summary()
+        lines = [f"teleoperation lag {result['forward_ms']:.0f} + {result['feedback_ms']:.0f} ms, "
+                 f"compensation {'on' if result['compensate'] else 'off'}, {result['overruns']} buffer overruns",
+                 f"{'remote handle':<14}{'error rms':>12}{'error max':>12}"]
+        for name in ('delayed', 'predicted'):
+            lines.append(f"{name:<14}{result[name]['position_rms']:>9.1f} px{result[name]['position_max']:>9.1f} px")
+        return "\n".join(lines)
+
+    def write_summary(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2)
+
+
+def teleop_from_env(scene):
+    # CABLE_LAG_MS=200 simulates a teleoperation round trip of 200 ms (half each way), compensated unless
+    # CABLE_LAG_COMPENSATE=0. Returns the TeleopChannel, None without CABLE_LAG_MS.
+    if not os.environ.get("CABLE_LAG_MS"):
+        return None
+    lag = float(os.environ["CABLE_LAG_MS"]) / 2000
+    return TeleopChannel(scene, lag, lag, compensate=os.environ.get("CABLE_LAG_COMPENSATE") != "0")
+
+
+def lag_text(round_trip, handle_error, compensate):
+    # The teleoperation part of the status line
+    return f"lag: {round_trip * 1000:.0f} ms, remote handle off by {handle_error:.0f} px ({'predicted' if compensate else 'raw'})"